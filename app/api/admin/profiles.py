@@ -0,0 +1,33 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse
+from starlette import status
+
+from app.core.profiling import get_profile_store, has_profiling_token
+from app.schemas import profile as profile_schemas
+
+router = APIRouter()
+
+
+def require_profiling_token(request: Request):
+    if not has_profiling_token(request):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@router.get(
+    "/",
+    response_model=List[profile_schemas.Profile],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_profiling_token)],
+)
+def get_profiles():
+    return get_profile_store().list()
+
+
+@router.get("/{profile_name}", status_code=status.HTTP_200_OK, dependencies=[Depends(require_profiling_token)])
+def get_profile(profile_name: str):
+    path = get_profile_store().path(profile_name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=profile_name)
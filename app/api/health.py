@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from starlette import status
+
+from app.core import lifespan
+
+router = APIRouter()
+
+
+@router.get("/ready", include_in_schema=False)
+def get_readiness():
+    # Not ready until the startup warm-ups have all succeeded, so no traffic is routed to a cold worker
+    ready = lifespan.is_ready()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"ready": ready, "warmups": lifespan.warmup_errors},
+    )
@@ -0,0 +1,48 @@
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from starlette import status
+
+from app.services.idempotency_service import (
+    IdempotencyKeyInProgressError,
+    IdempotencyKeyMismatchError,
+    IdempotencyService,
+)
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def begin_request(db: Session, key: Optional[str], fingerprint: str) -> Optional[Response]:
+    """
+    Claim the idempotency key of a request, if it has one.
+
+    Returns:
+        Response: The stored response when the request is a retry of a completed one, otherwise None.
+    """
+    if key is None:
+        return None
+
+    try:
+        record = IdempotencyService(db).begin(key, fingerprint)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except IdempotencyKeyInProgressError as ie:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(ie))
+    except IdempotencyKeyMismatchError as me:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(me))
+
+    if record is None:
+        return None
+    return JSONResponse(status_code=record.status_code, content=record.response_body, headers={REPLAYED_HEADER: "true"})
+
+
+def complete_request(db: Session, key: Optional[str], status_code: int, body):
+    if key is not None:
+        IdempotencyService(db).complete(key, status_code, body)
+
+
+def release_request(db: Session, key: Optional[str]):
+    if key is not None:
+        IdempotencyService(db).release(key)
@@ -1,13 +1,23 @@
 import logging
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Body, Depends, File, HTTPException, Query, UploadFile
+import orjson
+from fastapi import APIRouter, Body, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from starlette import status
 
+from app.api import conditional, idempotency, streaming
+from app.core import embedding_index, metrics, shared_cache
+from app.core.config import settings
 from app.db import session
 from app.schemas import image_info as image_schemas
-from app.services.image_service import ImageService, ImageServiceNotFoundError
+from app.schemas import job as job_schemas
+from app.services.change_feed_service import ChangeFeedExpiredError, ChangeFeedService, ChangeFeedTokenError
+from app.services.export_service import ExportService, gzip_chunks
+from app.services.idempotency_service import IDEMPOTENCY_HEADER, request_fingerprint
+from app.services.image_service import ImageService, ImageServiceError, ImageServiceNotFoundError, hash_contents
 from app.services.tag_service import TagService
 from app.utils.get_image_size import UnknownImageFormat
 
@@ -23,45 +33,206 @@ def get_image_service(db: Session = Depends(session.get_db)):
 
 @router.get("/", response_model=list[image_schemas.ImageInfo], status_code=status.HTTP_200_OK)
 def get_image_infos(
+    request: Request,
     param: image_schemas.ImageInfoFilters = Depends(),
     tags: List[str] = Query(default=None),
     image_service: ImageService = Depends(get_image_service),
 ):
-    return image_service.get_images(param, tags)
+    # NDJSON is opt-in through the Accept header, so the two representations need distinct validators
+    headers = {"Vary": "Accept"}
+    stream = streaming.wants_ndjson(request)
+
+    # A random listing differs on every request, so it is never cacheable
+    if not param.random:
+        etag = conditional.make_etag(stream, request.url.query, *image_service.get_images_version(param, tags))
+        headers.update(conditional.cache_headers(etag, None))
+        if conditional.is_not_modified(request, etag, None):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    fields = param.field_names
+    if stream:
+        rows = image_service.iter_images(param, tags)
+        return streaming.ndjson_response(rows, lambda image: image_schemas.image_info_to_dict(image, fields), headers)
+
+    # Serialized straight from the rows: validating them through the response model costs more than the query
+    images = image_service.get_images(param, tags)
+    rows = [image_schemas.image_info_to_dict(image, fields) for image in images]
+    return Response(content=orjson.dumps(rows, option=orjson.OPT_UTC_Z), media_type="application/json", headers=headers)
+
+
+@router.get("/export", response_class=StreamingResponse, status_code=status.HTTP_200_OK)
+def export_image_infos(param: image_schemas.ImageExportQuery = Depends(), db: Session = Depends(session.get_db)):
+    # Resume an interrupted export with after_id set to the last received id, or split the id space between
+    # parallel clients with after_id / until_id
+    chunks = ExportService(db).iter_export(param.format, param.after_id, param.until_id)
+    headers = {"Content-Disposition": f'attachment; filename="images.{param.format}"'}
+    if param.gzip:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    media_type = streaming.NDJSON_MEDIA_TYPE if param.format == "ndjson" else "text/csv"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+
+@router.post("/tags/", response_model=image_schemas.ImageTagsBulkResult, status_code=status.HTTP_200_OK)
+def retag_images(
+    update_data: image_schemas.ImageTagsBulkUpdate,
+    image_service: ImageService = Depends(get_image_service),
+):
+    # One set-based update for any number of images, instead of a PATCH per image
+    try:
+        updated, added, removed = image_service.retag_images(update_data)
+    except ImageServiceError as e:
+        metrics.record_error("retag_images", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
+    return {"updated_images": updated, "added_links": added, "removed_links": removed}
+
+
+@router.get(
+    "/stats/histogram", response_model=list[image_schemas.ImageDateHistogramBucket], status_code=status.HTTP_200_OK
+)
+def get_created_date_histogram(
+    param: image_schemas.ImageDateHistogramQuery = Depends(),
+    image_service: ImageService = Depends(get_image_service),
+):
+    return image_service.get_created_date_histogram(param)
+
+
+@router.get("/changes", response_model=image_schemas.ImageChanges, status_code=status.HTTP_200_OK)
+def get_image_changes(param: image_schemas.ImageChangesQuery = Depends(), db: Session = Depends(session.get_db)):
+    # Sync a mirror with a first call without since, then by passing back the next token of each answer
+    try:
+        return ChangeFeedService(db).get_changes(param.since, param.limit)
+    except ChangeFeedTokenError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ChangeFeedExpiredError as e:
+        raise HTTPException(status_code=410, detail=str(e))
 
 
 @router.get("/{image_info_id}", response_model=image_schemas.ImageInfo, status_code=status.HTTP_200_OK)
-def get_image_info(image_info_id: int, image_service: ImageService = Depends(get_image_service)):
-    image = image_service.get_image_by_id(image_info_id)
+def get_image_info(
+    image_info_id: int,
+    request: Request,
+    response: Response,
+    image_service: ImageService = Depends(get_image_service),
+):
+    # Answer revalidations from the (version, updated_at) columns alone, without loading the row and its tags
+    row_version = image_service.get_image_version(image_info_id)
+    if row_version:
+        etag = conditional.make_etag(image_info_id, row_version.version)
+        if conditional.is_not_modified(request, etag, row_version.updated_at):
+            return conditional.not_modified_response(etag, row_version.updated_at)
+
+        # The serialized row is shared by all workers, keyed by its version so a write in any of them retires it
+        cache = shared_cache.get_shared_cache()
+        if cache is not None:
+            content = cache.get_or_load(
+                shared_cache.IMAGES, image_info_id, lambda: image_info_json(image_service, image_info_id), version=etag
+            )
+            if content is not None:
+                headers = conditional.cache_headers(etag, row_version.updated_at)
+                return Response(content=content, media_type="application/json", headers=headers)
+
+    image = image_service.get_image_by_id(image_info_id) if row_version else None
     if not image:
         logger.warning(f"Image with id {image_info_id} not found")
         raise HTTPException(status_code=404, detail="Image not found")
+    response.headers.update(conditional.cache_headers(conditional.make_etag(image.id, image.version), image.updated_at))
     return image
 
 
-@router.post("/", response_model=image_schemas.ImageInfo, status_code=status.HTTP_201_CREATED)
-async def upload_image(
+@router.get(
+    "/{image_info_id}/similar", response_model=List[image_schemas.SimilarImage], status_code=status.HTTP_200_OK
+)
+def get_similar_images(
+    image_info_id: int,
+    param: image_schemas.ImageSimilarQuery = Depends(),
+    tags: List[str] = Query(default=None),
+    image_service: ImageService = Depends(get_image_service),
+):
+    if embedding_index.get_embedding_index() is None:
+        raise HTTPException(status_code=404, detail="Similarity search is disabled")
+    try:
+        similar = image_service.get_similar_images(image_info_id, param, tags)
+    except ImageServiceNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    except ImageServiceError as e:
+        metrics.record_error("get_similar_images", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
+    return [{"score": score, "image": image} for image, score in similar]
+
+
+def image_info_json(image_service: ImageService, image_info_id: int) -> Optional[bytes]:
+    image = image_service.get_image_by_id(image_info_id)
+    if not image:
+        return None
+    return image_schemas.ImageInfo.model_validate(image, from_attributes=True).model_dump_json().encode()
+
+
+@router.post(
+    "/",
+    response_model=image_schemas.ImageInfo,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": job_schemas.JobStatus}},
+)
+def upload_image(
+    request: Request,
     param: image_schemas.ImageInfoCreateQuery = Depends(),
     image_data: image_schemas.ImageInfoCreate = Body(...),
     file: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(default=None, alias=IDEMPOTENCY_HEADER),
     image_service: ImageService = Depends(get_image_service),
 ):
+    # A plain function, run in the threadpool like the other endpoints: the conversion is CPU bound, and the
+    # idempotency bookkeeping and the serialization of the new image query the database
+    with metrics.time_stage("read"):
+        img_contents = file.file.read()
+
+    # A retry carrying the same Idempotency-Key gets the response of the first request instead of a duplicate
+    if idempotency_key is not None:
+        fingerprint = request_fingerprint(
+            "upload", param.ext, file.filename, image_data.model_dump_json(), hash_contents(img_contents)
+        )
+        replay = idempotency.begin_request(image_service.db, idempotency_key, fingerprint)
+        if replay:
+            return replay
+
+    completed = False
     try:
-        img_contents = await file.read()
+        if settings.ASYNC_UPLOADS:
+            job = image_service.enqueue_upload(param, image_data, img_contents, file.filename)
+            content = jsonable_encoder(job_schemas.JobStatus.model_validate(job))
+            idempotency.complete_request(image_service.db, idempotency_key, status.HTTP_202_ACCEPTED, content)
+            completed = True
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content=content,
+                headers={"Location": str(request.url_for("get_job_status", job_id=job.id))},
+            )
+
         file.file.seek(0)
         file_bytes = file.file
         new_image = image_service.create_image(param, image_data, img_contents, file.filename, file_bytes)
         logger.info(
             f"New image uploaded: ID={new_image.id}, Title={new_image.title}, Path={new_image.image}, Size={new_image.file_size}, Tags={[tag.name for tag in new_image.tags]}"
         )
+        if idempotency_key is not None:
+            content = jsonable_encoder(image_schemas.ImageInfo.model_validate(new_image, from_attributes=True))
+            idempotency.complete_request(image_service.db, idempotency_key, status.HTTP_201_CREATED, content)
+        completed = True
         return new_image
 
     except ValueError as ve:
+        metrics.record_error("upload_image", ve)
         raise HTTPException(status_code=400, detail=str(ve))
     except UnknownImageFormat as ue:
+        metrics.record_error("upload_image", ue)
         raise HTTPException(status_code=400, detail="Invalid file")
     except Exception as e:
+        metrics.record_error("upload_image", e)
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        if not completed:
+            idempotency.release_request(image_service.db, idempotency_key)
 
 
 @router.patch("/{image_info_id}/", response_model=image_schemas.ImageInfo, status_code=status.HTTP_200_OK)
@@ -80,6 +251,7 @@ def update_image_info(
     except ImageServiceNotFoundError:
         raise HTTPException(status_code=404, detail="Image not found")
     except Exception as e:
+        metrics.record_error("update_image_info", e)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -94,4 +266,5 @@ def delete_image_info(image_info_id: int, image_service: ImageService = Depends(
     except ImageServiceNotFoundError:
         raise HTTPException(status_code=404, detail="Image not found")
     except Exception as e:
+        metrics.record_error("delete_image_info", e)
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -0,0 +1,89 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from starlette import status
+
+from app.api import conditional
+from app.api.image.image_info import get_image_service
+from app.core import metrics
+from app.core.config import settings
+from app.services.image_service import ImageService
+from app.services.pyramid_service import (
+    PyramidNotReadyError,
+    PyramidService,
+    PyramidServiceError,
+    PyramidServiceNotFoundError,
+)
+from app.storage import StorageError
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+DZI_NAMESPACE = "http://schemas.microsoft.com/deepzoom/2008"
+TILE_MEDIA_TYPES = {"jpeg": "image/jpeg", "png": "image/png"}
+
+
+def get_pyramid_service(image_service: ImageService = Depends(get_image_service)):
+    return PyramidService(image_service.db, image_service.storage)
+
+
+@router.get("/{image_info_id}/pyramid.dzi", status_code=status.HTTP_200_OK)
+def get_pyramid_descriptor(image_info_id: int, pyramid_service: PyramidService = Depends(get_pyramid_service)):
+    # Deep Zoom viewers (e.g. OpenSeadragon) fetch the tiles from the "pyramid_files" folder next to it
+    try:
+        pyramid = pyramid_service.get_pyramid(image_info_id)
+    except PyramidServiceNotFoundError:
+        raise HTTPException(status_code=404, detail="Image has no tile pyramid")
+
+    content = (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="{DZI_NAMESPACE}" Format="{pyramid.format}" Overlap="{pyramid.overlap}" '
+        f'TileSize="{pyramid.tile_size}"><Size Width="{pyramid.width}" Height="{pyramid.height}"/></Image>'
+    )
+    headers = {"Cache-Control": conditional.IMMUTABLE_CACHE_CONTROL}
+    return Response(content=content, media_type="application/xml", headers=headers)
+
+
+@router.get("/{image_info_id}/pyramid_files/{level:int}/{col:int}_{row:int}.{file_ext}", status_code=status.HTTP_200_OK)
+def get_pyramid_tile(
+    image_info_id: int,
+    level: int,
+    col: int,
+    row: int,
+    file_ext: str,
+    request: Request,
+    pyramid_service: PyramidService = Depends(get_pyramid_service),
+):
+    try:
+        try:
+            key = pyramid_service.get_tile_key(image_info_id, level, col, row)
+        except PyramidServiceNotFoundError:
+            # Not built yet (PYRAMID_MODE "lazy", or a failed build at upload), or a tile out of range
+            pyramid_service.ensure_ready(image_info_id)
+            key = pyramid_service.get_tile_key(image_info_id, level, col, row)
+    except PyramidServiceNotFoundError:
+        raise HTTPException(status_code=404, detail="Tile not found")
+    except PyramidNotReadyError:
+        raise HTTPException(
+            status_code=503,
+            detail="The tile pyramid is being built",
+            headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)},
+        )
+    except PyramidServiceError as e:
+        metrics.record_error("get_pyramid_tile", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    if file_ext not in TILE_MEDIA_TYPES or not key.endswith(f".{file_ext}"):
+        raise HTTPException(status_code=404, detail="Tile not found")
+
+    headers = {"Cache-Control": conditional.IMMUTABLE_CACHE_CONTROL, "ETag": conditional.make_etag(key)}
+    if conditional.is_not_modified(request, headers["ETag"], None):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        content = pyramid_service.storage.get(key)
+    except StorageError as e:
+        metrics.record_error("get_pyramid_tile", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
+    return Response(content=content, media_type=TILE_MEDIA_TYPES[file_ext], headers=headers)
@@ -0,0 +1,187 @@
+import logging
+from io import BytesIO
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from starlette import status
+
+from app.api import idempotency
+from app.api.image.image_info import get_image_service
+from app.core import metrics
+from app.core.config import settings
+from app.schemas import image_info as image_schemas
+from app.schemas import job as job_schemas
+from app.schemas import upload_session as upload_schemas
+from app.services.idempotency_service import IDEMPOTENCY_HEADER, request_fingerprint
+from app.services.image_service import ImageService
+from app.services.job_service import JobService
+from app.services.upload_session_service import (
+    UPLOAD_COMPLETED,
+    UploadSessionNotFoundError,
+    UploadSessionOffsetError,
+    UploadSessionService,
+    UploadSessionStateError,
+)
+from app.utils.get_image_size import UnknownImageFormat
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+OFFSET_HEADER = "Upload-Offset"
+
+
+def get_upload_session_service(image_service: ImageService = Depends(get_image_service)):
+    return UploadSessionService(image_service.db)
+
+
+def offset_headers(upload) -> dict:
+    return {OFFSET_HEADER: str(upload.received)}
+
+
+@router.post("/", response_model=upload_schemas.UploadSession, status_code=status.HTTP_201_CREATED)
+def create_upload_session(
+    request: Request,
+    response: Response,
+    session_data: upload_schemas.UploadSessionCreate,
+    param: image_schemas.ImageInfoCreateQuery = Depends(),
+    upload_service: UploadSessionService = Depends(get_upload_session_service),
+):
+    try:
+        upload = upload_service.create_session(param, session_data, session_data.filename, session_data.total_size)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+
+    response.headers["Location"] = str(request.url_for("get_upload_session", upload_id=upload.id))
+    response.headers.update(offset_headers(upload))
+    return upload
+
+
+@router.get("/{upload_id}", response_model=upload_schemas.UploadSession, status_code=status.HTTP_200_OK)
+def get_upload_session(
+    upload_id: str, response: Response, upload_service: UploadSessionService = Depends(get_upload_session_service)
+):
+    try:
+        upload = upload_service.get_session(upload_id)
+    except UploadSessionNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+
+    response.headers.update(offset_headers(upload))
+    return upload
+
+
+@router.patch("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def append_upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias=OFFSET_HEADER, ge=0),
+    upload_service: UploadSessionService = Depends(get_upload_session_service),
+):
+    # The body is streamed to disk as it arrives, never buffered as a whole, and the database is only used from
+    # the thread pool, so this coroutine never blocks the event loop
+    try:
+        received = await upload_service.append_chunk(upload_id, upload_offset, request.stream())
+    except HTTPException:
+        raise
+    except UploadSessionNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    except UploadSessionStateError as se:
+        raise HTTPException(status_code=409, detail=str(se))
+    except UploadSessionOffsetError as oe:
+        raise HTTPException(status_code=409, detail=str(oe), headers={OFFSET_HEADER: str(oe.offset)})
+    except ValueError as ve:
+        raise HTTPException(status_code=413, detail=str(ve))
+
+    metrics.UPLOAD_BYTES.labels("in").inc(received - upload_offset)
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={OFFSET_HEADER: str(received)})
+
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_upload_session(upload_id: str, upload_service: UploadSessionService = Depends(get_upload_session_service)):
+    try:
+        upload_service.delete_session(upload_id)
+    except UploadSessionNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return None
+
+
+@router.post(
+    "/{upload_id}/finalize",
+    response_model=image_schemas.ImageInfo,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": job_schemas.JobStatus}},
+)
+def finalize_upload_session(
+    upload_id: str,
+    request: Request,
+    idempotency_key: Optional[str] = Header(default=None, alias=IDEMPOTENCY_HEADER),
+    image_service: ImageService = Depends(get_image_service),
+    upload_service: UploadSessionService = Depends(get_upload_session_service),
+):
+    db = image_service.db
+    replay = idempotency.begin_request(db, idempotency_key, request_fingerprint("finalize", upload_id))
+    if replay:
+        return replay
+
+    completed = False
+    upload = None
+    try:
+        upload = upload_service.begin_finalize(upload_id)
+
+        # Finalizing twice returns what the first call created
+        if upload.status == UPLOAD_COMPLETED:
+            if upload.job_id is not None:
+                status_code = status.HTTP_202_ACCEPTED
+                result = job_schemas.JobStatus.model_validate(JobService(db).get_job_by_id(upload.job_id))
+            else:
+                status_code = status.HTTP_201_CREATED
+                result = image_schemas.ImageInfo.model_validate(
+                    image_service.get_image_by_id(upload.result_id), from_attributes=True
+                )
+            content = jsonable_encoder(result)
+            idempotency.complete_request(db, idempotency_key, status_code, content)
+            completed = True
+            return JSONResponse(status_code=status_code, content=content)
+
+        img_contents = upload_service.read_part(upload)
+        param = image_schemas.ImageInfoCreateQuery(ext=upload.ext)
+        image_data = image_schemas.ImageInfoCreate(**upload.image_data)
+
+        if settings.ASYNC_UPLOADS:
+            job = image_service.enqueue_upload(param, image_data, img_contents, upload.filename)
+            upload_service.finalize(upload, job_id=job.id)
+            content = jsonable_encoder(job_schemas.JobStatus.model_validate(job))
+            idempotency.complete_request(db, idempotency_key, status.HTTP_202_ACCEPTED, content)
+            completed = True
+            return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=content)
+
+        new_image = image_service.create_image(param, image_data, img_contents, upload.filename, BytesIO(img_contents))
+        upload_service.finalize(upload, result_id=new_image.id)
+        logger.info(f"Upload session {upload_id} finalized: ID={new_image.id}, Size={new_image.file_size}")
+
+        content = jsonable_encoder(image_schemas.ImageInfo.model_validate(new_image, from_attributes=True))
+        idempotency.complete_request(db, idempotency_key, status.HTTP_201_CREATED, content)
+        completed = True
+        return new_image
+
+    except HTTPException:
+        raise
+    except UploadSessionNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    except UploadSessionStateError as se:
+        raise HTTPException(status_code=409, detail=str(se))
+    except UploadSessionOffsetError as oe:
+        raise HTTPException(status_code=409, detail=str(oe), headers={OFFSET_HEADER: str(oe.offset)})
+    except (ValueError, UnknownImageFormat) as e:
+        metrics.record_error("finalize_upload_session", e)
+        raise HTTPException(status_code=400, detail="Invalid file")
+    except Exception as e:
+        metrics.record_error("finalize_upload_session", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        if not completed:
+            if upload is not None:
+                upload_service.abort_finalize(upload)
+            idempotency.release_request(db, idempotency_key)
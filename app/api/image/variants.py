@@ -0,0 +1,44 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from starlette import status
+
+from app.api import conditional
+from app.api.image.image_info import get_image_service
+from app.core import metrics
+from app.services.image_service import ImageService, ImageServiceNotFoundError
+from app.storage import StorageError
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+VARIANT_MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+@router.get("/{image_info_id}/variants/{width:int}.{file_ext}", status_code=status.HTTP_200_OK)
+def get_image_variant(
+    image_info_id: int,
+    width: int,
+    file_ext: str,
+    request: Request,
+    image_service: ImageService = Depends(get_image_service),
+):
+    # The URLs are the ones listed in the srcset of the image
+    try:
+        variant = image_service.get_image_variant(image_info_id, width)
+    except ImageServiceNotFoundError:
+        raise HTTPException(status_code=404, detail="Image variant not found")
+    if variant.format != file_ext:
+        raise HTTPException(status_code=404, detail="Image variant not found")
+
+    headers = {"Cache-Control": conditional.IMMUTABLE_CACHE_CONTROL, "ETag": conditional.make_etag(variant.key)}
+    if conditional.is_not_modified(request, headers["ETag"], None):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        content = image_service.storage.get(variant.key)
+    except StorageError as e:
+        metrics.record_error("get_image_variant", e)
+        raise HTTPException(status_code=500, detail="Internal server error")
+    return Response(content=content, media_type=VARIANT_MEDIA_TYPES.get(variant.format), headers=headers)
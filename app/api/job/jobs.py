@@ -0,0 +1,22 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from starlette import status
+
+from app.db import session
+from app.schemas import job as job_schemas
+from app.services.job_service import JobService, JobServiceNotFoundError
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=job_schemas.JobStatus, status_code=status.HTTP_200_OK)
+def get_job_status(job_id: int, db: Session = Depends(session.get_db)):
+    try:
+        return JobService(db).get_job_by_id(job_id)
+    except JobServiceNotFoundError:
+        logger.warning(f"Job with id {job_id} not found")
+        raise HTTPException(status_code=404, detail="Job not found")
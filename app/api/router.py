@@ -1,9 +1,19 @@
 from fastapi import APIRouter
 
-from app.api.image import image_info
+from app.api import health, metrics
+from app.api.admin import profiles
+from app.api.image import image_info, pyramid, upload_sessions, variants
+from app.api.job import jobs
 from app.api.tag import tags
 
 router = APIRouter()
 
+router.include_router(upload_sessions.router, prefix="/image_api/image/uploads", tags=["image"])
+router.include_router(pyramid.router, prefix="/image_api/image", tags=["image"])
+router.include_router(variants.router, prefix="/image_api/image", tags=["image"])
 router.include_router(image_info.router, prefix="/image_api/image", tags=["image"])
-router.include_router(tags.router, prefix="/image_api/tag", tags=["tag"])
\ No newline at end of file
+router.include_router(tags.router, prefix="/image_api/tag", tags=["tag"])
+router.include_router(jobs.router, prefix="/image_api/job", tags=["job"])
+router.include_router(profiles.router, prefix="/image_api/admin/profiles", tags=["admin"])
+router.include_router(metrics.router, tags=["metrics"])
+router.include_router(health.router, tags=["health"])
\ No newline at end of file
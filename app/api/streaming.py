@@ -0,0 +1,38 @@
+from typing import Callable, Iterable
+
+import orjson
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows encoded per chunk written to the socket: large enough to amortize the per-chunk overhead,
+# small enough to keep the time to first byte and the buffered memory low
+ROWS_PER_CHUNK = 200
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _encode_ndjson(rows: Iterable, to_dict: Callable) -> Iterable[bytes]:
+    chunk = []
+    for row in rows:
+        chunk.append(orjson.dumps(to_dict(row)))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+
+def ndjson_response(rows: Iterable, to_dict: Callable, headers: dict = None) -> StreamingResponse:
+    """
+    Stream the rows as newline delimited JSON, one object per line.
+
+    Args:
+        rows (Iterable): The rows, typically a lazy iterator over a server-side cursor.
+        to_dict (Callable): Converts a row into a dict that orjson can encode.
+        headers (dict): Extra response headers.
+    """
+    return StreamingResponse(_encode_ndjson(rows, to_dict), media_type=NDJSON_MEDIA_TYPE, headers=headers)
@@ -1,18 +1,81 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from starlette import status
 
+from app.api import conditional
+from app.core import shared_cache
 from app.db import session
 from app.db.models import Tag
 from app.schemas import tag as tag_schemas
-from app.services.tag_service import TagService
+from app.services.tag_service import TagService, TagServiceConflictError, TagServiceNotFoundError
 
 router = APIRouter()
 
+TAG_LIST = TypeAdapter(List[tag_schemas.Tag])
+
 
 @router.get("/tags/", response_model=List[tag_schemas.Tag], status_code=status.HTTP_200_OK)
-def get_tags(db: Session = Depends(session.get_db)):
+def get_tags(request: Request, response: Response, db: Session = Depends(session.get_db)):
     tag_service = TagService(db)
+    count, max_id, last_modified = tag_service.get_tags_version()
+    etag = conditional.make_etag(count, max_id, last_modified)
+    if conditional.is_not_modified(request, etag, last_modified):
+        return conditional.not_modified_response(etag, last_modified)
+    headers = conditional.cache_headers(etag, last_modified)
+
+    # The serialized list is shared by all workers and keyed by the ETag, so any tag change retires it
+    cache = shared_cache.get_shared_cache()
+    if cache is not None:
+        content = cache.get_or_load(
+            shared_cache.TAGS, "all", lambda: TAG_LIST.dump_json(tag_service.get_all_tags()), version=etag
+        )
+        return Response(content=content, media_type="application/json", headers=headers)
+
+    response.headers.update(headers)
     return tag_service.get_all_tags()
+
+
+@router.get("/suggest", response_model=List[tag_schemas.TagSuggestion], status_code=status.HTTP_200_OK)
+def suggest_tags(param: tag_schemas.TagSuggestQuery = Depends(), db: Session = Depends(session.get_db)):
+    # Answered from the tag names each worker keeps in memory, rather than the full list filtered client-side
+    return [tag._asdict() for tag in TagService(db).suggest_tags(param.prefix, param.limit)]
+
+
+@router.get("/{tag_name}/related", response_model=List[tag_schemas.RelatedTag], status_code=status.HTTP_200_OK)
+def get_related_tags(
+    tag_name: str,
+    param: tag_schemas.RelatedTagsQuery = Depends(),
+    db: Session = Depends(session.get_db),
+):
+    try:
+        return TagService(db).get_related_tags(tag_name, param.k, param.metric, param.min_count)
+    except TagServiceNotFoundError:
+        raise HTTPException(status_code=404, detail="Tag not found")
+
+
+@router.patch("/tags/{tag_id}/", response_model=tag_schemas.Tag, status_code=status.HTTP_200_OK)
+def rename_tag(tag_id: int, update_data: tag_schemas.TagUpdate, db: Session = Depends(session.get_db)):
+    try:
+        tag = TagService(db).rename_tag(tag_id, update_data.name)
+    except TagServiceNotFoundError:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    except TagServiceConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    shared_cache.invalidate(shared_cache.TAGS, shared_cache.IMAGES)
+    return tag
+
+
+@router.post("/tags/{tag_id}/merge/", response_model=tag_schemas.Tag, status_code=status.HTTP_200_OK)
+def merge_tag(tag_id: int, merge_data: tag_schemas.TagMerge, db: Session = Depends(session.get_db)):
+    # The images of the tag are moved to merge_data.into_id, and the tag is deleted
+    try:
+        tag = TagService(db).merge_tags(tag_id, merge_data.into_id)
+    except TagServiceNotFoundError:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    except TagServiceConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    shared_cache.invalidate(shared_cache.TAGS, shared_cache.IMAGES)
+    return tag
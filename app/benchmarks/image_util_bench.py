@@ -0,0 +1,269 @@
+"""
+Microbenchmarks for the image utilities and the header-only metadata parser.
+
+Fixture images are generated deterministically in memory, so results are reproducible without any files
+or database. Each case runs in a forked child process so its peak memory (RSS growth, which includes the
+buffers Pillow allocates outside the Python heap) is measured in isolation. Memory measurement relies on
+Linux /proc and glibc.
+
+Usage:
+    python -m app.benchmarks.image_util_bench                     # compare against baseline.json
+    python -m app.benchmarks.image_util_bench --update-baseline   # record a new baseline
+    python -m app.benchmarks.image_util_bench --filter metadata   # run matching cases only
+    python -m app.benchmarks.image_util_bench --require-baseline  # also fail when cases have no baseline, e.g. in CI
+
+Timings are machine specific: record the baseline on the machine that runs the comparison.
+"""
+import argparse
+import ctypes
+import ctypes.util
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import timeit
+from io import BytesIO
+
+import PIL.Image
+
+from app.utils.get_image_size import get_image_metadata_from_bytesio
+from app.utils.image_util import ImageUtil
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+SIZES = [(64, 64), (640, 480), (1920, 1080), (4000, 3000)]
+METADATA_FORMATS = ["JPEG", "PNG", "GIF", "BMP", "TIFF"]
+ENCODE_FORMATS = ["JPEG", "PNG"]
+
+DEFAULT_REPEAT = 5
+DEFAULT_TIME_THRESHOLD = 0.25
+DEFAULT_MEMORY_THRESHOLD = 0.25
+M_MMAP_THRESHOLD = -3  # mallopt parameter, see malloc.h
+# Memory growth below this many bytes is noise (allocator arenas, page granularity) and never a regression
+MEMORY_NOISE_FLOOR = 1024 * 1024
+
+_fixture_cache = {}
+
+
+def make_image(size) -> PIL.Image.Image:
+    """
+    Build a deterministic, photo-like RGB image: smooth colour fields upscaled from seeded noise.
+    """
+    if size not in _fixture_cache:
+        rng = random.Random(size[0] * 100003 + size[1])
+        seed_image = PIL.Image.frombytes("RGB", (32, 24), rng.randbytes(32 * 24 * 3))
+        _fixture_cache[size] = seed_image.resize(size, PIL.Image.BICUBIC)
+    return _fixture_cache[size]
+
+
+def make_image_bytes(size, format: str) -> bytes:
+    key = (size, format)
+    if key not in _fixture_cache:
+        output = BytesIO()
+        image = make_image(size)
+        if format == "GIF":
+            image = image.convert("P")
+        image.save(output, format=format)
+        _fixture_cache[key] = output.getvalue()
+    return _fixture_cache[key]
+
+
+def size_label(size) -> str:
+    return f"{size[0]}x{size[1]}"
+
+
+def build_cases():
+    """
+    Return (name, setup, run) tuples. ``setup`` prepares the input outside of the timed section and
+    ``run`` is the timed call.
+    """
+    cases = []
+
+    for format in METADATA_FORMATS:
+        for size in SIZES:
+            def setup(size=size, format=format):
+                return make_image_bytes(size, format)
+
+            def run(data):
+                get_image_metadata_from_bytesio(BytesIO(data), len(data))
+
+            cases.append((f"metadata/{format.lower()}/{size_label(size)}", setup, run))
+
+    for size in SIZES:
+        for source, target in (("PNG", "jpeg"), ("JPEG", "png")):
+            def setup(size=size, source=source):
+                return make_image_bytes(size, source)
+
+            def run(data, target=target):
+                ImageUtil.convert_image_type(data, target).load()
+
+            cases.append((f"convert_image_type/{source.lower()}-{target}/{size_label(size)}", setup, run))
+
+        def setup(size=size):
+            image = make_image(size).copy()
+            image.load()
+            return image
+
+        def run(image, size=size):
+            ImageUtil.reduce_image_size(image, max_dimension=max(size) // 3)
+
+        cases.append((f"reduce_image_size/{size_label(size)}", setup, run))
+
+        def setup(size=size):
+            return make_image_bytes(size, "JPEG")
+
+        def run(data):
+            ImageUtil.optimize_image_bytes_size(data, "jpeg", target_size=len(data) // 2)
+
+        cases.append((f"optimize_image_bytes_size/{size_label(size)}", setup, run))
+
+        for format in ENCODE_FORMATS:
+            def run(image, format=format):
+                ImageUtil.PIL_to_bytes(image, format)
+
+            cases.append((f"PIL_to_bytes/{format.lower()}/{size_label(size)}", lambda size=size: make_image(size), run))
+
+    return cases
+
+
+def _read_status_kib(field: str) -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def _prepare_allocator():
+    """
+    Make RSS track live memory: serve every large allocation with mmap (glibc otherwise raises the mmap
+    threshold after the warm-up run and silently reuses the freed heap), release free heap pages, and
+    reset the peak RSS counter.
+    """
+    libc = ctypes.CDLL(ctypes.util.find_library("c"))
+    libc.mallopt(M_MMAP_THRESHOLD, 128 * 1024)
+    libc.malloc_trim(0)
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+
+
+def _measure(value, run, repeat: int, conn):
+    _prepare_allocator()
+    run(value)  # warm-up: plugin imports, codec initialisation
+
+    # Call the function enough times per measurement for microsecond-scale cases to be timed reliably
+    timer = timeit.Timer(lambda: run(value))
+    number, _ = timer.autorange()
+    timings = [timing / number for timing in timer.repeat(repeat=repeat, number=number)]
+
+    _prepare_allocator()
+    start_rss = _read_status_kib("VmRSS")
+    run(value)
+    peak_rss = _read_status_kib("VmHWM")
+
+    conn.send({
+        "time": min(timings),
+        "time_median": statistics.median(timings),
+        "peak_memory": max(peak_rss - start_rss, 0) * 1024,
+    })
+    conn.close()
+
+
+def measure(setup, run, repeat: int) -> dict:
+    # Prepare the input before forking so its allocation does not count towards the child's peak
+    value = setup()
+    context = multiprocessing.get_context("fork")
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_measure, args=(value, run, repeat, child_conn))
+    process.start()
+    result = parent_conn.recv()
+    process.join()
+    return result
+
+
+def compare(results: dict, baseline: dict, time_threshold: float, memory_threshold: float) -> list:
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        if result["time"] > expected["time"] * (1 + time_threshold):
+            regressions.append(f"{name}: time {result['time'] * 1000:.3f} ms > baseline {expected['time'] * 1000:.3f} ms")
+        memory_limit = max(expected["peak_memory"] * (1 + memory_threshold), MEMORY_NOISE_FLOOR)
+        if result["peak_memory"] > memory_limit:
+            regressions.append(
+                f"{name}: peak memory {result['peak_memory'] / 1024:.0f} KiB > baseline {expected['peak_memory'] / 1024:.0f} KiB"
+            )
+    return regressions
+
+
+def main(argv=None):
+    """
+    Run the benchmarks, print the results and compare them against the stored baseline.
+
+    Keyword Arguments:
+        argv (list): commandline arguments (e.g. sys.argv[1:])
+    Returns:
+        int: zero for OK, 1 when a regression exceeds the threshold, or with --require-baseline when the
+            baseline or a case in it is missing
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the image utilities and metadata parser.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--filter", default=None, help="only run cases whose name contains this string")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--time-threshold", type=float, default=DEFAULT_TIME_THRESHOLD,
+                        help="allowed relative slowdown, e.g. 0.25 for 25%%")
+    parser.add_argument("--memory-threshold", type=float, default=DEFAULT_MEMORY_THRESHOLD)
+    parser.add_argument("--output", default=None, help="also write the results as JSON to this path")
+    parser.add_argument("--require-baseline", action="store_true",
+                        help="fail when there is no baseline, or a case has none, instead of skipping it")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, setup, run in build_cases():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(setup, run, args.repeat)
+        print(f"{name:<48} {results[name]['time'] * 1000:>10.3f} ms {results[name]['peak_memory'] / 1024:>10.0f} KiB")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as baseline_file:
+                baseline = json.load(baseline_file)
+        baseline.update(results)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first", file=sys.stderr)
+        return 1 if args.require_baseline else 0
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    missing = [name for name in results if not baseline.get(name)]
+    if missing:
+        print(f"Not compared, no baseline for {len(missing)} cases:", file=sys.stderr)
+        for name in missing:
+            print(f"  {name}", file=sys.stderr)
+    regressions = compare(results, baseline, args.time_threshold, args.memory_threshold)
+    if regressions:
+        print("REGRESSIONS", file=sys.stderr)
+        print("===========", file=sys.stderr)
+        for regression in regressions:
+            print(regression, file=sys.stderr)
+        return 1
+    return 1 if missing and args.require_baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(argv=sys.argv[1:]))
@@ -0,0 +1,71 @@
+"""
+Compute the BlurHash and colour palette of the images stored before they were computed at upload.
+
+Images without a placeholder are read from the storage in id order, a batch at a time, and processed in a
+pool of worker processes. Each batch is committed on its own, so an interrupted backfill is resumed by
+running the same command again. Images that cannot be decoded are skipped and keep no placeholder.
+
+Usage:
+    python -m app.cli.backfill_placeholders
+    python -m app.cli.backfill_placeholders --workers 8 --batch-size 200
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    """
+    Keyword Arguments:
+        argv (list): commandline arguments (e.g. sys.argv[1:])
+    Returns:
+        int: zero for OK
+    """
+    parser = argparse.ArgumentParser(description="Backfill the image placeholders.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--batch-size", type=int, default=200, help="images per database batch")
+    parser.add_argument("--after-id", type=int, default=0, help="only backfill images with a larger id")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    from app.db.session import SessionLocal
+    from app.services.image_service import ImageService, placeholder_for_stored
+
+    after_id = args.after_id
+    counts = {"updated": 0, "failed": 0}
+    start = time.perf_counter()
+
+    db = SessionLocal()
+    # Spawn the workers so they do not inherit the parent's database connections or storage clients
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as executor:
+            image_service = ImageService(db)
+            while rows := image_service.get_images_missing_placeholder(after_id, args.batch_size):
+                ids, keys = zip(*rows)
+                placeholders = dict(executor.map(placeholder_for_stored, ids, keys, chunksize=8))
+                computed = {image_id: placeholder for image_id, placeholder in placeholders.items() if placeholder}
+
+                counts["updated"] += image_service.set_placeholders(computed)
+                counts["failed"] += len(placeholders) - len(computed)
+                after_id = ids[-1]
+
+                elapsed = time.perf_counter() - start
+                logger.info(
+                    f"Updated {counts['updated']}, failed {counts['failed']}, up to id {after_id} "
+                    f"({counts['updated'] / elapsed:.1f} images/s)"
+                )
+    finally:
+        db.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(argv=sys.argv[1:]))
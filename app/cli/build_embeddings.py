@@ -0,0 +1,87 @@
+"""
+Compute the embeddings of the stored images into the similarity search matrix, EMBEDDING_INDEX_PATH.
+
+Uploads get their embedding as they are stored; this fills it in for the images stored before the index was
+enabled, bulk imports, and for a new host, as the matrix file is local to each one. Images are read from the
+storage in id order, a batch at a time, and processed in a pool of worker processes. Images that already have
+an embedding are skipped unless --rebuild is given, so an interrupted run is resumed by running it again.
+
+Usage:
+    python -m app.cli.build_embeddings
+    python -m app.cli.build_embeddings --workers 8 --batch-size 500 --rebuild
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    """
+    Keyword Arguments:
+        argv (list): commandline arguments (e.g. sys.argv[1:])
+    Returns:
+        int: zero for OK
+    """
+    parser = argparse.ArgumentParser(description="Build the image embedding index.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--batch-size", type=int, default=500, help="images per database batch")
+    parser.add_argument("--after-id", type=int, default=0, help="only process images with a larger id")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the embeddings already stored")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    from app.core.embedding_index import get_embedding_index
+    from app.db.session import SessionLocal
+    from app.services.image_service import ImageService, embedding_for_stored
+
+    index = get_embedding_index()
+    if index is None:
+        logger.error("EMBEDDING_INDEX_PATH is not set, or the file cannot be opened")
+        return 1
+
+    after_id = args.after_id
+    counts = {"updated": 0, "skipped": 0, "failed": 0}
+    start = time.perf_counter()
+
+    db = SessionLocal()
+    # Spawn the workers so they do not inherit the parent's database connections or storage clients
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as executor:
+            image_service = ImageService(db)
+            while rows := image_service.get_image_keys(after_id, args.batch_size):
+                after_id = rows[-1].id
+                if not args.rebuild:
+                    missing = [row for row in rows if index.get(row.id) is None]
+                    counts["skipped"] += len(rows) - len(missing)
+                    rows = missing
+                if not rows:
+                    continue
+
+                ids, keys = zip(*rows)
+                for image_id, embedding in executor.map(embedding_for_stored, ids, keys, chunksize=8):
+                    if embedding is None:
+                        counts["failed"] += 1
+                    else:
+                        index.put(image_id, embedding)
+                        counts["updated"] += 1
+
+                elapsed = time.perf_counter() - start
+                logger.info(
+                    f"Updated {counts['updated']}, skipped {counts['skipped']}, failed {counts['failed']}, "
+                    f"up to id {after_id} ({counts['updated'] / elapsed:.1f} images/s)"
+                )
+    finally:
+        db.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(argv=sys.argv[1:]))
@@ -0,0 +1,119 @@
+"""
+Import a directory tree of existing images without going through the HTTP API.
+
+Files are sniffed and hashed, then converted and shrunk like uploads in a pool of worker processes, and
+written to the database in large batches (COPY on Postgres). Files whose content hash is already in the
+database are skipped, so an interrupted import is resumed by running the same command again.
+
+Each image is titled after its file name and tagged with the --tags given, plus the names of the
+directories between the root and the file with --tags-from-dirs.
+
+Usage:
+    python -m app.cli.bulk_import /archive/photos
+    python -m app.cli.bulk_import /archive/photos --tags archive --tags-from-dirs --workers 8 --batch-size 1000
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".ico", ".webp"}
+
+
+def walk_images(root: str) -> Iterator[str]:
+    for directory, subdirectories, file_names in os.walk(root):
+        subdirectories.sort()
+        for file_name in sorted(file_names):
+            if os.path.splitext(file_name)[1].lower() in IMAGE_EXTENSIONS:
+                yield os.path.join(directory, file_name)
+
+
+def tags_for(path: str, root: str, tags: List[str], tags_from_dirs: bool) -> List[str]:
+    file_tags = list(tags)
+    if tags_from_dirs:
+        file_tags += os.path.relpath(os.path.dirname(path), root).split(os.sep)
+    return list(dict.fromkeys(tag for tag in file_tags if tag and tag != "."))
+
+
+def batched(iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def main(argv=None):
+    """
+    Keyword Arguments:
+        argv (list): commandline arguments (e.g. sys.argv[1:])
+    Returns:
+        int: zero for OK
+    """
+    parser = argparse.ArgumentParser(description="Bulk import a directory tree of images.")
+    parser.add_argument("root", help="directory to import recursively")
+    parser.add_argument("--ext", default="jpg", help="file type to store the images as")
+    parser.add_argument("--tags", default="", help="comma separated tags added to every image")
+    parser.add_argument("--tags-from-dirs", action="store_true", help="tag images with their directory names")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--batch-size", type=int, default=500, help="images per database batch")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    from app.db.session import SessionLocal
+    from app.services.import_service import ImportService, process_file, sniff_file
+
+    root = os.path.abspath(args.root)
+    tags = [tag.strip() for tag in args.tags.split(",") if tag.strip()]
+    counts = {"imported": 0, "skipped": 0, "failed": 0}
+    start = time.perf_counter()
+
+    db = SessionLocal()
+    # Spawn the workers so they do not inherit the parent's database connections or storage clients
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as executor:
+            for paths in batched(walk_images(root), args.batch_size):
+                import_service = ImportService(db)
+                content_hashes = list(executor.map(sniff_file, paths, chunksize=16))
+                imported = import_service.find_imported_hashes(filter(None, content_hashes))
+
+                # Skip non-images, files imported by an earlier run and duplicates within the batch
+                pending = {}
+                for path, content_hash in zip(paths, content_hashes):
+                    if content_hash is None:
+                        counts["failed"] += 1
+                    elif content_hash in imported or content_hash in pending:
+                        counts["skipped"] += 1
+                    else:
+                        pending[content_hash] = path
+
+                records = list(executor.map(
+                    process_file,
+                    pending.values(),
+                    pending.keys(),
+                    [args.ext] * len(pending),
+                    [tags_for(path, root, tags, args.tags_from_dirs) for path in pending.values()],
+                    chunksize=4,
+                ))
+                counts["failed"] += records.count(None)
+                counts["imported"] += import_service.insert_batch([record for record in records if record])
+
+                elapsed = time.perf_counter() - start
+                logger.info(
+                    f"Imported {counts['imported']}, skipped {counts['skipped']}, failed {counts['failed']} "
+                    f"({counts['imported'] / elapsed:.1f} images/s)"
+                )
+    finally:
+        db.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(argv=sys.argv[1:]))
@@ -0,0 +1,133 @@
+"""
+Export the whole image catalog with its tags as NDJSON or CSV, optionally gzipped.
+
+Images are read in id order through a server-side cursor. After every batch the id of the last written
+image and the output size are saved next to the output in a ``.checkpoint`` file; rerun with --resume to
+truncate a partially written tail and continue an interrupted export from there. Gzipped output is written
+as one gzip member per batch, so a resumed file stays readable. With --workers N the id space is split
+into N ranges exported in parallel to ``<output>.part<K>`` files, each with its own checkpoint.
+
+Usage:
+    python -m app.cli.export_catalog --output images.ndjson
+    python -m app.cli.export_catalog --output images.csv.gz --format csv --gzip --workers 4
+    python -m app.cli.export_catalog --output images.ndjson --resume
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_SUFFIX = ".checkpoint"
+
+
+def read_checkpoint(path: str) -> Optional[Tuple[int, int]]:
+    """
+    Returns:
+        tuple: The last exported id and the output size at that point, or None without a checkpoint.
+    """
+    try:
+        with open(path + CHECKPOINT_SUFFIX) as checkpoint:
+            last_id, size = checkpoint.read().split()
+            return int(last_id), int(size)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path: str, last_id: int, size: int):
+    tmp_path = path + CHECKPOINT_SUFFIX + ".tmp"
+    with open(tmp_path, "w") as checkpoint:
+        checkpoint.write(f"{last_id} {size}")
+    os.replace(tmp_path, path + CHECKPOINT_SUFFIX)
+
+
+def export_range(path: str, export_format: str, compress: bool, after_id: int, until_id: Optional[int], resume: bool):
+    """
+    Export the ``(after_id, until_id]`` id range to ``path``.
+
+    Returns:
+        int: The number of exported batches.
+    """
+    from app.db.session import SessionLocal
+    from app.services.export_service import ExportService, encode_csv_header, gzip_member
+
+    checkpoint = read_checkpoint(path) if resume else None
+    appending = checkpoint is not None and os.path.exists(path)
+    if appending:
+        after_id = max(after_id, checkpoint[0])
+        logger.info(f"{path}: resuming after id {after_id}")
+
+    encode = gzip_member if compress else bytes
+    batches = 0
+    db = SessionLocal()
+    try:
+        with open(path, "r+b" if appending else "wb") as output:
+            if appending:
+                # Drop whatever was written after the last checkpoint
+                output.truncate(checkpoint[1])
+                output.seek(checkpoint[1])
+            elif export_format == "csv":
+                output.write(encode(encode_csv_header()))
+            for last_id, chunk in ExportService(db).iter_export_batches(export_format, after_id, until_id):
+                output.write(encode(chunk))
+                output.flush()
+                write_checkpoint(path, last_id, output.tell())
+                batches += 1
+    finally:
+        db.close()
+
+    logger.info(f"{path}: exported {batches} batches")
+    return batches
+
+
+def main(argv=None):
+    """
+    Keyword Arguments:
+        argv (list): commandline arguments (e.g. sys.argv[1:])
+    Returns:
+        int: zero for OK
+    """
+    parser = argparse.ArgumentParser(description="Export the image catalog.")
+    parser.add_argument("--output", required=True, help="output file, or the prefix of the part files with --workers")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output")
+    parser.add_argument("--workers", type=int, default=1, help="number of id ranges exported in parallel")
+    parser.add_argument("--after-id", type=int, default=0, help="only export images with a greater id")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint of a previous run")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.workers <= 1:
+        export_range(args.output, args.format, args.gzip, args.after_id, None, args.resume)
+        return 0
+
+    from app.db.session import SessionLocal
+    from app.services.export_service import ExportService
+
+    db = SessionLocal()
+    try:
+        ranges = ExportService(db).split_id_range(args.workers)
+    finally:
+        db.close()
+
+    # Spawn the workers so each one opens its own database connections instead of sharing the parent's
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(ranges), mp_context=context) as executor:
+        futures = [
+            executor.submit(
+                export_range, f"{args.output}.part{part}", args.format, args.gzip,
+                max(after_id, args.after_id), until_id, args.resume,
+            )
+            for part, (after_id, until_id) in enumerate(ranges)
+        ]
+        for future in futures:
+            future.result()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(argv=sys.argv[1:]))
@@ -0,0 +1,120 @@
+"""
+Run the background jobs queued in the jobs table, e.g. the uploads accepted with ASYNC_UPLOADS enabled and
+the tile pyramids built lazily.
+
+Start as many workers as needed, on any number of machines: each job is handed to exactly one of them.
+A job that raises is retried with exponential backoff up to JOB_MAX_ATTEMPTS times; invalid uploads fail
+right away. The worker renews the lease of its job while running it, so only the jobs of a worker that died
+are handed to another one. SIGTERM / SIGINT stop the worker after its current job.
+
+Usage:
+    python -m app.cli.job_worker
+    python -m app.cli.job_worker --once
+"""
+import argparse
+import logging
+import signal
+import sys
+import threading
+from typing import Callable, Dict
+
+from sqlalchemy.orm import Session
+
+from app.db.models import Job
+from app.services.image_service import UPLOAD_JOB, ImageService
+from app.services.job_service import JobService, renew_lease
+from app.services.pyramid_service import PYRAMID_JOB, PyramidService, PyramidServiceNotFoundError
+from app.storage import StorageNotFoundError
+from app.utils.get_image_size import UnknownImageFormat
+
+logger = logging.getLogger(__name__)
+
+
+def run_upload_job(db: Session, job: Job) -> int:
+    return ImageService(db).process_upload_job(job.payload, job_id=job.id).id
+
+
+def run_pyramid_job(db: Session, job: Job) -> int:
+    image_id = job.payload["image_id"]
+    PyramidService(db).build(image_id, release_on_failure=False)
+    return image_id
+
+
+# Job kind -> handler(db, job) returning the id of the created row
+JOB_HANDLERS: Dict[str, Callable[[Session, Job], int]] = {
+    UPLOAD_JOB: run_upload_job,
+    PYRAMID_JOB: run_pyramid_job,
+}
+
+# Errors that retrying the job cannot fix: invalid input (pydantic's ValidationError is a ValueError too), or an
+# image deleted since
+PERMANENT_ERRORS = (ValueError, UnknownImageFormat, StorageNotFoundError, PyramidServiceNotFoundError)
+
+
+def process_next_job(db: Session) -> bool:
+    """
+    Claim and run one due job.
+
+    Returns:
+        bool: False when no job was due.
+    """
+    job_service = JobService(db)
+    job = job_service.claim()
+    if not job:
+        return False
+
+    handler = JOB_HANDLERS.get(job.kind)
+    if handler is None:
+        job_service.fail(job, f"Unknown job kind: {job.kind}", retry=False)
+        return True
+
+    logger.info(f"Running job {job.id} ({job.kind}), attempt {job.attempts}")
+    try:
+        with renew_lease(db.get_bind(), job):
+            result_id = handler(db, job)
+    except PERMANENT_ERRORS as e:
+        db.rollback()
+        job_service.fail(job, f"{type(e).__name__}: {e}", retry=False)
+    except Exception as e:
+        db.rollback()
+        job_service.fail(job, f"{type(e).__name__}: {e}")
+    else:
+        job_service.complete(job, result_id)
+        logger.info(f"Job {job.id} succeeded")
+    return True
+
+
+def main(argv=None):
+    """
+    Keyword Arguments:
+        argv (list): commandline arguments (e.g. sys.argv[1:])
+    Returns:
+        int: zero for OK
+    """
+    parser = argparse.ArgumentParser(description="Run queued background jobs.")
+    parser.add_argument("--once", action="store_true", help="exit once no job is due instead of polling")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds to wait when no job is due")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    from app.db.session import SessionLocal
+
+    stopping = threading.Event()
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signal_number, lambda *_: stopping.set())
+
+    while not stopping.is_set():
+        db = SessionLocal()
+        try:
+            processed = process_next_job(db)
+        finally:
+            db.close()
+        if not processed:
+            if args.once:
+                break
+            stopping.wait(args.poll_interval)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(argv=sys.argv[1:]))
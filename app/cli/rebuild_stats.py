@@ -0,0 +1,41 @@
+"""
+Recompute the precomputed statistics tables from the source tables.
+
+They are maintained incrementally on every write; run this after loading data outside of the ORM, or
+periodically to correct any drift.
+
+Usage:
+    python -m app.cli.rebuild_stats
+"""
+import argparse
+import logging
+import sys
+
+from app.db.rollups import rebuild_date_rollups, rebuild_tag_pairs
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    """
+    Keyword Arguments:
+        argv (list): commandline arguments (e.g. sys.argv[1:])
+    Returns:
+        int: zero for OK
+    """
+    parser = argparse.ArgumentParser(description="Rebuild the precomputed statistics tables.")
+    parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    with engine.begin() as connection:
+        rebuild_date_rollups(connection)
+    logger.info("Created date rollups rebuilt")
+    with engine.begin() as connection:
+        rebuild_tag_pairs(connection)
+    logger.info("Tag co-occurrences rebuilt")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(argv=sys.argv[1:]))
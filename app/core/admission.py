@@ -0,0 +1,155 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from app.core import metrics
+from app.core.config import settings
+
+UPLOAD = "upload"
+READ = "read"
+
+UPLOAD_PATHS = ("/image_api/image/", "/image_api/image")
+UPLOAD_SESSION_PREFIX = "/image_api/image/uploads/"
+EXEMPT_PATHS = ("/metrics", "/ready")
+
+
+class ConcurrencyLimiter:
+    """
+    Admit at most ``limit`` concurrent requests, queue up to ``max_queue`` more for at most ``timeout``
+    seconds in arrival order, and turn away the rest right away. Lives on the event loop of one worker.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiters = deque()
+
+    async def acquire(self) -> bool:
+        """
+        Returns:
+            bool: Whether the request was admitted. An admitted request must call ``release`` when done.
+        """
+        if self.in_flight < self.limit and not self.waiters:
+            self.in_flight += 1
+            return True
+        if len(self.waiters) >= self.max_queue:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            # release() hands its slot over to the waiter, so in_flight is left as is
+            await asyncio.wait_for(waiter, self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+
+    def release(self):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+def classify_request(scope) -> Optional[str]:
+    """
+    Return the route class whose limiter applies to the request, or None for unlimited requests.
+    """
+    method, path = scope["method"], scope["path"]
+    if path in EXEMPT_PATHS:
+        return None
+    if (method == "POST" and path in UPLOAD_PATHS) or (
+        method in ("POST", "PATCH") and path.startswith(UPLOAD_SESSION_PREFIX)
+    ):
+        return UPLOAD
+    if method in ("GET", "HEAD"):
+        return READ
+    return None
+
+
+def default_limiters() -> Dict[str, ConcurrencyLimiter]:
+    timeout = settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+    return {
+        UPLOAD: ConcurrencyLimiter(UPLOAD, settings.UPLOAD_CONCURRENCY, settings.UPLOAD_QUEUE_SIZE, timeout),
+        READ: ConcurrencyLimiter(READ, settings.READ_CONCURRENCY, settings.READ_QUEUE_SIZE, timeout),
+    }
+
+
+class AdmissionControlMiddleware:
+    """
+    Per route class concurrency limits with a bounded wait queue. Requests that cannot be admitted get
+    503 with Retry-After before their body is read, so a burst of uploads cannot exhaust the worker's
+    memory, and reads have their own limiter so uploads never starve them.
+    """
+
+    def __init__(self, app, limiters: Dict[str, ConcurrencyLimiter] = None, classify: Callable = classify_request):
+        self.app = app
+        self.limiters = limiters if limiters is not None else default_limiters()
+        self.classify = classify
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limiter = self.limiters.get(self.classify(scope))
+        if limiter is None:
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        admitted = await limiter.acquire()
+        metrics.ADMISSION_WAIT.labels(limiter.name).observe(time.perf_counter() - start)
+        if not admitted:
+            metrics.ADMISSION_REJECTED.labels(limiter.name).inc()
+            return await self.reject(send)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    async def reject(self, send):
+        body = json.dumps({"detail": "Server busy, retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(settings.ADMISSION_RETRY_AFTER_SECONDS).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+_cpu_slots = threading.BoundedSemaphore(settings.CPU_STAGE_CONCURRENCY or os.cpu_count() or 1)
+
+
+@contextmanager
+def cpu_slot():
+    """
+    Hold one of the CPU stage slots for the wrapped block, so no more images are decoded and encoded at
+    once than there are cores, however many requests the threadpool runs.
+    """
+    with metrics.time_stage("cpu_wait"):
+        _cpu_slots.acquire()
+    try:
+        yield
+    finally:
+        _cpu_slots.release()
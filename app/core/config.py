@@ -1,6 +1,7 @@
+from typing import List, Literal, Optional
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from uvicorn.logging import DefaultFormatter, AccessFormatter
 
 
 class Settings(BaseSettings):
@@ -10,10 +11,98 @@ class Settings(BaseSettings):
     DB_HOST: str = "localhost"
     DB_PORT: str = "5432"
     DB_NAME: str = "myimage_fastapi"
+    # Full SQLAlchemy URL overriding the DB_* settings, e.g. a local SQLite file as a stand-in database
+    DB_DSN: Optional[str] = None
 
     MAX_IMG_SIZE: int = 2 * 1024 * 1024  # 2MB as default
     MEDIA_FOLDER: str = Field("app/media/")
 
+    STORAGE_BACKEND: Literal["local", "s3"] = "local"
+    # Local storage: root directories to spread images over, one per disk (MEDIA_FOLDER when empty)
+    MEDIA_VOLUMES: List[str] = []
+    STORAGE_MIN_FREE_BYTES: int = 256 * 1024 * 1024  # space to keep free on every volume
+    # S3 storage: set S3_ENDPOINT_URL to use an S3-compatible service such as a local MinIO
+    S3_BUCKET: Optional[str] = None
+    S3_PREFIX: str = ""
+    S3_ENDPOINT_URL: Optional[str] = None
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+
+    # Connections the startup warm-up opens ahead of the first requests (capped to DB_POOL_SIZE)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_WARM_CONNECTIONS: int = 5
+
+    # Cache of serialized tag lists and image metadata shared by all workers on the host, in a memory-mapped
+    # file (disabled when unset), e.g. /dev/shm/imagefastapi-cache. Values larger than a slot are not cached.
+    SHARED_CACHE_PATH: Optional[str] = None
+    SHARED_CACHE_SLOTS: int = 4096
+    SHARED_CACHE_SLOT_SIZE: int = 64 * 1024
+
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+
+    # Float32 matrix file holding the embedding of every image, row i for image id i, searched by the "similar"
+    # endpoint (disabled when unset). Local to the host; app.cli.build_embeddings fills it for existing images.
+    EMBEDDING_INDEX_PATH: Optional[str] = None
+
+    # Tag autocomplete: each worker keeps the tag names in memory, reloaded in the background with their usage
+    # counts this often (tags created by the worker itself show up once committed), and falls back to fuzzy
+    # database matches
+    TAG_SUGGEST_REFRESH_SECONDS: int = 60
+    TAG_SUGGEST_FUZZY_MIN_LENGTH: int = 3
+
+    # Change feed: tombstones of deleted images are kept this long, and a client whose token is older gets
+    # 410 Gone and has to resync the whole catalog
+    CHANGE_FEED_RETENTION_DAYS: int = 30
+
+    # Admission control, per worker process: concurrent requests per route class, and how many more may
+    # wait for a slot (for up to ADMISSION_QUEUE_TIMEOUT_SECONDS) before getting 503
+    UPLOAD_CONCURRENCY: int = 4
+    UPLOAD_QUEUE_SIZE: int = 16
+    READ_CONCURRENCY: int = 64
+    READ_QUEUE_SIZE: int = 256
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    ADMISSION_RETRY_AFTER_SECONDS: int = 2
+    CPU_STAGE_CONCURRENCY: int = 0  # images decoded / encoded at once; 0 for the number of CPUs
+
+    # Store uploads as is and answer 202 Accepted with a job id; the image is processed by app.cli.job_worker
+    ASYNC_UPLOADS: bool = False
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: float = 2.0  # doubled after every failed attempt
+    JOB_LEASE_SECONDS: float = 300.0  # a running job whose worker died is retried after this long
+
+    # Responsive variants produced at upload, one per width narrower than the image: progressive JPEGs, or WebPs
+    VARIANT_WIDTHS: List[int] = [320, 640, 1280, 2400]
+    VARIANT_FORMAT: Literal["jpeg", "webp"] = "jpeg"
+    VARIANT_QUALITY: int = 80
+
+    # Deep Zoom tile pyramids of uploads larger than PYRAMID_MIN_DIMENSION pixels on a side: their original is
+    # kept and cut into tiles right after the upload ("ingest"), or by a job worker (app.cli.job_worker) queued by
+    # the first tile request ("lazy")
+    PYRAMID_MODE: Literal["off", "ingest", "lazy"] = "off"
+    PYRAMID_MIN_DIMENSION: int = 4096
+    PYRAMID_TILE_SIZE: int = 254  # must be even
+    PYRAMID_TILE_OVERLAP: int = 1
+    PYRAMID_TILE_FORMAT: Literal["jpeg", "png"] = "jpeg"
+    PYRAMID_TILE_QUALITY: int = 85
+    # Largest pyramid source accepted, in pixels: they are opened and cut under this limit instead of Pillow's
+    # decompression bomb limit, and larger uploads are refused
+    PYRAMID_MAX_PIXELS: int = 1_000_000_000
+
+    # Resumable uploads are assembled here, so it must be shared by all app servers
+    UPLOAD_SESSION_FOLDER: str = "app/uploads/"
+    UPLOAD_SESSION_TTL_SECONDS: int = 24 * 60 * 60  # since the last received chunk
+    UPLOAD_MAX_SIZE: int = 512 * 1024 * 1024
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 24 * 60 * 60
+
+    # Requests carrying the X-Profile-Token header set to this secret are profiled (disabled when unset)
+    PROFILING_SECRET: Optional[str] = None
+    PROFILING_SAMPLE_RATE: float = 1.0  # fraction of the token-carrying requests that get profiled
+    PROFILING_INTERVAL_MS: float = 1.0
+    PROFILING_FOLDER: str = "app/profiles/"
+    PROFILING_MAX_FILES: int = 50
+
     LOGGING_CONFIG: dict = {
         "version": 1,
         "disable_existing_loggers": False,
@@ -38,6 +127,8 @@ class Settings(BaseSettings):
 
     @property
     def DATABASE_URL(self):
+        if self.DB_DSN:
+            return self.DB_DSN
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
 
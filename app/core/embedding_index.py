@@ -0,0 +1,204 @@
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.lifespan import register_warmup
+from app.utils.embedding import EMBEDDING_DIM
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"IFEM0001"
+# magic, vector dimension
+HEADER = struct.Struct("<8sI")
+HEADER_SIZE = mmap.PAGESIZE
+# The file grows by this many rows at a time, so workers remap it rarely
+GROW_ROWS = 4096
+
+
+class EmbeddingIndex:
+    """
+    The embeddings of all the images in one memory-mapped float32 matrix file, row ``i`` holding the
+    embedding of the image with id ``i``, shared by every worker process on the host.
+
+    Rows of images without an embedding (never computed, or deleted) are zeros. The file is sparse, so the
+    gaps left by deleted ids take no space. A search is a single matrix-vector product over the mapping.
+    """
+
+    def __init__(self, path: str, dim: int = EMBEDDING_DIM):
+        self.path = path
+        self.dim = dim
+        self.row_size = dim * 4
+        # fcntl locks are held per process, so they do not exclude the threads of one worker from each other
+        self.thread_lock = threading.Lock()
+        self._mapping: Tuple[int, Optional[mmap.mmap], np.ndarray] = (0, None, np.zeros((0, dim), np.float32))
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self.fd = fd
+            with self._locked(0, HEADER_SIZE):
+                if self._read_header(fd) != dim:
+                    # New file, or one laid out for another dimension: start over
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, HEADER_SIZE)
+                    os.pwrite(fd, HEADER.pack(MAGIC, dim), 0)
+        except BaseException:
+            os.close(fd)
+            raise
+
+    @staticmethod
+    def _read_header(fd):
+        magic, dim = HEADER.unpack(os.pread(fd, HEADER.size, 0).ljust(HEADER.size, b"\0"))
+        return dim if magic == MAGIC else None
+
+    @contextmanager
+    def _locked(self, start: int, length: int):
+        with self.thread_lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, length, start)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, length, start)
+
+    def close(self):
+        os.close(self.fd)
+
+    def _offset(self, image_id: int) -> int:
+        return HEADER_SIZE + image_id * self.row_size
+
+    def matrix(self) -> np.ndarray:
+        """
+        Return the read-only (rows, dim) view of the file, remapped when another worker has grown it.
+        """
+        size = os.fstat(self.fd).st_size
+        mapped_size, _, matrix = self._mapping
+        if size != mapped_size:
+            rows = (size - HEADER_SIZE) // self.row_size
+            # Views handed out earlier keep the previous mapping alive until they are released
+            buffer = mmap.mmap(self.fd, size, prot=mmap.PROT_READ) if rows else None
+            matrix = (
+                np.frombuffer(buffer, np.float32, rows * self.dim, HEADER_SIZE).reshape(rows, self.dim)
+                if rows else np.zeros((0, self.dim), np.float32)
+            )
+            self._mapping = (size, buffer, matrix)
+        return matrix
+
+    def prefetch(self):
+        """
+        Ask the kernel to read the whole matrix ahead, so the first searches do not fault it in page by page.
+        """
+        self.matrix()
+        _, buffer, _ = self._mapping
+        if buffer is not None:
+            buffer.madvise(mmap.MADV_WILLNEED)
+
+    def put(self, image_id: int, embedding: np.ndarray):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if embedding.shape != (self.dim,):
+            raise ValueError(f"Expected an embedding of {self.dim} values, got shape {embedding.shape}")
+
+        offset = self._offset(image_id)
+        if os.fstat(self.fd).st_size < offset + self.row_size:
+            with self._locked(0, HEADER_SIZE):
+                # Checked again under the lock, as another worker may have grown it meanwhile
+                if os.fstat(self.fd).st_size < offset + self.row_size:
+                    os.ftruncate(self.fd, self._offset((image_id // GROW_ROWS + 1) * GROW_ROWS))
+        with self._locked(offset, self.row_size):
+            os.pwrite(self.fd, embedding.tobytes(), offset)
+
+    def get(self, image_id: int) -> Optional[np.ndarray]:
+        matrix = self.matrix()
+        if image_id >= len(matrix) or not matrix[image_id].any():
+            return None
+        return np.array(matrix[image_id])
+
+    def delete(self, image_id: int):
+        offset = self._offset(image_id)
+        if os.fstat(self.fd).st_size >= offset + self.row_size:
+            with self._locked(offset, self.row_size):
+                os.pwrite(self.fd, bytes(self.row_size), offset)
+
+    def nearest(self, embedding: np.ndarray, k: int, ids: Optional[Iterable[int]] = None,
+                exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Find the images whose embedding has the largest dot product with ``embedding``.
+
+        Args:
+            embedding (np.ndarray): The query vector.
+            k (int): The maximum number of results.
+            ids (Iterable[int], optional): Only consider these images. All of them by default.
+            exclude (int, optional): An image to leave out, usually the one the query vector comes from.
+
+        Returns:
+            list: (image id, score) tuples, the best first. Only images scoring above zero are returned, which
+                also leaves out the rows without an embedding.
+        """
+        matrix = self.matrix()
+        embedding = np.asarray(embedding, dtype=np.float32)
+        if ids is None:
+            row_ids = None
+            scores = matrix @ embedding
+        else:
+            row_ids = np.fromiter(ids, dtype=np.int64)
+            row_ids = row_ids[(row_ids >= 0) & (row_ids < len(matrix))]
+            scores = matrix[row_ids] @ embedding
+
+        # One extra candidate, in case the excluded image is among the best
+        count = min(k + 1, len(scores))
+        if count == 0:
+            return []
+        best = np.argpartition(scores, len(scores) - count)[-count:]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        best_ids = best if row_ids is None else row_ids[best]
+
+        results = [
+            (image_id, score)
+            for image_id, score in zip(best_ids.tolist(), scores[best].tolist())
+            if score > 0 and image_id != exclude
+        ]
+        return results[:k]
+
+
+_embedding_index: Optional[EmbeddingIndex] = None
+_embedding_index_failed = False
+_embedding_index_lock = threading.Lock()
+
+
+def get_embedding_index() -> Optional[EmbeddingIndex]:
+    """
+    Return the index configured by EMBEDDING_INDEX_PATH, opening it on first use, or None when it is disabled
+    or cannot be opened.
+    """
+    global _embedding_index, _embedding_index_failed
+    if _embedding_index is None and settings.EMBEDDING_INDEX_PATH and not _embedding_index_failed:
+        with _embedding_index_lock:
+            if _embedding_index is None and not _embedding_index_failed:
+                try:
+                    _embedding_index = EmbeddingIndex(settings.EMBEDDING_INDEX_PATH)
+                except OSError as e:
+                    logger.error(f"Could not open the embedding index {settings.EMBEDDING_INDEX_PATH}: {e}")
+                    _embedding_index_failed = True
+    return _embedding_index
+
+
+def delete(image_id: int):
+    index = get_embedding_index()
+    if index is not None:
+        index.delete(image_id)
+
+
+@register_warmup("embedding_index")
+def warm_embedding_index():
+    if not settings.EMBEDDING_INDEX_PATH:
+        return
+    index = get_embedding_index()
+    if index is None:
+        raise RuntimeError(f"Embedding index {settings.EMBEDDING_INDEX_PATH} is unavailable")
+    index.prefetch()
@@ -0,0 +1,70 @@
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db import session
+from app.utils.image_util import ACCEPTED_FORMAT_PLUGINS, ImageUtil
+from app.utils.image_variants import VARIANT_FORMAT_PLUGINS, variant_format
+
+logger = logging.getLogger(__name__)
+
+# Warm-up name to function, run in registration order at startup
+WARMUPS: Dict[str, Callable[[], None]] = {}
+# Warm-up name to None once it succeeded, or the error it failed with
+warmup_errors: Dict[str, Optional[str]] = {}
+
+
+def register_warmup(name: str):
+    """
+    Register the decorated function to run once at startup, before the worker reports itself ready.
+    Modules keeping in-memory indexes or caches register their loader here.
+    """
+
+    def decorator(func: Callable[[], None]):
+        WARMUPS[name] = func
+        return func
+
+    return decorator
+
+
+def is_ready() -> bool:
+    return len(warmup_errors) == len(WARMUPS) and not any(warmup_errors.values())
+
+
+async def run_warmups():
+    """
+    Run every registered warm-up in the threadpool. A failing warm-up is logged and keeps the worker
+    not ready, instead of stopping it from starting.
+    """
+    warmup_errors.clear()
+    for name, func in WARMUPS.items():
+        start = time.perf_counter()
+        try:
+            await run_in_threadpool(func)
+            warmup_errors[name] = None
+            logger.info(f"Warm-up {name} done in {time.perf_counter() - start:.3f}s")
+        except Exception as e:
+            warmup_errors[name] = str(e) or type(e).__name__
+            logger.exception(f"Warm-up {name} failed after {time.perf_counter() - start:.3f}s")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await run_warmups()
+    yield
+
+
+@register_warmup("db_pool")
+def warm_db_pool():
+    session.warm_pool(settings.DB_POOL_WARM_CONNECTIONS)
+
+
+@register_warmup("image_codecs")
+def warm_image_codecs():
+    # The accepted upload formats, and the one the responsive variants are encoded to
+    output_format = variant_format(settings.VARIANT_FORMAT)
+    ImageUtil.preload_codecs({**ACCEPTED_FORMAT_PLUGINS, output_format: VARIANT_FORMAT_PLUGINS[output_format]})
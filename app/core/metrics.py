@@ -0,0 +1,142 @@
+import os
+import time
+from contextlib import contextmanager
+
+from fastapi import Request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# When running several uvicorn/gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory
+# shared by all workers before they start. Each worker then writes its samples to that directory and
+# /metrics aggregates them, no matter which worker serves the scrape.
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+UNMATCHED_ROUTE = "unmatched"
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "imagefastapi_request_duration_seconds",
+    "Request latency by route",
+    ["route", "method", "status"],
+)
+UPLOAD_STAGE_LATENCY = Histogram(
+    "imagefastapi_upload_stage_duration_seconds",
+    "Time spent in each stage of the image upload pipeline",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+UPLOAD_BYTES = Counter(
+    "imagefastapi_upload_bytes",
+    "Bytes received from clients (in) and written to storage (out) by the upload pipeline",
+    ["direction"],
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "imagefastapi_db_queries_per_request",
+    "Number of SQL statements executed per request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "imagefastapi_db_time_per_request_seconds",
+    "Total time spent executing SQL statements per request",
+    ["route"],
+    buckets=STAGE_BUCKETS,
+)
+DB_SLOW_QUERIES = Counter(
+    "imagefastapi_db_slow_queries",
+    "SQL statements slower than the configured threshold",
+)
+ADMISSION_WAIT = Histogram(
+    "imagefastapi_admission_wait_seconds",
+    "Time requests waited for an admission slot, by route class",
+    ["route_class"],
+    buckets=STAGE_BUCKETS,
+)
+ADMISSION_REJECTED = Counter(
+    "imagefastapi_admission_rejected",
+    "Requests turned away with 503 because their route class was saturated",
+    ["route_class"],
+)
+SHARED_CACHE_REQUESTS = Counter(
+    "imagefastapi_shared_cache_requests",
+    "Shared cache lookups by namespace and result (hit or miss)",
+    ["namespace", "result"],
+)
+ERRORS = Counter(
+    "imagefastapi_errors",
+    "Errors by route and exception type",
+    ["route", "error_type"],
+)
+
+
+@contextmanager
+def time_stage(stage: str):
+    """
+    Observe the duration of the wrapped block as an upload pipeline stage.
+
+    Args:
+        stage (str): The stage name, e.g. "decode" or "write".
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        UPLOAD_STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+def record_error(route: str, exc: BaseException):
+    """
+    Count an error for the route. Service errors re-raised from an ``except`` block are counted by the
+    exception that caused them, so a generic 500 still shows what actually went wrong.
+    """
+    root = exc.__cause__ or exc.__context__ or exc
+    ERRORS.labels(route, type(root).__name__).inc()
+
+
+def route_name(request: Request) -> str:
+    route = request.scope.get("route")
+    return route.name if route else UNMATCHED_ROUTE
+
+
+async def metrics_middleware(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    except Exception as e:
+        record_error(route_name(request), e)
+        raise
+    finally:
+        REQUEST_LATENCY.labels(route_name(request), request.method, str(status_code)).observe(
+            time.perf_counter() - start
+        )
+
+
+def render_latest():
+    """
+    Return the exposition payload and its content type, aggregated over all workers in multiprocess mode.
+    """
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid: int):
+    """
+    Drop the live samples of an exited worker. Call it from gunicorn's ``child_exit`` hook in multiprocess mode.
+    """
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,46 @@
+import hmac
+import logging
+import random
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+from app.core import metrics
+from app.core.config import settings
+from app.utils.profiler import ProfileStore, SamplingProfiler
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+
+def has_profiling_token(request: Request) -> bool:
+    token = request.headers.get(PROFILE_HEADER)
+    if not (settings.PROFILING_SECRET and token):
+        return False
+    # Compared as bytes: compare_digest refuses non-ASCII strings, and Starlette decodes headers as latin-1
+    return hmac.compare_digest(token.encode("latin-1"), settings.PROFILING_SECRET.encode())
+
+
+def get_profile_store() -> ProfileStore:
+    return ProfileStore(settings.PROFILING_FOLDER, settings.PROFILING_MAX_FILES)
+
+
+async def profiling_middleware(request: Request, call_next):
+    if not has_profiling_token(request) or random.random() >= settings.PROFILING_SAMPLE_RATE:
+        return await call_next(request)
+
+    profiler = SamplingProfiler(interval=settings.PROFILING_INTERVAL_MS / 1000)
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+
+    name = f"{request.method}-{metrics.route_name(request)}"
+    profile_name = await run_in_threadpool(get_profile_store().save, name, profiler.to_speedscope(name))
+    logger.info(f"Request profiled: {request.method} {request.url.path} -> {profile_name}")
+
+    response.headers[PROFILE_ID_HEADER] = profile_name
+    return response
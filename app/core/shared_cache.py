@@ -0,0 +1,214 @@
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.lifespan import register_warmup
+
+logger = logging.getLogger(__name__)
+
+TAGS = "tags"
+IMAGES = "images"
+NAMESPACES = (TAGS, IMAGES)
+
+MAGIC = b"IFSC0001"
+# magic, slot count, slot size, then one generation counter per namespace
+HEADER = struct.Struct(f"<8sII{len(NAMESPACES)}Q")
+HEADER_SIZE = mmap.PAGESIZE
+# key hash, namespace generation, value version, value length, crc32 of all the other fields and the value
+SLOT_HEADER = struct.Struct("<QQQII")
+
+
+def _hash64(value) -> int:
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "little")
+
+
+class SharedCache:
+    """
+    A cache living in a memory-mapped file, shared by every worker process on the host, so hot read data
+    is held once rather than once per worker and a write in one worker is seen by all of them.
+
+    The file is a direct-mapped table of fixed-size slots: a key always goes to the same slot, and a newer
+    key hashing to that slot evicts the older one. Values too large for a slot are not cached. Reads take
+    no lock; a value torn by a concurrent write fails its checksum and counts as a miss.
+
+    An entry is returned only when both the version it was stored with matches the version the caller
+    asks for (e.g. the row version column), and its namespace has not been invalidated since. The file is
+    sparse, so only the slots actually written take up memory.
+    """
+
+    def __init__(self, path: str, slots: int, slot_size: int):
+        if slot_size <= SLOT_HEADER.size:
+            raise ValueError(f"Slot size must be larger than {SLOT_HEADER.size} bytes")
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.size = HEADER_SIZE + slots * slot_size
+        # fcntl locks are held per process, so they do not exclude the threads of one worker from each other
+        self.thread_lock = threading.Lock()
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self.fd = fd
+            with self._locked(0, HEADER_SIZE):
+                if os.fstat(fd).st_size != self.size or self._read_header(fd) != (slots, slot_size):
+                    # New file, or one laid out for other settings: start over
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, self.size)
+                    os.pwrite(fd, HEADER.pack(MAGIC, slots, slot_size, *[0] * len(NAMESPACES)), 0)
+            self.buffer = mmap.mmap(fd, self.size)
+        except BaseException:
+            os.close(fd)
+            raise
+
+    @staticmethod
+    def _read_header(fd):
+        magic, slots, slot_size, *_ = HEADER.unpack(os.pread(fd, HEADER.size, 0).ljust(HEADER.size, b"\0"))
+        return (slots, slot_size) if magic == MAGIC else None
+
+    @contextmanager
+    def _locked(self, start: int, length: int):
+        with self.thread_lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, length, start)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, length, start)
+
+    def close(self):
+        self.buffer.close()
+        os.close(self.fd)
+
+    def _generation_offset(self, namespace: str) -> int:
+        return HEADER.size - 8 * (len(NAMESPACES) - NAMESPACES.index(namespace))
+
+    def generation(self, namespace: str) -> int:
+        return struct.unpack_from("<Q", self.buffer, self._generation_offset(namespace))[0]
+
+    def invalidate(self, namespace: str):
+        """
+        Drop every entry of the namespace, in all workers at once.
+        """
+        offset = self._generation_offset(namespace)
+        with self._locked(0, HEADER_SIZE):
+            struct.pack_into("<Q", self.buffer, offset, self.generation(namespace) + 1)
+
+    def _slot(self, key_hash: int) -> int:
+        return HEADER_SIZE + (key_hash % self.slots) * self.slot_size
+
+    def _checksum(self, key_hash: int, generation: int, version: int, value) -> int:
+        return zlib.crc32(value, zlib.crc32(struct.pack("<QQQI", key_hash, generation, version, len(value))))
+
+    def get(self, namespace: str, key, version=None) -> Optional[bytes]:
+        key_hash, version = _hash64((namespace, key)), _hash64(version)
+        offset = self._slot(key_hash)
+        stored_hash, generation, stored_version, length, checksum = SLOT_HEADER.unpack_from(self.buffer, offset)
+        if (
+            stored_hash != key_hash
+            or stored_version != version
+            or generation != self.generation(namespace)
+            or length > self.slot_size - SLOT_HEADER.size
+        ):
+            return None
+
+        start = offset + SLOT_HEADER.size
+        value = self.buffer[start:start + length]
+        if self._checksum(stored_hash, generation, stored_version, value) != checksum:
+            return None
+        return value
+
+    def set(self, namespace: str, key, value: bytes, version=None, generation: Optional[int] = None) -> bool:
+        """
+        Args:
+            generation (int, optional): The namespace generation read before the value was loaded, so a value
+                loaded before a concurrent invalidation is not stored as current. The current one by default.
+
+        Returns:
+            bool: False when the value does not fit in a slot.
+        """
+        if len(value) > self.slot_size - SLOT_HEADER.size:
+            return False
+        key_hash, version = _hash64((namespace, key)), _hash64(version)
+        generation = self.generation(namespace) if generation is None else generation
+        checksum = self._checksum(key_hash, generation, version, value)
+
+        offset = self._slot(key_hash)
+        start = offset + SLOT_HEADER.size
+        with self._locked(offset, self.slot_size):
+            self.buffer[start:start + len(value)] = value
+            SLOT_HEADER.pack_into(self.buffer, offset, key_hash, generation, version, len(value), checksum)
+        return True
+
+    def delete(self, namespace: str, key):
+        key_hash = _hash64((namespace, key))
+        offset = self._slot(key_hash)
+        with self._locked(offset, self.slot_size):
+            if SLOT_HEADER.unpack_from(self.buffer, offset)[0] == key_hash:
+                SLOT_HEADER.pack_into(self.buffer, offset, 0, 0, 0, 0, 0)
+
+    def get_or_load(self, namespace: str, key, load: Callable[[], Optional[bytes]], version=None) -> Optional[bytes]:
+        """
+        Return the cached value, or the one ``load`` returns, caching it unless it is None.
+        """
+        value = self.get(namespace, key, version)
+        if value is not None:
+            metrics.SHARED_CACHE_REQUESTS.labels(namespace, "hit").inc()
+            return value
+
+        metrics.SHARED_CACHE_REQUESTS.labels(namespace, "miss").inc()
+        generation = self.generation(namespace)
+        value = load()
+        if value is not None:
+            self.set(namespace, key, value, version, generation)
+        return value
+
+
+_shared_cache: Optional[SharedCache] = None
+_shared_cache_failed = False
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """
+    Return the cache configured by SHARED_CACHE_PATH, opening it on first use, or None when it is disabled
+    or cannot be opened.
+    """
+    global _shared_cache, _shared_cache_failed
+    if _shared_cache is None and settings.SHARED_CACHE_PATH and not _shared_cache_failed:
+        with _shared_cache_lock:
+            if _shared_cache is None and not _shared_cache_failed:
+                try:
+                    _shared_cache = SharedCache(
+                        settings.SHARED_CACHE_PATH, settings.SHARED_CACHE_SLOTS, settings.SHARED_CACHE_SLOT_SIZE
+                    )
+                except OSError as e:
+                    logger.error(f"Could not open the shared cache {settings.SHARED_CACHE_PATH}: {e}")
+                    _shared_cache_failed = True
+    return _shared_cache
+
+
+def invalidate(*namespaces: str):
+    cache = get_shared_cache()
+    if cache is not None:
+        for namespace in namespaces:
+            cache.invalidate(namespace)
+
+
+def delete(namespace: str, key):
+    cache = get_shared_cache()
+    if cache is not None:
+        cache.delete(namespace, key)
+
+
+@register_warmup("shared_cache")
+def warm_shared_cache():
+    if settings.SHARED_CACHE_PATH and get_shared_cache() is None:
+        raise RuntimeError(f"Shared cache {settings.SHARED_CACHE_PATH} is unavailable")
@@ -0,0 +1,184 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Iterable, List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.lifespan import register_warmup
+from app.db import session
+from app.db.models import Tag, image_tags_association
+
+logger = logging.getLogger(__name__)
+
+
+class TagEntry(NamedTuple):
+    id: int
+    name: str
+    name_slug: str
+    image_count: int
+
+
+def _key(text: str) -> str:
+    return text.casefold()
+
+
+class TagIndex:
+    """
+    The tags of one worker in memory for prefix lookups: a sorted array of the casefolded names and slugs,
+    so the keys starting with a prefix are one contiguous range found by bisection, ranked by the number of
+    images carrying each tag with NumPy.
+
+    Tags added after the load are kept in a short list scanned linearly, until the next reload.
+    """
+
+    def __init__(self, tags: Iterable[TagEntry]):
+        self.tags: List[TagEntry] = list(tags)
+        keys = sorted(
+            {(_key(text), position) for position, tag in enumerate(self.tags) for text in (tag.name, tag.name_slug)}
+        )
+        self.keys = [key for key, _ in keys]
+        self.key_tags = np.fromiter((position for _, position in keys), dtype=np.int64, count=len(keys))
+        self.key_counts = np.array([self.tags[position].image_count for _, position in keys], dtype=np.int64)
+        self.added: List[TagEntry] = []
+        self.by_id = {tag.id: tag for tag in self.tags}
+
+    def add(self, tag: TagEntry):
+        if tag.id not in self.by_id:
+            self.added.append(tag)
+            self.by_id[tag.id] = tag
+
+    def suggest(self, prefix: str, limit: int) -> List[TagEntry]:
+        """
+        Return up to ``limit`` tags whose name or slug starts with ``prefix``, ignoring case, the most used first.
+        """
+        prefix = _key(prefix)
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + "\U0010ffff", lo=start)
+
+        counts = self.key_counts[start:end]
+        # A tag matches through its name and its slug at most: twice the limit leaves enough after dropping them
+        if len(counts) > 2 * limit:
+            best = np.argpartition(counts, len(counts) - 2 * limit)[-2 * limit:]
+        else:
+            best = np.arange(len(counts))
+        candidates = {self.tags[position] for position in self.key_tags[start:end][best].tolist()}
+        candidates.update(
+            tag for tag in self.added if _key(tag.name).startswith(prefix) or _key(tag.name_slug).startswith(prefix)
+        )
+        return sorted(candidates, key=lambda tag: (-tag.image_count, _key(tag.name)))[:limit]
+
+
+def load_tag_entries(db: Session) -> List[TagEntry]:
+    links = image_tags_association
+    query = (
+        select(Tag.id, Tag.name, Tag.name_slug, func.count(links.c.image_id))
+        .outerjoin(links, links.c.tag_id == Tag.id)
+        .group_by(Tag.id, Tag.name, Tag.name_slug)
+    )
+    return [TagEntry(id, name, name_slug or "", count) for id, name, name_slug, count in db.execute(query)]
+
+
+_tag_index: Optional[TagIndex] = None
+_loaded_at = 0.0
+_tag_index_lock = threading.Lock()
+# The background reload running, if any, and whether another one was asked for since it started
+_reload_thread: Optional[threading.Thread] = None
+_reload_again = False
+
+
+def _load(db: Session):
+    global _tag_index, _loaded_at
+    start = time.perf_counter()
+    loaded_at = time.monotonic()
+    _tag_index = TagIndex(load_tag_entries(db))
+    _loaded_at = loaded_at
+    logger.info(f"Tag index loaded: {len(_tag_index.tags)} tags in {time.perf_counter() - start:.3f}s")
+
+
+def _reload_in_background(bind):
+    global _reload_thread, _reload_again
+    while True:
+        try:
+            with Session(bind) as db:
+                _load(db)
+        except Exception:
+            # The previous index keeps being used, and the next stale lookup tries again
+            logger.exception("Tag index reload failed")
+        with _tag_index_lock:
+            if not _reload_again:
+                _reload_thread = None
+                return
+            _reload_again = False
+
+
+def _schedule_reload(bind, again: bool = False):
+    global _reload_thread, _reload_again
+    with _tag_index_lock:
+        if _reload_thread is None:
+            _reload_thread = threading.Thread(
+                target=_reload_in_background, args=(bind,), name="tag-index-reload", daemon=True
+            )
+            _reload_thread.start()
+        elif again:
+            # The running reload may have read the tags before the change
+            _reload_again = True
+
+
+def get_tag_index(db: Session) -> TagIndex:
+    """
+    Return the index of this worker, loading it on first use. Every TAG_SUGGEST_REFRESH_SECONDS it is reloaded
+    by a background thread, so lookups never wait for the reload and keep being answered from the previous one.
+    """
+    index = _tag_index
+    if index is None:
+        with _tag_index_lock:
+            if _tag_index is None:
+                _load(db)
+        return _tag_index
+
+    if time.monotonic() - _loaded_at >= settings.TAG_SUGGEST_REFRESH_SECONDS:
+        _schedule_reload(db.get_bind())
+    return index
+
+
+def add_tag(db: Session, tag: Tag):
+    """
+    Make a tag created by this worker suggested once the transaction of ``db`` commits, ahead of the next reload.
+    """
+    db.info.setdefault("new_tags", []).append(TagEntry(tag.id, tag.name, tag.name_slug or "", 0))
+
+
+def _add_committed_tags(db: Session):
+    index = _tag_index
+    for tag in db.info.pop("new_tags", []):
+        if index is not None:
+            index.add(tag)
+
+
+def _discard_new_tags(db: Session):
+    db.info.pop("new_tags", None)
+
+
+event.listen(Session, "after_commit", _add_committed_tags)
+event.listen(Session, "after_rollback", _discard_new_tags)
+
+
+def invalidate(db: Session):
+    """
+    Reload the index in the background after a rename or a merge, committed in ``db``.
+    """
+    _schedule_reload(db.get_bind(), again=True)
+
+
+@register_warmup("tag_index")
+def warm_tag_index():
+    db = session.SessionLocal()
+    try:
+        get_tag_index(db)
+    finally:
+        db.close()
@@ -0,0 +1,42 @@
+import io
+from typing import List, Sequence
+
+from sqlalchemy import Table
+
+_COPY_TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_text_value(value) -> str:
+    if value is None:
+        return "\\N"
+    return str(value).translate(_COPY_TEXT_ESCAPES)
+
+
+def copy_rows(connection, table: Table, columns: List[str], rows: Sequence[Sequence]):
+    """
+    Insert the rows in one round trip: with ``COPY ... FROM STDIN`` on Postgres, or an executemany
+    insert on the SQLite stand-in.
+
+    Args:
+        connection: The SQLAlchemy connection, whose transaction the rows are written in.
+        table (Table): The target table.
+        columns (list): The column names, in the order of the row values.
+        rows (Sequence): The row values. None is written as NULL.
+    """
+    if not rows:
+        return
+
+    if connection.dialect.name != "postgresql":
+        connection.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+        return
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_text_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
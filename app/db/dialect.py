@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, String, func, literal, type_coerce
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def get_insert(bind):
+    """
+    Return the dialect-specific ``insert`` construct of the bind, which supports ``on_conflict_do_*``
+    upserts on both Postgres and the SQLite stand-in used for local load tests.
+    """
+    if bind.dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
+
+
+def timestamp_param(bind, value: datetime):
+    """
+    Return ``value`` as a bind parameter comparable to the timestamps written by now(). The SQLite stand-in
+    stores those as text without fractional seconds, which SQLAlchemy's datetime parameters, rendered with
+    microseconds, would sort after within the same second.
+    """
+    if bind.dialect.name == "sqlite":
+        return literal(value.strftime("%Y-%m-%d %H:%M:%S"), String)
+    return literal(value, DateTime(timezone=True))
+
+
+def timestamp_column(bind, column):
+    """
+    Return ``column`` as compared with ``timestamp_param``: on the SQLite stand-in, truncated to the second, as
+    rows written from Python carry microseconds that those written by now() do not.
+    """
+    if bind.dialect.name == "sqlite":
+        return type_coerce(func.datetime(column), DateTime())
+    return column
@@ -1,11 +1,97 @@
-from sqlalchemy import event
+from collections import Counter
+from typing import Dict, Tuple
+
+from sqlalchemy import event, func, inspect
 from sqlalchemy.orm import Session
 from slugify import slugify
-from app.db.models import Tag
+from app.db.dialect import get_insert
+from app.db.models import ImageInfo, ImageTombstone, Tag
+from app.db.rollups import apply_date_rollup_deltas, apply_tag_pair_deltas, created_date_of, tag_pair_deltas
 
 def slugify_tag_name(session: Session, flush_context, instances):
     for instance in session.dirty | session.new:
         if isinstance(instance, Tag):
             instance.name_slug = slugify(instance.name)
 
-event.listen(Session, "before_flush", slugify_tag_name)
\ No newline at end of file
+def bump_row_version(session: Session, flush_context, instances):
+    for instance in session.dirty:
+        # An image's tag list is part of its representation, while a tag is unaffected by its image links
+        if (isinstance(instance, ImageInfo) and session.is_modified(instance)) or (
+            isinstance(instance, Tag) and session.is_modified(instance, include_collections=False)
+        ):
+            instance.version = instance.version + 1
+            instance.updated_at = func.now()
+
+def update_image_date_rollups(session: Session, flush_context, instances):
+    # created_at of a new image is only in the instance dict when it was set explicitly, otherwise the
+    # server default (the current date) applies
+    deltas = Counter()
+    for instance in session.new:
+        if isinstance(instance, ImageInfo):
+            deltas[created_date_of(inspect(instance).dict.get("created_at"))] += 1
+    for instance in session.deleted:
+        if isinstance(instance, ImageInfo):
+            deltas[created_date_of(instance.created_at)] -= 1
+
+    if deltas:
+        # The row of the current day is shared by every upload, so it is only upserted right before the commit
+        session.info.setdefault("date_rollup_deltas", Counter()).update(deltas)
+
+def record_image_tombstones(session: Session, flush_context, instances):
+    # An upsert, as the SQLite stand-in hands out the id of a deleted last row again
+    image_ids = [instance.id for instance in session.deleted if isinstance(instance, ImageInfo)]
+    if image_ids:
+        statement = get_insert(session.connection())(ImageTombstone).values([{"image_id": id} for id in image_ids])
+        statement = statement.on_conflict_do_update(
+            index_elements=[ImageTombstone.image_id], set_={"deleted_at": func.now()}
+        )
+        session.connection().execute(statement)
+
+def collect_image_tag_changes(session: Session, flush_context, instances):
+    # New tags get their id during the flush, so the tags themselves are kept until after it. The tags of a
+    # deleted image must be read now, before its links are gone.
+    changes = session.info["image_tag_changes"] = []
+    for instance in session.new | session.dirty:
+        if isinstance(instance, ImageInfo):
+            history = inspect(instance).attrs.tags.history
+            if history.added or history.deleted:
+                changes.append((list(history.unchanged) + list(history.deleted), list(instance.tags)))
+    for instance in session.deleted:
+        if isinstance(instance, ImageInfo):
+            changes.append((list(instance.tags), []))
+
+def defer_tag_pair_deltas(session: Session, deltas: Dict[Tuple[int, int], int]):
+    # The pair rows of a popular tag are shared by every transaction tagging it, so they are only upserted
+    # right before the commit instead of staying locked for the rest of the transaction
+    session.info.setdefault("tag_pair_deltas", Counter()).update(deltas)
+
+def update_tag_cooccurrences(session: Session, flush_context):
+    deltas = Counter()
+    for old_tags, new_tags in session.info.pop("image_tag_changes", []):
+        deltas.update(tag_pair_deltas([tag.id for tag in old_tags], [tag.id for tag in new_tags]))
+
+    if deltas:
+        defer_tag_pair_deltas(session, deltas)
+
+def apply_deferred_deltas(session: Session):
+    # Runs before the commit flushes, so the remaining changes are flushed first for their deltas to be included
+    session.flush()
+    date_deltas = session.info.pop("date_rollup_deltas", None)
+    if date_deltas:
+        apply_date_rollup_deltas(session.connection(), date_deltas)
+    pair_deltas = session.info.pop("tag_pair_deltas", None)
+    if pair_deltas:
+        apply_tag_pair_deltas(session.connection(), pair_deltas)
+
+def discard_deferred_deltas(session: Session):
+    session.info.pop("date_rollup_deltas", None)
+    session.info.pop("tag_pair_deltas", None)
+
+event.listen(Session, "before_flush", slugify_tag_name)
+event.listen(Session, "before_flush", bump_row_version)
+event.listen(Session, "before_flush", update_image_date_rollups)
+event.listen(Session, "before_flush", record_image_tombstones)
+event.listen(Session, "before_flush", collect_image_tag_changes)
+event.listen(Session, "after_flush", update_tag_cooccurrences)
+event.listen(Session, "before_commit", apply_deferred_deltas)
+event.listen(Session, "after_rollback", discard_deferred_deltas)
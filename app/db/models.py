@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Table, func
+from sqlalchemy import DDL, JSON, Column, Date, DateTime, ForeignKey, Index, Integer, String, Table, Text, event, func
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
@@ -21,9 +21,24 @@ class Tag(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(50), unique=True, index=True)
     name_slug = Column(String(50))  # For name_slug, it will automatically set with "before_flush_listener" event
+    # version and updated_at are bumped by the "bump_row_version" before_flush event on every change
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
     images = relationship("ImageInfo", secondary=image_tags_association, back_populates="tags")
 
+    # Trigram index for the fuzzy fallback of the tag autocomplete (Postgres only)
+    __table_args__ = (
+        Index("idx_tag_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(
+            dialect="postgresql"
+        ),
+    )
+
+
+event.listen(
+    Tag.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
 
 class ImageInfo(Base):
     __tablename__ = "images"
@@ -35,6 +50,153 @@ class ImageInfo(Base):
     height = Column(Integer)
     width = Column(Integer)
     file_size = Column(Integer)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # version and updated_at are bumped by the "bump_row_version" before_flush event on every change,
+    # including changes of the tag list
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # sha256 of the originally uploaded file, used by the bulk importer to skip files it already imported
+    content_hash = Column(String(64), index=True)
+    # Computed at ingest (or by app.cli.backfill_placeholders) so clients can render a preview right away:
+    # the BlurHash, and the dominant colours as comma separated hex codes, most common first
+    blurhash = Column(String(64))
+    palette = Column(String(64))
 
     tags = relationship("Tag", secondary=image_tags_association, back_populates="images")
+    variants = relationship("ImageVariant", order_by="ImageVariant.width", cascade="all, delete-orphan")
+
+    # Serves the change feed, which pages through the images by (updated_at, id)
+    __table_args__ = (Index("idx_image_updated_at_id", "updated_at", "id"),)
+
+
+class ImageTombstone(Base):
+    """
+    A deleted image, recorded by the "record_image_tombstones" before_flush event so the change feed can report
+    the delete. Kept for CHANGE_FEED_RETENTION_DAYS.
+    """
+    __tablename__ = "image_tombstones"
+
+    image_id = Column(Integer, primary_key=True)
+    # now() like updated_at, so deletes and updates are ordered on the same clock
+    deleted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (Index("idx_image_tombstone_deleted_at_id", "deleted_at", "image_id"),)
+
+
+class ImageVariant(Base):
+    """
+    A downscaled copy of an image produced at upload, one per configured width narrower than the image.
+    """
+    __tablename__ = "image_variants"
+
+    id = Column(Integer, primary_key=True)
+    image_id = Column(Integer, ForeignKey("images.id", ondelete="CASCADE"), nullable=False, index=True)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    format = Column(String(10), nullable=False)  # jpeg or webp
+    file_size = Column(Integer, nullable=False)
+    key = Column(String, nullable=False)  # storage key of the encoded variant
+
+
+class ImageDateRollup(Base):
+    """
+    Number of images created per day, maintained on every insert and delete of ImageInfo so date
+    histograms never scan the images table.
+    """
+    __tablename__ = "image_date_rollups"
+
+    bucket_date = Column(Date, primary_key=True)
+    image_count = Column(Integer, nullable=False, default=0)
+
+
+class TagCooccurrence(Base):
+    """
+    Number of images carrying both tags, stored in both directions, maintained on every change of the image
+    tags so related tags never self-join the links. The row of a tag with itself holds its own image count.
+    """
+    __tablename__ = "tag_cooccurrences"
+
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    related_tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    image_count = Column(Integer, nullable=False, default=0)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded or failed
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime(timezone=True), nullable=False)  # not before this time, for retry backoff
+    locked_until = Column(DateTime(timezone=True))  # lease of the worker running the job
+    last_error = Column(Text)
+    result_id = Column(Integer)  # id of the row the job created, e.g. the image of an upload
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (Index("idx_job_status_run_at", "status", "run_at"),)
+
+
+class UploadSession(Base):
+    """
+    A resumable upload: chunks are appended to a temporary file until the upload is finalized into an image.
+    """
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)
+    filename = Column(String(255), nullable=False)
+    ext = Column(String(10))
+    image_data = Column(JSON, nullable=False)
+    total_size = Column(Integer)  # announced by the client when known
+    received = Column(Integer, nullable=False, default=0)  # bytes appended so far: the offset of the next chunk
+    status = Column(String(20), nullable=False, default="open")  # open, finalizing or completed
+    result_id = Column(Integer)  # id of the image created on finalize
+    job_id = Column(Integer)  # id of the job processing the upload when finalized with ASYNC_UPLOADS
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # pushed back on every chunk
+
+
+class IdempotencyKey(Base):
+    """
+    The stored response of a request sent with an ``Idempotency-Key`` header, replayed when it is retried.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # hash of the request the key was first used with
+    status_code = Column(Integer)  # None while the first request is still in progress
+    response_body = Column(JSON)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class ImagePyramid(Base):
+    """
+    A Deep Zoom tile pyramid of a very large upload, cut from the full size original kept in ``source_key``
+    rather than from the shrunk image stored for ``ImageInfo.image``.
+    """
+    __tablename__ = "image_pyramids"
+
+    image_id = Column(Integer, ForeignKey("images.id", ondelete="CASCADE"), primary_key=True)
+    source_key = Column(String, nullable=False)
+    width = Column(Integer, nullable=False)  # of the original, the full resolution level
+    height = Column(Integer, nullable=False)
+    tile_size = Column(Integer, nullable=False)
+    overlap = Column(Integer, nullable=False)
+    format = Column(String(10), nullable=False)  # file type of the tiles, jpeg or png
+    status = Column(String(20), nullable=False, default="pending")  # pending, building or ready
+    claimed_at = Column(DateTime(timezone=True))  # when the build started, to take over a crashed one
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ImageTile(Base):
+    __tablename__ = "image_tiles"
+
+    image_id = Column(Integer, ForeignKey("images.id", ondelete="CASCADE"), primary_key=True)
+    level = Column(Integer, primary_key=True)
+    col = Column(Integer, primary_key=True)
+    row = Column(Integer, primary_key=True)
+    key = Column(String, nullable=False)  # storage key of the encoded tile
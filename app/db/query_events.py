@@ -0,0 +1,95 @@
+import contextvars
+import logging
+import time
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_LOGGED_STATEMENT_LENGTH = 2000
+
+
+class QueryStats:
+    """
+    SQL statement count and timings collected for a single request.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_time += elapsed
+        if elapsed >= self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.total_time * 1000:.2f};desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest_time * 1000:.2f}"
+        )
+
+
+_request_stats: contextvars.ContextVar[QueryStats] = contextvars.ContextVar("request_query_stats", default=None)
+
+
+def get_request_stats():
+    return _request_stats.get()
+
+
+def _redact(statement: str, parameters, executemany: bool) -> str:
+    # Bound parameters can carry user data (titles, descriptions), so only their shape is logged
+    if executemany:
+        redacted = f"{len(parameters)} parameter sets redacted"
+    else:
+        redacted = f"{len(parameters or ())} parameters redacted"
+    return f"{statement[:MAX_LOGGED_STATEMENT_LENGTH]} [{redacted}]"
+
+
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context.query_start_time = time.perf_counter()
+
+
+def record_query_time(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.query_start_time
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+    if elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        metrics.DB_SLOW_QUERIES.inc()
+        logger.warning(f"Slow query ({elapsed * 1000:.1f} ms): {_redact(statement, parameters, executemany)}")
+
+
+event.listen(Engine, "before_cursor_execute", start_query_timer)
+event.listen(Engine, "after_cursor_execute", record_query_time)
+
+
+async def query_stats_middleware(request: Request, call_next):
+    stats = QueryStats()
+    token = _request_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        _request_stats.reset(token)
+
+    route = metrics.route_name(request)
+    metrics.DB_QUERIES_PER_REQUEST.labels(route).observe(stats.count)
+    metrics.DB_TIME_PER_REQUEST.labels(route).observe(stats.total_time)
+    if stats.count:
+        response.headers.append("Server-Timing", stats.server_timing())
+        logger.debug(
+            f"{route}: {stats.count} queries in {stats.total_time * 1000:.1f} ms, "
+            f"slowest {stats.slowest_time * 1000:.1f} ms: {stats.slowest_statement[:MAX_LOGGED_STATEMENT_LENGTH]}"
+        )
+    return response
@@ -0,0 +1,133 @@
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import Date, cast, delete, distinct, func, insert, select
+
+from app.db.dialect import get_insert
+from app.db.models import ImageDateRollup, ImageInfo, TagCooccurrence, image_tags_association
+
+# Images whose links are read per statement when computing the co-occurrence changes of set-based link changes
+LINK_PAIR_BATCH_SIZE = 1000
+
+
+def created_date_of(created_at) -> Optional[date]:
+    """
+    Return the rollup bucket of a ``created_at`` value, or None when the database fills it in.
+    """
+    if isinstance(created_at, datetime):
+        return created_at.date()
+    return created_at
+
+
+def apply_date_rollup_deltas(connection, deltas: Dict[Optional[date], int]):
+    """
+    Add the image count deltas to the per-day rollups. The None bucket stands for the current date of the
+    database, which is what ``created_at`` defaults to.
+    """
+    upsert = get_insert(connection)
+    for bucket_date, delta in deltas.items():
+        if not delta:
+            continue
+        statement = upsert(ImageDateRollup).values(
+            bucket_date=func.current_date() if bucket_date is None else bucket_date,
+            image_count=delta,
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[ImageDateRollup.bucket_date],
+            set_={"image_count": ImageDateRollup.image_count + statement.excluded.image_count},
+        )
+        connection.execute(statement)
+
+
+def rebuild_date_rollups(connection):
+    """
+    Recompute every per-day rollup from the images table, e.g. after a bulk load that bypassed the ORM.
+    """
+    created_date = cast(ImageInfo.created_at, Date)
+    connection.execute(delete(ImageDateRollup))
+    connection.execute(
+        insert(ImageDateRollup).from_select(
+            ["bucket_date", "image_count"],
+            select(created_date, func.count(ImageInfo.id)).group_by(created_date),
+        )
+    )
+
+
+def tag_pair_deltas(old_tag_ids: Iterable[int], new_tag_ids: Iterable[int]) -> Counter:
+    """
+    Return the co-occurrence count changes of an image whose tags go from ``old_tag_ids`` to ``new_tag_ids``:
+    every ordered pair of its tags, including each tag with itself.
+    """
+    old_tag_ids, new_tag_ids = set(old_tag_ids), set(new_tag_ids)
+    deltas = Counter()
+    for a in old_tag_ids | new_tag_ids:
+        for b in old_tag_ids | new_tag_ids:
+            delta = ((a in new_tag_ids) and (b in new_tag_ids)) - ((a in old_tag_ids) and (b in old_tag_ids))
+            if delta:
+                deltas[(a, b)] += delta
+    return deltas
+
+
+def link_pair_deltas(connection, added: Iterable[Tuple[int, int]], removed: Iterable[Tuple[int, int]]) -> Counter:
+    """
+    Return the co-occurrence count changes of set-based link changes that bypassed the ORM, from the
+    (image id, tag id) links inserted and deleted, once both are done. Only the links of the images they touch
+    are read, however many images carry the tags.
+    """
+    added_by_image, removed_by_image = defaultdict(set), defaultdict(set)
+    for image_id, tag_id in added:
+        added_by_image[image_id].add(tag_id)
+    for image_id, tag_id in removed:
+        removed_by_image[image_id].add(tag_id)
+
+    image_ids = sorted(added_by_image.keys() | removed_by_image.keys())
+    links = image_tags_association
+    deltas = Counter()
+    for start in range(0, len(image_ids), LINK_PAIR_BATCH_SIZE):
+        batch = image_ids[start:start + LINK_PAIR_BATCH_SIZE]
+        current = defaultdict(set)
+        for image_id, tag_id in connection.execute(
+            select(links.c.image_id, links.c.tag_id).where(links.c.image_id.in_(batch))
+        ):
+            current[image_id].add(tag_id)
+        for image_id in batch:
+            new_tag_ids = current[image_id]
+            old_tag_ids = (new_tag_ids - added_by_image[image_id]) | removed_by_image[image_id]
+            deltas.update(tag_pair_deltas(old_tag_ids, new_tag_ids))
+    return deltas
+
+
+def apply_tag_pair_deltas(connection, deltas: Dict[Tuple[int, int], int]):
+    """
+    Add the co-occurrence count deltas, keyed by (tag id, related tag id), to the stored counts.
+    """
+    rows = [
+        {"tag_id": tag_id, "related_tag_id": related_tag_id, "image_count": delta}
+        for (tag_id, related_tag_id), delta in sorted(deltas.items())
+        if delta
+    ]
+    if not rows:
+        return
+    statement = get_insert(connection)(TagCooccurrence)
+    statement = statement.on_conflict_do_update(
+        index_elements=[TagCooccurrence.tag_id, TagCooccurrence.related_tag_id],
+        set_={"image_count": TagCooccurrence.image_count + statement.excluded.image_count},
+    )
+    connection.execute(statement, rows)
+
+
+def rebuild_tag_pairs(connection):
+    """
+    Recompute every co-occurrence count from the links, e.g. after a bulk load that bypassed the ORM.
+    """
+    a, b = image_tags_association.alias("a"), image_tags_association.alias("b")
+    pair_counts = (
+        select(a.c.tag_id, b.c.tag_id, func.count(distinct(a.c.image_id)))
+        .select_from(a.join(b, a.c.image_id == b.c.image_id))
+        .group_by(a.c.tag_id, b.c.tag_id)
+    )
+    connection.execute(delete(TagCooccurrence))
+    connection.execute(
+        insert(TagCooccurrence).from_select(["tag_id", "related_tag_id", "image_count"], pair_counts)
+    )
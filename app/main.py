@@ -5,11 +5,22 @@ from fastapi.encoders import jsonable_encoder
 from pydantic import ValidationError
 
 from app.api.router import router as api_router
+from app.core.admission import AdmissionControlMiddleware
 from app.core.config import settings
+from app.core.lifespan import lifespan
+from app.core.metrics import metrics_middleware
+from app.core.profiling import profiling_middleware
+from app.db.query_events import query_stats_middleware
 
 logging.config.dictConfig(settings.LOGGING_CONFIG)
 
-app = FastAPI()
+# Warms the connection pool, image codecs and in-memory indexes before the worker reports ready
+app = FastAPI(lifespan=lifespan)
+# Innermost, so the metrics and profiling middlewares still see the requests it turns away
+app.add_middleware(AdmissionControlMiddleware)
+app.middleware("http")(profiling_middleware)
+app.middleware("http")(query_stats_middleware)
+app.middleware("http")(metrics_middleware)
 
 @app.exception_handler(ValidationError)
 async def validation_exception_handler(request: Request, exc: ValueError):
@@ -1,11 +1,41 @@
 import json
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, field_validator, model_validator
+from pydantic import AliasChoices, BaseModel, Field, field_validator, model_validator
 
 from .tag import TagBase
 
+PALETTE_SEPARATOR = ","
+
+
+VARIANT_URL = "/image_api/image/{image_id}/variants/{width}.{format}"
+
+
+def split_palette(palette: Optional[str]) -> List[str]:
+    return palette.split(PALETTE_SEPARATOR) if palette else []
+
+
+def variant_to_dict(variant) -> dict:
+    return {
+        "url": VARIANT_URL.format(image_id=variant.image_id, width=variant.width, format=variant.format),
+        "width": variant.width,
+        "height": variant.height,
+        "file_size": variant.file_size,
+    }
+
+
+class ImageVariant(BaseModel):
+    url: str
+    width: int
+    height: int
+    file_size: int
+
+    @model_validator(mode="before")
+    @classmethod
+    def validate_from_row(cls, value):
+        return value if isinstance(value, dict) else variant_to_dict(value)
+
 
 class ImageInfoBase(BaseModel):
     title: str
@@ -39,19 +69,57 @@ class ImageInfo(ImageInfoBase):
     width: int
     file_size: int
     created_at: datetime
+    updated_at: datetime
+    blurhash: Optional[str] = None
+    palette: List[str] = []
+    # Narrowest first, for the client to pick the smallest one wide enough
+    srcset: List[ImageVariant] = Field(default=[], validation_alias=AliasChoices("srcset", "variants"))
     tags: List[TagBase] = []
 
+    @field_validator("palette", mode="before")
+    @classmethod
+    def validate_palette(cls, palette):
+        return split_palette(palette) if palette is None or isinstance(palette, str) else palette
+
     class Config:
         from_attributes = True
 
 
-class ImageInfoFilters(BaseModel):
-    offset: Optional[int] = 0
-    limit: Optional[int] = None
+# How each field of ``ImageInfo`` is read from an ORM row, in the order of the fields
+IMAGE_INFO_FIELDS = {
+    "title": lambda image: image.title,
+    "description": lambda image: image.description,
+    "id": lambda image: image.id,
+    "height": lambda image: image.height,
+    "width": lambda image: image.width,
+    "file_size": lambda image: image.file_size,
+    "created_at": lambda image: image.created_at,
+    "updated_at": lambda image: image.updated_at,
+    "blurhash": lambda image: image.blurhash,
+    "palette": lambda image: split_palette(image.palette),
+    "srcset": lambda image: [variant_to_dict(variant) for variant in image.variants],
+    "tags": lambda image: [{"name": tag.name} for tag in image.tags],
+}
+# The fields read from the related tables rather than from a column of the images table
+IMAGE_INFO_RELATION_FIELDS = ("srcset", "tags")
+
+
+def image_info_to_dict(image, fields: Optional[List[str]] = None) -> dict:
+    """
+    Build the ``ImageInfo`` representation of an ORM row directly, without pydantic validation, restricted to
+    ``fields`` when given. Used by the listing and streaming endpoints, so ``IMAGE_INFO_FIELDS`` must be kept in
+    sync with the fields of ``ImageInfo``.
+    """
+    if fields is None:
+        return {field: get(image) for field, get in IMAGE_INFO_FIELDS.items()}
+    return {field: IMAGE_INFO_FIELDS[field](image) for field in fields}
+
+
+class CreatedDateFilters(BaseModel):
+    # Dates as YYYYMMDD: one day, or an inclusive range open on either side
     created_date: Optional[str] = None
     created_date__after: Optional[str] = None
     created_date__before: Optional[str] = None
-    random: Optional[bool] = False
 
     @field_validator("created_date", "created_date__after", "created_date__before", mode="before")
     @classmethod
@@ -74,3 +142,99 @@ class ImageInfoFilters(BaseModel):
             raise ValueError("created_date cannot be used with created_date__after or created_date__before.")
 
         return self
+
+
+class ImageInfoFilters(CreatedDateFilters):
+    offset: Optional[int] = 0
+    limit: Optional[int] = None
+    random: Optional[bool] = False
+    # Comma separated names of the ImageInfo fields to return, all of them when unset, e.g. "id,width,height,srcset"
+    fields: Optional[str] = None
+
+    @property
+    def field_names(self) -> Optional[List[str]]:
+        return self.fields.split(",") if self.fields else None
+
+    @field_validator("fields")
+    @classmethod
+    def validate_fields(cls, fields: Optional[str]):
+        if fields is None:
+            return fields
+        names = {name.strip() for name in fields.split(",")} - {""}
+        unknown = names - IMAGE_INFO_FIELDS.keys()
+        if unknown or not names:
+            raise ValueError(f"Invalid fields. Expected a comma separated list of: {', '.join(IMAGE_INFO_FIELDS)}.")
+        # In the order of the representation, so every spelling of the same set returns the same rows
+        return ",".join(field for field in IMAGE_INFO_FIELDS if field in names)
+
+
+class ImageSimilarQuery(CreatedDateFilters):
+    k: int = Field(default=10, ge=1, le=100)
+
+
+class SimilarImage(BaseModel):
+    # Dot product of the two embeddings, from 0 (nothing alike) to 1 (same colours and layout)
+    score: float
+    image: ImageInfo
+
+
+class ImageChangesQuery(BaseModel):
+    since: Optional[str] = None
+    limit: int = Field(default=100, ge=1, le=1000)
+
+
+class ImageChange(BaseModel):
+    op: Literal["created", "updated", "deleted"]
+    id: int
+    # updated_at of the image, or when it was deleted
+    changed_at: datetime
+    image: Optional[ImageInfo] = None
+
+
+class ImageChanges(BaseModel):
+    changes: List[ImageChange]
+    # Pass as since to get the next page, or the changes made from now on once has_more is false
+    next: str
+    has_more: bool
+
+
+class ImageTagsBulkUpdate(CreatedDateFilters):
+    # The images: these ids, or the ones matching the filters (tags, as in the listing, selects the images
+    # carrying any of them). Both together select the ids that also match the filters.
+    image_ids: Optional[List[int]] = None
+    tags: Optional[List[str]] = None
+    add: List[str] = []
+    remove: List[str] = []
+
+    @model_validator(mode="after")
+    def validate_selection(self):
+        # Retagging every image must not be what an empty body does
+        if self.image_ids is None and not (
+            self.tags or self.created_date or self.created_date__after or self.created_date__before
+        ):
+            raise ValueError("Select the images with image_ids or at least one filter.")
+        if not self.add and not self.remove:
+            raise ValueError("Nothing to do: add or remove is required.")
+        return self
+
+
+class ImageTagsBulkResult(BaseModel):
+    updated_images: int
+    added_links: int
+    removed_links: int
+
+
+class ImageDateHistogramQuery(CreatedDateFilters):
+    bucket: Literal["day", "month"] = "day"
+
+
+class ImageDateHistogramBucket(BaseModel):
+    bucket: date
+    count: int
+
+
+class ImageExportQuery(BaseModel):
+    format: Literal["ndjson", "csv"] = "ndjson"
+    after_id: int = 0
+    until_id: Optional[int] = None
+    gzip: bool = False
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Literal
 
 class TagBase(BaseModel):
     name: str
@@ -13,3 +13,27 @@ class Tag(TagBase):
 
     class Config:
         from_attributes = True
+
+class TagUpdate(TagBase):
+    pass
+
+class TagMerge(BaseModel):
+    # The tag the images are moved to, which is kept
+    into_id: int
+
+class TagSuggestQuery(BaseModel):
+    prefix: str = Field(min_length=1, max_length=50)
+    limit: int = Field(default=10, ge=1, le=50)
+
+class TagSuggestion(Tag):
+    image_count: int
+
+class RelatedTagsQuery(BaseModel):
+    k: int = Field(default=10, ge=1, le=100)
+    metric: Literal["jaccard", "lift"] = "jaccard"
+    min_count: int = Field(default=1, ge=1)
+
+class RelatedTag(Tag):
+    # Images carrying both tags
+    image_count: int
+    score: float
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from .image_info import ImageInfoCreate
+
+
+class UploadSessionCreate(ImageInfoCreate):
+    filename: str
+    total_size: Optional[int] = Field(default=None, ge=0)
+
+
+class UploadSession(BaseModel):
+    id: str
+    filename: str
+    total_size: Optional[int] = None
+    received: int
+    status: str
+    result_id: Optional[int] = None
+    job_id: Optional[int] = None
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
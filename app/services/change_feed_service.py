@@ -0,0 +1,165 @@
+import base64
+import binascii
+import heapq
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, func, literal, null, select, text, tuple_
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.db.dialect import timestamp_column, timestamp_param
+from app.db.models import ImageInfo, ImageTombstone
+from app.services.job_service import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Start of the oldest transaction of a client connection still running on the database. Every row a transaction
+# writes carries now(), its start time, so no change older than that can still become visible. Autovacuum and the
+# other background processes, and idle connections, are left out. Includes the current transaction, so never NULL.
+OLDEST_TRANSACTION = text(
+    "SELECT min(xact_start) FROM pg_stat_activity"
+    " WHERE datname = current_database() AND backend_type = 'client backend' AND state <> 'idle'"
+)
+
+
+class ChangeFeedTokenError(Exception):
+    pass
+
+class ChangeFeedExpiredError(Exception):
+    pass
+
+
+def encode_token(changed_at: datetime, image_id: int, started_at: datetime) -> str:
+    raw = f"{changed_at.isoformat()}|{image_id}|{started_at.isoformat()}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Tuple[datetime, int, datetime]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        changed_at, image_id, started_at = raw.split("|")
+        return datetime.fromisoformat(changed_at), int(image_id), datetime.fromisoformat(started_at)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise ChangeFeedTokenError("Invalid change token")
+
+
+def _aware(value: datetime) -> datetime:
+    # The SQLite stand-in returns naive UTC timestamps
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class ChangeFeedService:
+    """
+    The creates, updates and deletes of images in the order they became visible, read from the
+    (updated_at, id) index of the images and the (deleted_at, image_id) index of the tombstones, so a page
+    costs the same however large the catalog is.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _watermark(self) -> datetime:
+        if self.db.get_bind().dialect.name == "postgresql":
+            return self.db.scalar(OLDEST_TRANSACTION)
+        # The SQLite stand-in stamps rows with the current second, so only the seconds already over are complete
+        return self.db.scalar(select(func.current_timestamp()))
+
+    def _page(self, timestamp, id_column, after: Optional[Tuple[datetime, int]], before: datetime, limit: int,
+              *columns) -> list:
+        bind = self.db.get_bind()
+        timestamp = timestamp_column(bind, timestamp)
+        query = select(timestamp, id_column, *columns).where(timestamp < timestamp_param(bind, before))
+        if after is not None:
+            query = query.where(tuple_(timestamp, id_column) > tuple_(timestamp_param(bind, after[0]), after[1]))
+        return self.db.execute(query.order_by(timestamp, id_column).limit(limit)).all()
+
+    @staticmethod
+    def _is_new(created_at: Optional[datetime], changed_at: datetime, after: Optional[Tuple[datetime, int]]) -> bool:
+        # New to the client: created after its position, or not changed since the transaction that created it,
+        # whose now() both timestamps hold however many times the version was bumped during its flushes
+        if after is None:
+            return True
+        if created_at is None:
+            return False
+        return _aware(created_at) > _aware(after[0]) or _aware(created_at) == _aware(changed_at)
+
+    def get_changes(self, since: Optional[str], limit: int) -> dict:
+        """
+        Return the changes after the ``since`` token, the oldest first, from the beginning when it is None.
+
+        Changes are only returned once every transaction that could still commit an older one is over, so
+        a change never shows up behind a token already handed out. The feed therefore lags behind the longest
+        open transaction on the database, idle in transaction included: while an export, an import or any other
+        long transaction runs, later changes are held back and the pages come back empty. An image changed several times since the
+        token is returned once, with its current state.
+
+        Args:
+            since (str): The ``next`` token of the previous page, or None for the first sync.
+            limit (int): The maximum number of changes.
+
+        Returns:
+            dict: ``changes``, a list of dicts with ``op`` ("created", "updated" or "deleted"), ``id``,
+                ``changed_at`` and ``image`` (None for deletes), ``next``, the token to pass as ``since`` for the
+                next page, and ``has_more``, whether the next page is already available.
+
+        Raises:
+            ChangeFeedTokenError: When the token cannot be decoded.
+            ChangeFeedExpiredError: When both the position of the token and the start of the sync that issued it
+                are older than the tombstones kept, so deletes may be missing.
+        """
+        # Taken first: whatever committed before it is visible to the statements below
+        watermark = self._watermark()
+
+        after, started_at = None, watermark
+        if since:
+            changed_at, image_id, started_at = decode_token(since)
+            after = changed_at, image_id
+            # A delete the client still has to see happened after the image was sent, so after the sync that sent
+            # it started, and after the position of the token: its tombstone is kept as long as either is recent
+            purged_before = utcnow() - timedelta(days=settings.CHANGE_FEED_RETENTION_DAYS)
+            if max(_aware(changed_at), _aware(started_at)) < purged_before:
+                raise ChangeFeedExpiredError("The change token has expired, the catalog must be synced again")
+        created_at = timestamp_column(self.db.get_bind(), ImageInfo.created_at)
+        updates = self._page(
+            ImageInfo.updated_at, ImageInfo.id, after, watermark, limit + 1, created_at, literal(False)
+        )
+        deletes = self._page(
+            ImageTombstone.deleted_at, ImageTombstone.image_id, after, watermark, limit + 1, null(), literal(True)
+        )
+        rows = list(heapq.merge(updates, deletes, key=lambda row: (row[0], row[1])))
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        image_ids = [image_id for _, image_id, _, deleted in rows if not deleted]
+        query = self.db.query(ImageInfo).filter(ImageInfo.id.in_(image_ids)).options(
+            selectinload(ImageInfo.tags), selectinload(ImageInfo.variants)
+        )
+        images = {image.id: image for image in query}
+
+        changes = []
+        for changed_at, image_id, created_at, deleted in rows:
+            if deleted:
+                changes.append({"op": "deleted", "id": image_id, "changed_at": changed_at, "image": None})
+            # An image deleted since the first query is skipped: its tombstone comes in a later page
+            elif image_id in images:
+                op = "created" if self._is_new(created_at, changed_at, after) else "updated"
+                changes.append({"op": op, "id": image_id, "changed_at": changed_at, "image": images[image_id]})
+
+        if rows:
+            next_token = encode_token(rows[-1][0], rows[-1][1], started_at)
+        elif after is None or watermark > after[0]:
+            # Nothing is left before the watermark, so the next poll can start from it, which also keeps the
+            # token of a client without changes from expiring
+            next_token = encode_token(watermark, 0, watermark)
+        else:
+            next_token = since
+        return {"changes": changes, "next": next_token, "has_more": has_more}
+
+    def purge_expired(self):
+        cutoff = utcnow() - timedelta(days=settings.CHANGE_FEED_RETENTION_DAYS)
+        self.db.execute(
+            delete(ImageTombstone).where(ImageTombstone.deleted_at < timestamp_param(self.db.get_bind(), cutoff)),
+            execution_options={"synchronize_session": False},
+        )
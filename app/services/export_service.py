@@ -0,0 +1,141 @@
+import csv
+import io
+import zlib
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+
+from app.db.models import ImageInfo
+from app.schemas.image_info import image_info_to_dict
+
+EXPORT_FORMATS = ("ndjson", "csv")
+CSV_COLUMNS = ["id", "title", "description", "image", "height", "width", "file_size", "created_at", "updated_at", "tags"]
+CSV_TAG_SEPARATOR = "|"
+
+# Rows fetched per round trip of the server-side cursor, and encoded per chunk of output
+EXPORT_BATCH_SIZE = 1000
+
+
+def export_row(image) -> dict:
+    row = image_info_to_dict(image)
+    row["image"] = image.image
+    return row
+
+
+class ExportService:
+    """
+    Export the whole catalog ordered by id, reading it through a single server-side cursor instead of
+    offset pages. A range ``(after_id, until_id]`` can be exported on its own, so an interrupted export
+    resumes from the last emitted id and the id space can be split between parallel workers.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_id_range(self) -> Tuple[Optional[int], Optional[int]]:
+        return self.db.query(func.min(ImageInfo.id), func.max(ImageInfo.id)).one()
+
+    def split_id_range(self, parts: int) -> List[Tuple[int, Optional[int]]]:
+        """
+        Split the id space into at most ``parts`` contiguous ``(after_id, until_id]`` ranges of similar width.
+        """
+        min_id, max_id = self.get_id_range()
+        if min_id is None:
+            return [(0, None)]
+
+        start = min_id - 1
+        width = max(1, -(-(max_id - start) // parts))
+        bounds = list(range(start, max_id, width)) + [max_id]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def iter_images(self, after_id: int = 0, until_id: Optional[int] = None) -> Iterator[ImageInfo]:
+        query = (
+            self.db.query(ImageInfo)
+            .options(selectinload(ImageInfo.tags), selectinload(ImageInfo.variants))
+            .filter(ImageInfo.id > after_id)
+        )
+        if until_id is not None:
+            query = query.filter(ImageInfo.id <= until_id)
+
+        # yield_per streams the results, which psycopg2 serves from a named (server-side) cursor
+        yield from query.order_by(ImageInfo.id).yield_per(EXPORT_BATCH_SIZE)
+
+    def iter_export_batches(
+        self, export_format: str, after_id: int = 0, until_id: Optional[int] = None
+    ) -> Iterator[Tuple[int, bytes]]:
+        """
+        Yield the encoded export of the range in batches, each with the id of its last image, which is where
+        an interrupted export resumes.
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+
+        encode = encode_ndjson if export_format == "ndjson" else encode_csv
+        batch = []
+        for image in self.iter_images(after_id, until_id):
+            batch.append(export_row(image))
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield batch[-1]["id"], encode(batch)
+                batch = []
+        if batch:
+            yield batch[-1]["id"], encode(batch)
+
+    def iter_export(
+        self, export_format: str, after_id: int = 0, until_id: Optional[int] = None, header: bool = True
+    ) -> Iterator[bytes]:
+        """
+        Yield the encoded export of the range in chunks.
+
+        Args:
+            export_format (str): "ndjson" or "csv".
+            after_id (int): Only export images with a greater id.
+            until_id (int): Only export images with this id or lower.
+            header (bool): Whether to start a CSV export with the header row.
+        """
+        if export_format == "csv" and header:
+            yield encode_csv_header()
+        for _, chunk in self.iter_export_batches(export_format, after_id, until_id):
+            yield chunk
+
+
+def encode_ndjson(rows: List[dict]) -> bytes:
+    return b"".join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+def encode_csv_header() -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(CSV_COLUMNS)
+    return buffer.getvalue().encode()
+
+
+def encode_csv(rows: List[dict]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        row["tags"] = CSV_TAG_SEPARATOR.join(tag["name"] for tag in row["tags"])
+        row["created_at"] = row["created_at"].isoformat() if row["created_at"] else ""
+        row["updated_at"] = row["updated_at"].isoformat() if row["updated_at"] else ""
+        writer.writerow([row[column] for column in CSV_COLUMNS])
+    return buffer.getvalue().encode()
+
+
+def gzip_member(data: bytes) -> bytes:
+    """
+    Compress the data into a complete gzip member. Members can be appended to a file one after another.
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    return compressor.compress(data) + compressor.flush()
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Compress a stream of chunks into a single gzip member without buffering the whole output.
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
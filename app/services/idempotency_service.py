@@ -0,0 +1,92 @@
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.dialect import get_insert
+from app.db.models import IdempotencyKey
+from app.services.job_service import utcnow
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyInProgressError(Exception):
+    pass
+
+
+class IdempotencyKeyMismatchError(Exception):
+    pass
+
+
+def request_fingerprint(*parts) -> str:
+    return hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+class IdempotencyService:
+    """
+    Make a non-idempotent request safe to retry: the first request with a key records it, and a retry with
+    the same key and the same request gets the stored response instead of running it again.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def begin(self, key: str, fingerprint: str) -> Optional[IdempotencyKey]:
+        """
+        Claim the key for a request.
+
+        Returns:
+            IdempotencyKey: The completed record to replay, or None when the caller should run the request.
+        Raises:
+            IdempotencyKeyInProgressError: The first request with this key has not finished yet.
+            IdempotencyKeyMismatchError: The key was used with a different request.
+        """
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValueError(f"{IDEMPOTENCY_HEADER} is longer than {MAX_KEY_LENGTH} characters")
+
+        self.purge_expired()
+        expires_at = utcnow() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+        # Claimed with an insert skipping an existing key, rather than by failing the commit, which would roll back
+        # the whole session
+        statement = get_insert(self.db.get_bind())(IdempotencyKey).values(
+            key=key, fingerprint=fingerprint, expires_at=expires_at
+        )
+        claimed = self.db.execute(statement.on_conflict_do_nothing(index_elements=[IdempotencyKey.key])).rowcount
+        self.db.commit()
+        if claimed:
+            return None
+
+        record = self.db.query(IdempotencyKey).filter(IdempotencyKey.key == key).populate_existing().one()
+        if record.fingerprint != fingerprint:
+            raise IdempotencyKeyMismatchError(f"{IDEMPOTENCY_HEADER} {key} was used with a different request")
+        if record.status_code is None:
+            raise IdempotencyKeyInProgressError(f"A request with {IDEMPOTENCY_HEADER} {key} is in progress")
+        logger.info(f"Replaying the response of {IDEMPOTENCY_HEADER} {key}")
+        return record
+
+    def complete(self, key: str, status_code: int, response_body):
+        record = self.db.query(IdempotencyKey).filter(IdempotencyKey.key == key).one()
+        record.status_code = status_code
+        record.response_body = response_body
+        self.db.commit()
+
+    def release(self, key: str):
+        """
+        Forget a key whose request failed, so it can be retried.
+        """
+        self.db.rollback()
+        self.db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+        self.db.commit()
+
+    def purge_expired(self):
+        self.db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at < utcnow()),
+            execution_options={"synchronize_session": False},
+        )
@@ -1,21 +1,41 @@
+import hashlib
 import os
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timedelta
 import logging
 import traceback
-from sqlalchemy.orm import Session
+import uuid
+from contextlib import nullcontext
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session, load_only, selectinload
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy import Date, cast, func
+from sqlalchemy import bindparam, func, select, update
 from slugify import slugify
+import numpy as np
+import PIL.Image
 
+from app.core import embedding_index, metrics, shared_cache
+from app.core.admission import cpu_slot
 from app.core.config import settings
-from app.db.models import ImageInfo, Tag
+from app.db.models import ImageDateRollup, ImageInfo, ImageVariant, Job, Tag
+from app.schemas import image_info as image_schemas
+from app.services.change_feed_service import ChangeFeedService
+from app.services.job_service import JobAlreadyCompletedError, JobService
+from app.services.pyramid_service import PyramidService, PyramidServiceError, pyramid_source_size
 from app.services.tag_service import TagService
+from app.storage import StorageBackend, StorageError, get_storage
+from app.utils.embedding import image_embedding
 from app.utils.get_image_size import get_image_metadata_from_bytesio, UnknownImageFormat
-from app.utils.image_util import ImageUtil
+from app.utils.image_util import ImageUtil, allow_image_pixels
+from app.utils.image_variants import iter_variants
+from app.utils.placeholder import ImagePlaceholder, image_placeholder
 
 
 logger = logging.getLogger(__name__)
 
+UPLOAD_JOB = "process_upload"
+
 
 class ImageServiceError(Exception):
     pass
@@ -24,28 +44,182 @@ class ImageServiceNotFoundError(Exception):
     pass
 
 
+def hash_contents(img_contents) -> str:
+    return hashlib.sha256(img_contents).hexdigest()
+
+
+def prepare_image(img_contents, filename: str, ext: str, file_bytes, timer=metrics.time_stage):
+    """
+    Convert the image to the requested type and shrink it below ``MAX_IMG_SIZE`` when needed.
+
+    Args:
+        img_contents (bytes): The original file contents.
+        filename (str): The original file name.
+        ext (str): The requested file type.
+        file_bytes (io.IOBase): The original file contents as a file object, for the header sniffing.
+        timer (Callable): Context manager factory timing each stage.
+    Returns:
+        tuple: The contents to store, the file size and the image metadata.
+    """
+    with cpu_slot():
+        return _prepare_image(img_contents, filename, ext, file_bytes, timer)
+
+
+def _prepare_image(img_contents, filename: str, ext: str, file_bytes, timer):
+    file_size = len(img_contents)
+
+    # Size exceeded: do resize
+    if file_size > settings.MAX_IMG_SIZE:
+        img = ImageUtil.optimize_image_bytes_size(img_contents, ext, settings.MAX_IMG_SIZE, timer=timer)
+        img_contents = img.getbuffer()
+        file_size = img_contents.nbytes
+        with timer("header_sniff"):
+            img_meta = get_image_metadata_from_bytesio(img, file_size)
+    else:
+        if ext and not filename.endswith("." + ext):
+            with timer("decode"):
+                decoded_image = ImageUtil.open_image(img_contents)
+                decoded_image.load()
+            with timer("convert"):
+                converted_image = ImageUtil.convert_image_type(decoded_image, ext)
+            with timer("encode"):
+                img_contents = ImageUtil.PIL_to_bytes(converted_image, ext).getbuffer()
+
+        with timer("header_sniff"):
+            img_meta = get_image_metadata_from_bytesio(file_bytes, file_size)
+
+    return img_contents, file_size, img_meta
+
+
+def make_placeholder(img_contents, timer=metrics.time_stage) -> Optional[ImagePlaceholder]:
+    """
+    Compute the BlurHash and colour palette of the stored image. A failure only leaves them empty.
+
+    Returns:
+        ImagePlaceholder: The placeholder, or None when the image could not be decoded.
+    """
+    try:
+        with cpu_slot(), timer("placeholder"):
+            return image_placeholder(bytes(img_contents))
+    except Exception as e:
+        logger.warning(f"Could not compute the image placeholder: {e}")
+        return None
+
+
+def make_variants(img_contents, timer=metrics.time_stage) -> List[Tuple[int, int, bytes]]:
+    """
+    Encode the responsive variants of an upload, VARIANT_WIDTHS narrower than it. A failure only leaves the
+    image without variants.
+
+    Returns:
+        list: (width, height, encoded variant) tuples.
+    """
+    try:
+        with cpu_slot(), timer("variants"):
+            return list(iter_variants(
+                bytes(img_contents), settings.VARIANT_WIDTHS, settings.VARIANT_FORMAT, settings.VARIANT_QUALITY
+            ))
+    except Exception as e:
+        logger.warning(f"Could not encode the image variants: {e}")
+        return []
+
+
+def make_embedding(img_contents, timer=metrics.time_stage) -> Optional[np.ndarray]:
+    """
+    Compute the embedding of the stored image for the similarity search, when the embedding index is enabled.
+    A failure only leaves the image out of the search.
+
+    Returns:
+        np.ndarray: The embedding, or None.
+    """
+    if embedding_index.get_embedding_index() is None:
+        return None
+    try:
+        with cpu_slot(), timer("embedding"):
+            return image_embedding(bytes(img_contents))
+    except Exception as e:
+        logger.warning(f"Could not compute the image embedding: {e}")
+        return None
+
+
+def embedding_for_stored(image_info_id: int, image_key: str) -> Tuple[int, Optional[np.ndarray]]:
+    """
+    Compute the embedding of an already stored image. Runs in the app.cli.build_embeddings worker processes.
+    """
+    try:
+        img_contents = get_storage().get(image_key)
+        return image_info_id, image_embedding(img_contents)
+    except Exception as e:
+        logger.warning(f"Could not compute the embedding of image {image_info_id} ({image_key}): {e}")
+        return image_info_id, None
+
+
+def placeholder_columns(placeholder: Optional[ImagePlaceholder]) -> dict:
+    if placeholder is None:
+        return {"blurhash": None, "palette": None}
+    return {"blurhash": placeholder.blurhash, "palette": image_schemas.PALETTE_SEPARATOR.join(placeholder.palette)}
+
+
+def placeholder_for_stored(image_info_id: int, image_key: str) -> Tuple[int, Optional[ImagePlaceholder]]:
+    """
+    Compute the placeholder of an already stored image. Runs in the backfill worker processes.
+    """
+    try:
+        img_contents = get_storage().get(image_key)
+    except StorageError as e:
+        logger.warning(f"Could not read image {image_info_id} ({image_key}): {e}")
+        return image_info_id, None
+    return image_info_id, make_placeholder(img_contents)
+
+
 class ImageService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, storage: StorageBackend = None):
         self.db = db
+        self.storage = storage or get_storage()
 
-    def get_images(self, param, tags=None):
-        query = self.db.query(ImageInfo)
+    def _filter_images(self, query, param, tags=None):
 
         # Filter by tags
         if tags:
             query = query.join(ImageInfo.tags).filter(Tag.name.in_(tags))
 
-        # Filter by created_date, created_date__after, and created_date__before
+        # Filter by created_date, created_date__after, and created_date__before as half-open ranges on the
+        # raw column, so the created_at index can be used
         if param.created_date:
-            date = datetime.strptime(param.created_date, "%Y%m%d").date()
-            query = query.filter(cast(ImageInfo.created_at, Date) == date)
+            day_start = datetime.strptime(param.created_date, "%Y%m%d")
+            query = query.filter(ImageInfo.created_at >= day_start, ImageInfo.created_at < day_start + timedelta(days=1))
         else:
             if param.created_date__after:
-                date_after = datetime.strptime(param.created_date__after, "%Y%m%d").date()
+                date_after = datetime.strptime(param.created_date__after, "%Y%m%d")
                 query = query.filter(ImageInfo.created_at >= date_after)
             if param.created_date__before:
-                date_before = datetime.strptime(param.created_date__before, "%Y%m%d").date()
-                query = query.filter(ImageInfo.created_at <= date_before)
+                date_before = datetime.strptime(param.created_date__before, "%Y%m%d")
+                query = query.filter(ImageInfo.created_at < date_before + timedelta(days=1))
+
+        return query
+
+    @staticmethod
+    def _load_options(fields: Optional[List[str]] = None) -> list:
+        """
+        Return the loader options fetching what the representation restricted to ``fields`` reads: only their
+        columns, and the variants and tags only when srcset and tags are among them. Everything when None.
+        """
+        if fields is None:
+            return [selectinload(ImageInfo.tags), selectinload(ImageInfo.variants)]
+        columns = [
+            getattr(ImageInfo, field) for field in fields if field not in image_schemas.IMAGE_INFO_RELATION_FIELDS
+        ]
+        # The id is always loaded, as the relations are fetched by it
+        options = [load_only(ImageInfo.id, *columns)]
+        if "srcset" in fields:
+            options.append(selectinload(ImageInfo.variants))
+        if "tags" in fields:
+            options.append(selectinload(ImageInfo.tags))
+        return options
+
+    def get_images(self, param, tags=None):
+        query = self._filter_images(self.db.query(ImageInfo), param, tags)
+        query = query.options(*self._load_options(param.field_names))
 
         # Order by random
         if param.random:
@@ -59,34 +233,183 @@ class ImageService:
         images = query.all()
         return images
 
+    def iter_images(self, param, tags=None, batch_size: int = 500):
+        """
+        Yield the images matching the filters without materializing the whole result: rows are fetched
+        from a server-side cursor ``batch_size`` at a time, and the tags of each batch in one extra query.
+        """
+        query = self._filter_images(self.db.query(ImageInfo), param, tags)
+        query = query.options(*self._load_options(param.field_names))
+
+        if param.random:
+            query = query.order_by(func.random())
+        else:
+            query = query.order_by(ImageInfo.id)
+
+        query = query.offset(param.offset)
+        if param.limit:
+            query = query.limit(param.limit)
+
+        yield from query.yield_per(batch_size)
+
+    def get_images_version(self, param, tags=None) -> tuple:
+        """
+        Return a fingerprint of the images matching the filters that changes whenever the listing could:
+        on inserts and deletes (count, max id), on updates (max updated_at), and on tag changes.
+        """
+        query = self._filter_images(
+            self.db.query(func.count(ImageInfo.id), func.max(ImageInfo.id), func.max(ImageInfo.updated_at)),
+            param,
+            tags,
+        )
+        return (*query.one(), *TagService(self.db).get_tags_version())
+
+    def get_image_version(self, image_info_id: int):
+        """
+        Return the (version, updated_at) of the image without loading the row, or None if it does not exist.
+        """
+        query = self.db.query(ImageInfo.version, ImageInfo.updated_at)
+        return query.filter(ImageInfo.id == image_info_id).first()
+
+    def get_created_date_histogram(self, param):
+        """
+        Return the number of images created per day or per month, read from the per-day rollups.
+        """
+        query = self.db.query(ImageDateRollup).filter(ImageDateRollup.image_count > 0)
+        if param.created_date:
+            query = query.filter(ImageDateRollup.bucket_date == datetime.strptime(param.created_date, "%Y%m%d").date())
+        if param.created_date__after:
+            query = query.filter(ImageDateRollup.bucket_date >= datetime.strptime(param.created_date__after, "%Y%m%d").date())
+        if param.created_date__before:
+            query = query.filter(ImageDateRollup.bucket_date <= datetime.strptime(param.created_date__before, "%Y%m%d").date())
+        rollups = query.order_by(ImageDateRollup.bucket_date).all()
+
+        if param.bucket == "day":
+            return [{"bucket": rollup.bucket_date, "count": rollup.image_count} for rollup in rollups]
+
+        # One rollup row per day keeps this small enough to aggregate here instead of in dialect-specific SQL
+        months = Counter()
+        for rollup in rollups:
+            months[rollup.bucket_date.replace(day=1)] += rollup.image_count
+        return [{"bucket": month, "count": count} for month, count in months.items()]
+
+    def get_images_missing_placeholder(self, after_id: int, limit: int) -> List[Tuple[int, str]]:
+        """
+        Return the (id, storage key) of up to ``limit`` images after ``after_id`` that have no placeholder yet.
+        """
+        query = (
+            select(ImageInfo.id, ImageInfo.image)
+            .where(ImageInfo.blurhash.is_(None), ImageInfo.id > after_id)
+            .order_by(ImageInfo.id)
+            .limit(limit)
+        )
+        return self.db.execute(query).all()
+
+    def set_placeholders(self, placeholders: Dict[int, ImagePlaceholder]) -> int:
+        """
+        Store computed placeholders with a single executemany UPDATE, and commit. The statement bypasses the
+        ORM events, so the row version and updated_at are bumped here.
+
+        Returns:
+            int: The number of updated images.
+        """
+        if not placeholders:
+            return 0
+
+        table = ImageInfo.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                blurhash=bindparam("b_blurhash"),
+                palette=bindparam("b_palette"),
+                version=table.c.version + 1,
+                updated_at=func.now(),
+            )
+        )
+        rows = [
+            {"b_id": image_info_id, **{f"b_{k}": v for k, v in placeholder_columns(placeholder).items()}}
+            for image_info_id, placeholder in placeholders.items()
+        ]
+        self.db.connection().execute(statement, rows)
+        self.db.commit()
+        return len(rows)
+
+    def get_image_keys(self, after_id: int, limit: int) -> List[Tuple[int, str]]:
+        """
+        Return the (id, storage key) of up to ``limit`` images after ``after_id``, in id order.
+        """
+        query = select(ImageInfo.id, ImageInfo.image).where(ImageInfo.id > after_id).order_by(ImageInfo.id).limit(limit)
+        return self.db.execute(query).all()
+
+    def get_similar_images(self, image_info_id: int, param, tags=None) -> List[Tuple[ImageInfo, float]]:
+        """
+        Find the images looking most like the given one, by the dot product of their embeddings, among the
+        images matching the tag and date filters. An image stored before its embedding was computed gets it
+        computed here.
+
+        Returns:
+            list: Up to ``param.k`` (image, score) tuples, the most similar first.
+        """
+        index = embedding_index.get_embedding_index()
+        embedding = index.get(image_info_id)
+        if embedding is None:
+            image = self.get_image_by_id(image_info_id)
+            if not image:
+                raise ImageServiceNotFoundError(f"Image ID: {image_info_id} not found")
+            try:
+                with cpu_slot():
+                    embedding = image_embedding(self.storage.get(image.image))
+            except Exception as e:
+                raise ImageServiceError(f"Could not compute the embedding of image {image_info_id}: {e}")
+            index.put(image_info_id, embedding)
+
+        # Without filters the whole matrix is scanned, which is cheaper than listing every id
+        ids = None
+        if tags or param.created_date or param.created_date__after or param.created_date__before:
+            ids = [row.id for row in self._filter_images(self.db.query(ImageInfo.id), param, tags).distinct()]
+
+        nearest = index.nearest(embedding, param.k, ids, exclude=image_info_id)
+        images = self.db.query(ImageInfo).filter(ImageInfo.id.in_([image_id for image_id, _ in nearest])).options(
+            selectinload(ImageInfo.tags), selectinload(ImageInfo.variants)
+        )
+        images_by_id = {image.id: image for image in images}
+        # An id without a row is an image deleted since, whose embedding was not removed on this host
+        return [(images_by_id[image_id], score) for image_id, score in nearest if image_id in images_by_id]
+
+    def get_image_variant(self, image_info_id: int, width: int) -> ImageVariant:
+        variant = self.db.query(ImageVariant).filter_by(image_id=image_info_id, width=width).first()
+        if not variant:
+            raise ImageServiceNotFoundError(f"Image {image_info_id} has no variant {width} pixels wide")
+        return variant
+
     def get_image_by_id(self, image_info_id: int):
         query = self.db.query(ImageInfo)
         return query.filter(ImageInfo.id == image_info_id).first()
 
-    def create_image(self, param, image_data, img_contents, filename, file_bytes) -> ImageInfo:
+    def create_image(self, param, image_data, img_contents, filename, file_bytes, job_id: int = None) -> ImageInfo:
+        # The objects stored so far, removed again when the upload fails before its rows are committed
+        written, committed = [], False
         try:
-            file_size = len(img_contents)
-
-            # Size exceeded: do resize
-            if file_size > settings.MAX_IMG_SIZE:
-                img = ImageUtil.optimize_image_bytes_size(img_contents, param.ext, settings.MAX_IMG_SIZE)
-                img_contents = img.getbuffer()
-                file_size = img_contents.nbytes
-                img_meta = get_image_metadata_from_bytesio(img, file_size)
-            else:
-                if param.ext and not filename.endswith("." + param.ext):
-                    converted_image = ImageUtil.convert_image_type(img_contents, param.ext)
-                    img_contents = ImageUtil.PIL_to_bytes(converted_image, param.ext).getbuffer()
-
-                img_meta = get_image_metadata_from_bytesio(file_bytes, file_size)
-
-            # Write the uploaded file's content to the path
-            image_name = filename.replace(filename.split(".")[-1], param.ext, 1)
-            image_path = os.path.join(settings.MEDIA_FOLDER, image_name)
-            if not os.path.exists(settings.MEDIA_FOLDER):
-                os.mkdir(settings.MEDIA_FOLDER)
-            with open(image_path, "wb+") as buffer:
-                buffer.write(img_contents)
+            metrics.UPLOAD_BYTES.labels("in").inc(len(img_contents))
+            content_hash = hash_contents(img_contents)
+            # Read before the image is shrunk: very large ones also keep their original, for a tile pyramid
+            original_contents, pyramid_size = img_contents, pyramid_source_size(img_contents)
+            # A pyramid source is opened under the pyramid limit, past Pillow's decompression bomb limit
+            with allow_image_pixels(settings.PYRAMID_MAX_PIXELS) if pyramid_size else nullcontext():
+                img_contents, file_size, img_meta = prepare_image(img_contents, filename, param.ext, file_bytes)
+                variants = make_variants(original_contents)
+            placeholder = make_placeholder(img_contents)
+            embedding = make_embedding(img_contents)
+
+            # Write the uploaded file's content to the storage, under a name of its own: uploads of files with the
+            # same name must not overwrite each other, nor be deleted with each other
+            base_name = os.path.basename(filename)
+            image_name = f"{uuid.uuid4().hex}-{base_name.replace(base_name.split('.')[-1], param.ext, 1)}"
+            with metrics.time_stage("write"):
+                image_path = self.storage.put(image_name, img_contents)
+                written.append(image_path)
+            metrics.UPLOAD_BYTES.labels("out").inc(len(img_contents))
 
             new_image = ImageInfo(
                 image=image_path,
@@ -95,31 +418,156 @@ class ImageService:
                 height=img_meta.height,
                 width=img_meta.width,
                 file_size=file_size,
+                content_hash=content_hash,
+                **placeholder_columns(placeholder),
             )
-            self.db.add(new_image)
-            self.db.flush()
+            with metrics.time_stage("db_insert"):
+                self.db.add(new_image)
+                self.db.flush()
+
+            with metrics.time_stage("write_variants"):
+                for width, height, data in variants:
+                    key = self.storage.put(f"variants/{new_image.id}/{width}.{settings.VARIANT_FORMAT}", data)
+                    written.append(key)
+                    new_image.variants.append(ImageVariant(
+                        width=width, height=height, format=settings.VARIANT_FORMAT, file_size=len(data), key=key
+                    ))
+
+            if pyramid_size:
+                pyramid_service = PyramidService(self.db, self.storage)
+                with metrics.time_stage("write_original"):
+                    pyramid = pyramid_service.add_source(new_image, original_contents, filename, pyramid_size)
+                    written.append(pyramid.source_key)
 
             # Check each tag. If it doesn't exist, create it.
-            tag_service = TagService(self.db)
-            for tag_data in image_data.tags:
-                tag_instance = tag_service.get_or_create_tag(tag_data)
-                new_image.tags.append(tag_instance)
-
-            self.db.commit()
-
+            with metrics.time_stage("tag_link"):
+                tag_service = TagService(self.db)
+                for tag_data in image_data.tags:
+                    tag_instance = tag_service.get_or_create_tag(tag_data)
+                    new_image.tags.append(tag_instance)
+
+            with metrics.time_stage("commit"):
+                # A queued upload is marked done together with its image, so a crash in between cannot run it twice
+                if job_id is not None:
+                    JobService(self.db).record_result(job_id, new_image.id)
+                self.db.commit()
+                committed = True
+
+            if image_data.tags:
+                shared_cache.invalidate(shared_cache.TAGS)
+            if embedding is not None:
+                self._index_embedding(new_image.id, embedding)
+            if pyramid_size and settings.PYRAMID_MODE == "ingest":
+                self._build_pyramid(new_image.id)
             return new_image
 
+        except JobAlreadyCompletedError:
+            self._discard_upload(written, committed)
+            logger.warning(f"Job {job_id} created its image in another run, this one is dropped")
+            raise
         except ValueError as ve:
+            self._discard_upload(written, committed)
             logger.error(f"Value error on image upload: {ve}")
             raise ValueError(f"Value error on image upload: {ve}")
         except UnknownImageFormat as ue:
+            self._discard_upload(written, committed)
             logger.error(f"Unknown image format on upload: {ue}")
             raise UnknownImageFormat(f"Unknown image format on upload: {ue}")
+        except PIL.Image.DecompressionBombError as be:
+            self._discard_upload(written, committed)
+            logger.error(f"Image too large on upload: {be}")
+            raise ValueError(f"Image too large on upload: {be}")
         except Exception as e:
+            self._discard_upload(written, committed)
             error_info = traceback.format_exc()
             logger.error(f"Unexpected error on image upload:\n{error_info}")
             raise ImageServiceError(f"Unexpected error on image upload:\n{error_info}")
 
+    def _discard_upload(self, written: List[str], committed: bool):
+        # Nothing refers to the objects of an upload whose rows were not committed, and as they are named
+        # uniquely a retry would not overwrite them either
+        if committed:
+            return
+        self.db.rollback()
+        for key in written:
+            try:
+                self.storage.delete(key)
+            except StorageError as e:
+                logger.warning(f"Could not delete file {key} of a failed upload: {e!r}")
+
+    def _index_embedding(self, image_info_id: int, embedding: np.ndarray):
+        # The upload already succeeded: a missing embedding is computed on the first similarity search instead
+        try:
+            embedding_index.get_embedding_index().put(image_info_id, embedding)
+        except OSError as e:
+            logger.warning(f"Could not store the embedding of image {image_info_id}: {e}")
+
+    def _build_pyramid(self, image_info_id: int):
+        # The upload already succeeded: a failed build is left to the first tile request to retry
+        pyramid_service = PyramidService(self.db, self.storage)
+        try:
+            if pyramid_service.claim_build(image_info_id):
+                with metrics.time_stage("pyramid"):
+                    pyramid_service.build(image_info_id)
+        except PyramidServiceError as e:
+            logger.warning(str(e))
+
+    def enqueue_upload(self, param, image_data, img_contents, filename) -> Job:
+        """
+        Store the uploaded bytes as is and queue a job running ``create_image`` on them in a worker.
+        """
+        metrics.UPLOAD_BYTES.labels("in").inc(len(img_contents))
+        raw_name = f"upload-{uuid.uuid4().hex}{os.path.splitext(os.path.basename(filename))[1]}"
+        with metrics.time_stage("write_raw"):
+            raw_key = self.storage.put(raw_name, img_contents)
+
+        payload = {
+            "raw_key": raw_key,
+            "filename": filename,
+            "ext": param.ext,
+            "image_data": image_data.model_dump(),
+        }
+        return JobService(self.db).enqueue(UPLOAD_JOB, payload)
+
+    def process_upload_job(self, payload: dict, job_id: int = None) -> ImageInfo:
+        """
+        Run ``create_image`` on an upload stored by ``enqueue_upload``, then remove the stored upload. It is
+        also removed when the upload turns out to be invalid, as retrying cannot fix that.
+
+        With ``job_id``, the job is marked succeeded in the transaction creating the image, and a run of a job
+        that already has its image returns that image rather than creating another one.
+        """
+        result_id = self._get_job_result(job_id)
+        if result_id is not None:
+            return self.get_image_by_id(result_id)
+
+        img_contents = self.storage.get(payload["raw_key"])
+        param = image_schemas.ImageInfoCreateQuery(ext=payload["ext"])
+        image_data = image_schemas.ImageInfoCreate(**payload["image_data"])
+        try:
+            new_image = self.create_image(
+                param, image_data, img_contents, payload["filename"], BytesIO(img_contents), job_id=job_id
+            )
+        except (ValueError, UnknownImageFormat):
+            self._delete_stored_upload(payload["raw_key"])
+            raise
+        except JobAlreadyCompletedError:
+            return self.get_image_by_id(self._get_job_result(job_id))
+
+        self._delete_stored_upload(payload["raw_key"])
+        return new_image
+
+    def _get_job_result(self, job_id: Optional[int]) -> Optional[int]:
+        if job_id is None:
+            return None
+        return self.db.scalar(select(Job.result_id).where(Job.id == job_id))
+
+    def _delete_stored_upload(self, raw_key: str):
+        try:
+            self.storage.delete(raw_key)
+        except StorageError as e:
+            logger.warning(f"Failed to remove the stored upload {raw_key}: {e}")
+
     def update_image(self, image_info_id: int, update_data) -> ImageInfo:
         try:
             image = self.db.query(ImageInfo).filter(ImageInfo.id == image_info_id).one()
@@ -130,13 +578,15 @@ class ImageService:
                 image.description = update_data.description
 
             if update_data.tags is not None:
-                image.tags = []
-
-                for tag_data in update_data.tags:
-                    tag_instance = TagService(self.db).get_or_create_tag(tag_data)
-                    image.tags.append(tag_instance)
+                # Replacing the collection at once lets the flush insert and delete only the links that differ
+                tag_service = TagService(self.db)
+                image.tags = [tag_service.get_or_create_tag(tag_data) for tag_data in dict.fromkeys(update_data.tags)]
 
             self.db.commit()
+            # Other workers may hold the previous version of the row and of the tag list
+            shared_cache.delete(shared_cache.IMAGES, image_info_id)
+            if update_data.tags is not None:
+                shared_cache.invalidate(shared_cache.TAGS)
             return image
 
         except NoResultFound:
@@ -147,16 +597,73 @@ class ImageService:
             logger.error(f"Unexpected error on image update:\n{error_info}")
             raise ImageServiceError(f"Unexpected error on image update: {str(e)}")
 
+    def retag_images(self, update_data) -> Tuple[int, int, int]:
+        """
+        Add and remove tags on the images selected by ``update_data``, by ids and/or filters, in one transaction.
+
+        Returns:
+            tuple: The number of images whose tags changed, of links added, and of links removed.
+        """
+        image_ids = self.db.query(ImageInfo.id)
+        if update_data.image_ids is not None:
+            image_ids = image_ids.filter(ImageInfo.id.in_(update_data.image_ids))
+        image_ids = self._filter_images(image_ids, update_data, update_data.tags).distinct()
+
+        try:
+            updated, added, removed = TagService(self.db).retag_images(
+                image_ids.statement, update_data.add, update_data.remove
+            )
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            error_info = traceback.format_exc()
+            logger.error(f"Unexpected error on bulk retag:\n{error_info}")
+            raise ImageServiceError(f"Unexpected error on bulk retag: {str(e)}")
+
+        if updated:
+            shared_cache.invalidate(shared_cache.IMAGES)
+        if update_data.add:
+            shared_cache.invalidate(shared_cache.TAGS)
+        logger.info(f"Bulk retag: {updated} images, {added} links added, {removed} removed")
+        return updated, added, removed
+
     def delete_image_by_id(self, image_info_id: int) -> None:
         try:
             image = self.db.query(ImageInfo).filter(ImageInfo.id == image_info_id).one()
+            pyramid_service = PyramidService(self.db, self.storage)
+            pyramid_keys = pyramid_service.delete_pyramid(image_info_id)
+            variant_keys = [variant.key for variant in image.variants]
             self.db.delete(image)
+            ChangeFeedService(self.db).purge_expired()
             self.db.commit()
-            return image
-
         except NoResultFound:
             raise ImageServiceNotFoundError(f"Image with id {image_info_id} not found")
         except Exception as e:
             error_info = traceback.format_exc()
             logger.error(f"Unexpected error on image update:\n{error_info}")
             raise ImageServiceError(str(e))
+
+        # The delete is committed: the cached representation and the embedding are only dropped on a best
+        # effort basis, like the files below
+        try:
+            shared_cache.delete(shared_cache.IMAGES, image_info_id)
+        except OSError as e:
+            logger.warning(f"Could not drop the cached representation of image {image_info_id}: {e}")
+        try:
+            embedding_index.delete(image_info_id)
+        except OSError as e:
+            logger.warning(f"Could not delete the embedding of image {image_info_id}: {e}")
+
+        # The row is gone at this point, so a missing or unreachable file only leaves an orphan behind
+        try:
+            self.storage.delete(image.image)
+        except StorageError as e:
+            logger.warning(f"Could not delete file of image {image_info_id} ({image.image}): {e!r}")
+        pyramid_service.delete_stored(pyramid_keys)
+        for key in variant_keys:
+            try:
+                self.storage.delete(key)
+            except StorageError as e:
+                logger.warning(f"Could not delete variant of image {image_info_id} ({key}): {e!r}")
+
+        return image
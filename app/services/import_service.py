@@ -0,0 +1,144 @@
+import logging
+import os
+from collections import Counter
+from io import BytesIO
+from typing import Dict, Iterable, List, Optional, Set
+
+from slugify import slugify
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.db.bulk import copy_rows
+from app.db.dialect import get_insert
+from app.db.models import ImageInfo, Tag, image_tags_association
+from app.db.rollups import apply_date_rollup_deltas, apply_tag_pair_deltas, tag_pair_deltas
+from app.services.image_service import hash_contents, make_placeholder, placeholder_columns, prepare_image
+from app.storage import get_storage
+from app.utils.get_image_size import UnknownImageFormat, get_image_metadata
+
+logger = logging.getLogger(__name__)
+
+IMAGE_COLUMNS = [
+    "image", "title", "description", "height", "width", "file_size", "content_hash", "blurhash", "palette"
+]
+
+
+class ImportServiceError(Exception):
+    pass
+
+
+def sniff_file(path: str) -> Optional[str]:
+    """
+    Hash a file that looks like an image from its header. Runs in the import worker processes.
+
+    Returns:
+        str: The sha256 of the file contents, or None when it is not a supported image.
+    """
+    try:
+        get_image_metadata(path)
+        with open(path, "rb") as image_file:
+            return hash_contents(image_file.read())
+    except (UnknownImageFormat, OSError) as e:
+        logger.warning(f"Skipping {path}: {e}")
+        return None
+
+
+def process_file(path: str, content_hash: str, ext: str, tags: List[str]) -> Optional[dict]:
+    """
+    Convert and shrink the image like an upload, and write it to the storage under its content hash, which
+    makes rewriting it after an interrupted import harmless. Runs in the import worker processes.
+
+    Returns:
+        dict: The ``images`` row values plus its tags, or None when the image could not be processed.
+    """
+    try:
+        with open(path, "rb") as image_file:
+            img_contents = image_file.read()
+        img_contents, file_size, img_meta = prepare_image(img_contents, path, ext, BytesIO(img_contents))
+        placeholder = make_placeholder(img_contents)
+        image_path = get_storage().put(f"{content_hash}.{ext}", img_contents)
+    except Exception as e:
+        logger.warning(f"Failed to import {path}: {e}")
+        return None
+
+    return {
+        "image": image_path,
+        "title": os.path.splitext(os.path.basename(path))[0],
+        "description": None,
+        "height": img_meta.height,
+        "width": img_meta.width,
+        "file_size": file_size,
+        "content_hash": content_hash,
+        **placeholder_columns(placeholder),
+        "tags": tags,
+    }
+
+
+class ImportService:
+    """
+    Write imported images in large batches with bulk statements, bypassing the ORM unit of work. The
+    bookkeeping the ORM events do for single uploads (tag slugs, created date rollups, tag co-occurrences)
+    is done here.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def find_imported_hashes(self, content_hashes: Iterable[str]) -> Set[str]:
+        query = select(ImageInfo.content_hash).where(ImageInfo.content_hash.in_(set(content_hashes)))
+        return set(self.db.scalars(query))
+
+    def get_or_create_tag_ids(self, tag_names: Set[str]) -> Dict[str, int]:
+        if not tag_names:
+            return {}
+
+        connection = self.db.connection()
+        statement = get_insert(connection)(Tag).values(
+            [{"name": name, "name_slug": slugify(name)} for name in sorted(tag_names)]
+        )
+        connection.execute(statement.on_conflict_do_nothing(index_elements=[Tag.name]))
+        return dict(connection.execute(select(Tag.name, Tag.id).where(Tag.name.in_(tag_names))).all())
+
+    def insert_batch(self, records: List[dict]) -> int:
+        """
+        Insert the images, their tags and tag links of one batch, and commit.
+
+        Args:
+            records (list): Rows returned by ``process_file``.
+        Returns:
+            int: The number of inserted images.
+        """
+        if not records:
+            return 0
+
+        connection = self.db.connection()
+        try:
+            copy_rows(connection, ImageInfo.__table__, IMAGE_COLUMNS, [[r.get(c) for c in IMAGE_COLUMNS] for r in records])
+
+            content_hashes = [record["content_hash"] for record in records]
+            image_ids = dict(
+                connection.execute(
+                    select(ImageInfo.content_hash, func.max(ImageInfo.id))
+                    .where(ImageInfo.content_hash.in_(content_hashes))
+                    .group_by(ImageInfo.content_hash)
+                ).all()
+            )
+            tag_ids = self.get_or_create_tag_ids({tag for record in records for tag in record["tags"]})
+            copy_rows(
+                connection,
+                image_tags_association,
+                ["image_id", "tag_id"],
+                [[image_ids[record["content_hash"]], tag_ids[tag]] for record in records for tag in record["tags"]],
+            )
+
+            apply_date_rollup_deltas(connection, {None: len(records)})
+            pair_deltas = Counter()
+            for record in records:
+                pair_deltas.update(tag_pair_deltas([], [tag_ids[tag] for tag in record["tags"]]))
+            apply_tag_pair_deltas(connection, pair_deltas)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise ImportServiceError(f"Failed to insert the import batch: {e}") from e
+
+        return len(records)
@@ -0,0 +1,182 @@
+import logging
+import random
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class JobServiceNotFoundError(Exception):
+    pass
+
+class JobAlreadyCompletedError(Exception):
+    pass
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobService:
+    """
+    A durable job queue in the jobs table. Workers claim jobs with ``SELECT ... FOR UPDATE SKIP LOCKED``, so
+    any number of them can poll the table concurrently without handing out the same job twice.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, kind: str, payload: dict) -> Job:
+        job = Job(
+            kind=kind,
+            status=JOB_QUEUED,
+            payload=payload,
+            attempts=0,
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+            run_at=utcnow(),
+        )
+        self.db.add(job)
+        self.db.commit()
+        logger.info(f"Job enqueued: ID={job.id}, Kind={kind}")
+        return job
+
+    def get_job_by_id(self, job_id: int) -> Job:
+        job = self.db.query(Job).filter(Job.id == job_id).first()
+        if not job:
+            raise JobServiceNotFoundError(f"Job {job_id} not found")
+        return job
+
+    def claim(self) -> Optional[Job]:
+        """
+        Lease the next due job to the caller: a queued job whose backoff has elapsed, or a running job whose
+        worker stopped renewing its lease (see ``renew_lease``). The claim is committed right away so the row
+        lock is short.
+
+        Returns:
+            Job: The claimed job, or None when no job is due.
+        """
+        now = utcnow()
+        job = (
+            self.db.query(Job)
+            .filter(
+                or_(
+                    and_(Job.status == JOB_QUEUED, Job.run_at <= now),
+                    and_(Job.status == JOB_RUNNING, Job.locked_until < now),
+                )
+            )
+            .order_by(Job.run_at)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not job:
+            self.db.rollback()
+            return None
+
+        job.status = JOB_RUNNING
+        job.attempts += 1
+        job.locked_until = now + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        self.db.commit()
+        return job
+
+    def renew(self, job_id: int, attempt: int) -> bool:
+        """
+        Push back the lease of a running job, unless another worker has claimed it since ``attempt``.
+
+        Returns:
+            bool: False when the lease was lost.
+        """
+        result = self.db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == JOB_RUNNING, Job.attempts == attempt)
+            .values(locked_until=utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS))
+        )
+        self.db.commit()
+        return result.rowcount == 1
+
+    def record_result(self, job_id: int, result_id: int):
+        """
+        Mark a job succeeded with the row it created, in the caller's transaction, so the row and the job
+        outcome are committed together. Does not commit.
+
+        Raises:
+            JobAlreadyCompletedError: Another run of the job already recorded its result; the caller must roll
+                back its own.
+        """
+        result = self.db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.result_id.is_(None))
+            .values(status=JOB_SUCCEEDED, result_id=result_id, locked_until=None, last_error=None)
+        )
+        if result.rowcount != 1:
+            raise JobAlreadyCompletedError(f"Job {job_id} already has a result")
+
+    def complete(self, job: Job, result_id: Optional[int] = None):
+        job.status = JOB_SUCCEEDED
+        job.result_id = result_id
+        job.locked_until = None
+        job.last_error = None
+        self.db.commit()
+
+    def fail(self, job: Job, error: str, retry: bool = True):
+        """
+        Record a failed attempt. The job is retried with exponential backoff and jitter until it runs out of
+        attempts, or fails for good right away when ``retry`` is False.
+        """
+        if job.status == JOB_SUCCEEDED:
+            # Its result was committed along with the row it created: only what ran afterwards failed
+            logger.warning(f"Job {job.id} failed after recording its result: {error}")
+            return
+        job.last_error = error
+        job.locked_until = None
+        if retry and job.attempts < job.max_attempts:
+            delay = settings.JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+            job.status = JOB_QUEUED
+            job.run_at = utcnow() + timedelta(seconds=delay * random.uniform(0.5, 1.5))
+            logger.warning(f"Job {job.id} failed (attempt {job.attempts}), retrying in {delay:.0f}s: {error}")
+        else:
+            job.status = JOB_FAILED
+            logger.error(f"Job {job.id} failed permanently after {job.attempts} attempts: {error}")
+        self.db.commit()
+
+
+@contextmanager
+def renew_lease(bind, job: Job, interval: Optional[float] = None):
+    """
+    Keep renewing the lease of a claimed job from a background thread, with a session of its own, while the
+    block runs, so a job running longer than JOB_LEASE_SECONDS is not claimed again by another worker.
+    """
+    interval = interval or settings.JOB_LEASE_SECONDS / 3
+    job_id, attempt = job.id, job.attempts
+    stopping = threading.Event()
+
+    def heartbeat():
+        while not stopping.wait(interval):
+            try:
+                with Session(bind) as db:
+                    if not JobService(db).renew(job_id, attempt):
+                        logger.warning(f"Lost the lease of job {job_id}")
+                        return
+            except Exception as e:
+                # Retried on the next beat, well before the lease runs out
+                logger.warning(f"Could not renew the lease of job {job_id}: {e}")
+
+    thread = threading.Thread(target=heartbeat, name=f"job-{job_id}-lease", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopping.set()
+        thread.join()
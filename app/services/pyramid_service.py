@@ -0,0 +1,222 @@
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+import PIL.Image
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.admission import cpu_slot
+from app.core.config import settings
+from app.db.bulk import copy_rows
+from app.db.models import ImageInfo, ImagePyramid, ImageTile
+from app.services.job_service import JobService, utcnow
+from app.storage import StorageBackend, StorageError, get_storage
+from app.utils.image_pyramid import iter_pyramid_tiles
+from app.utils.image_util import ImageUtil, allow_image_pixels
+
+logger = logging.getLogger(__name__)
+
+PYRAMID_PENDING = "pending"
+PYRAMID_BUILDING = "building"
+PYRAMID_READY = "ready"
+
+TILE_COLUMNS = ["image_id", "level", "col", "row", "key"]
+TILE_ROWS_PER_BATCH = 1000
+
+# Job kind of the lazy builds, run by app.cli.job_worker
+PYRAMID_JOB = "build_pyramid"
+
+
+class PyramidServiceError(Exception):
+    pass
+
+
+class PyramidServiceNotFoundError(Exception):
+    pass
+
+
+class PyramidNotReadyError(Exception):
+    pass
+
+
+def pyramid_source_size(img_contents) -> Optional[Tuple[int, int]]:
+    """
+    Return the size of an upload that should get a tile pyramid, read from its header, or None.
+
+    Raises:
+        ValueError: The upload has more than PYRAMID_MAX_PIXELS pixels.
+    """
+    if settings.PYRAMID_MODE == "off":
+        return None
+    too_large = ValueError(f"The image has more than {settings.PYRAMID_MAX_PIXELS} pixels")
+    try:
+        with allow_image_pixels(settings.PYRAMID_MAX_PIXELS):
+            size = ImageUtil.open_image(bytes(img_contents)).size
+    except PIL.Image.DecompressionBombError:
+        raise too_large
+    except (OSError, ValueError):
+        return None
+    if size[0] * size[1] > settings.PYRAMID_MAX_PIXELS:
+        raise too_large
+    return size if max(size) > settings.PYRAMID_MIN_DIMENSION else None
+
+
+class PyramidService:
+    """
+    Deep Zoom tile pyramids of very large uploads, which are otherwise only kept shrunk to a size fit for
+    download. The full size original is stored aside at upload, and the pyramid is cut from it right
+    after the upload (PYRAMID_MODE "ingest") or by a job worker, queued by the first tile request
+    (PYRAMID_MODE "lazy").
+    """
+
+    def __init__(self, db: Session, storage: StorageBackend = None):
+        self.db = db
+        self.storage = storage or get_storage()
+
+    def add_source(self, image: ImageInfo, img_contents, filename: str, size: Tuple[int, int]) -> ImagePyramid:
+        """
+        Store the original of a flushed image and record its pending pyramid. The caller commits.
+        """
+        # Named after the image, not its contents: duplicate uploads each keep, and delete, their own original
+        source_key = self.storage.put(f"originals/{image.id}{os.path.splitext(filename)[1]}", img_contents)
+        pyramid = ImagePyramid(
+            image_id=image.id,
+            source_key=source_key,
+            width=size[0],
+            height=size[1],
+            tile_size=settings.PYRAMID_TILE_SIZE,
+            overlap=settings.PYRAMID_TILE_OVERLAP,
+            format=settings.PYRAMID_TILE_FORMAT,
+            status=PYRAMID_PENDING,
+        )
+        self.db.add(pyramid)
+        return pyramid
+
+    def get_pyramid(self, image_id: int) -> ImagePyramid:
+        pyramid = self.db.get(ImagePyramid, image_id)
+        if not pyramid:
+            raise PyramidServiceNotFoundError(f"Image {image_id} has no tile pyramid")
+        return pyramid
+
+    def get_tile_key(self, image_id: int, level: int, col: int, row: int) -> str:
+        key = self.db.scalar(
+            select(ImageTile.key).where(
+                ImageTile.image_id == image_id, ImageTile.level == level, ImageTile.col == col, ImageTile.row == row
+            )
+        )
+        if key is None:
+            raise PyramidServiceNotFoundError(f"Tile {level}/{col}_{row} of image {image_id} not found")
+        return key
+
+    def claim_build(self, image_id: int) -> bool:
+        """
+        Take the build of a pending pyramid, or of one whose build has not finished within JOB_LEASE_SECONDS,
+        so concurrent requests in any worker build each pyramid once.
+        """
+        now = utcnow()
+        stale = now - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        result = self.db.execute(
+            update(ImagePyramid)
+            .where(
+                ImagePyramid.image_id == image_id,
+                or_(
+                    ImagePyramid.status == PYRAMID_PENDING,
+                    and_(ImagePyramid.status == PYRAMID_BUILDING, ImagePyramid.claimed_at < stale),
+                ),
+            )
+            .values(status=PYRAMID_BUILDING, claimed_at=now),
+            execution_options={"synchronize_session": False},
+        )
+        self.db.commit()
+        return result.rowcount == 1
+
+    def ensure_ready(self, image_id: int) -> ImagePyramid:
+        """
+        Return the pyramid once it is built. Until then the first call queues its build for a job worker.
+
+        Raises:
+            PyramidServiceNotFoundError: The image has no pyramid.
+            PyramidNotReadyError: The pyramid is not built yet.
+        """
+        pyramid = self.get_pyramid(image_id)
+        if pyramid.status == PYRAMID_READY:
+            return pyramid
+        if self.claim_build(image_id):
+            JobService(self.db).enqueue(PYRAMID_JOB, {"image_id": image_id})
+        raise PyramidNotReadyError(f"The tile pyramid of image {image_id} is being built")
+
+    def _save_tiles(self, pyramid: ImagePyramid, rows: list):
+        # Committed per batch, with the claim renewed, so no transaction stays open for the whole build and a
+        # long build is not taken for an abandoned one
+        copy_rows(self.db.connection(), ImageTile.__table__, TILE_COLUMNS, rows)
+        pyramid.claimed_at = utcnow()
+        self.db.commit()
+
+    def build(self, image_id: int, release_on_failure: bool = True) -> ImagePyramid:
+        """
+        Cut the pyramid of a claimed build from the stored original, store the tiles and mark it ready.
+        On failure the pyramid goes back to pending, to be retried by a later request, unless
+        ``release_on_failure`` is False: a job keeps its claim while the job is retried.
+        """
+        pyramid = self.get_pyramid(image_id)
+        start = time.perf_counter()
+        tile_count = 0
+        try:
+            # Tiles of an interrupted build are overwritten
+            self.db.execute(delete(ImageTile).where(ImageTile.image_id == image_id))
+            rows = []
+            with cpu_slot(), allow_image_pixels(settings.PYRAMID_MAX_PIXELS):
+                tiles = iter_pyramid_tiles(
+                    ImageUtil.open_image(self.storage.get(pyramid.source_key)),
+                    pyramid.tile_size,
+                    pyramid.overlap,
+                    pyramid.format,
+                    settings.PYRAMID_TILE_QUALITY,
+                )
+                for level, col, row, data in tiles:
+                    key = self.storage.put(f"tiles/{image_id}/{level}/{col}_{row}.{pyramid.format}", data)
+                    rows.append([image_id, level, col, row, key])
+                    if len(rows) >= TILE_ROWS_PER_BATCH:
+                        self._save_tiles(pyramid, rows)
+                        tile_count += len(rows)
+                        rows = []
+                self._save_tiles(pyramid, rows)
+                tile_count += len(rows)
+
+            pyramid.status = PYRAMID_READY
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            if release_on_failure:
+                pyramid.status = PYRAMID_PENDING
+                self.db.commit()
+            raise PyramidServiceError(f"Failed to build the tile pyramid of image {image_id}: {e}") from e
+
+        logger.info(f"Tile pyramid of image {image_id} built: {tile_count} tiles in {time.perf_counter() - start:.1f}s")
+        return pyramid
+
+    def delete_pyramid(self, image_id: int) -> List[str]:
+        """
+        Delete the pyramid rows of an image, without committing.
+
+        Returns:
+            list: The storage keys of the original and the tiles, to delete once the rows are gone.
+        """
+        pyramid = self.db.get(ImagePyramid, image_id)
+        if not pyramid:
+            return []
+        keys = [pyramid.source_key]
+        keys += self.db.scalars(select(ImageTile.key).where(ImageTile.image_id == image_id))
+        self.db.execute(delete(ImageTile).where(ImageTile.image_id == image_id))
+        self.db.delete(pyramid)
+        return keys
+
+    def delete_stored(self, keys: List[str]):
+        for key in keys:
+            try:
+                self.storage.delete(key)
+            except StorageError as e:
+                logger.warning(f"Could not delete the pyramid file {key}: {e!r}")
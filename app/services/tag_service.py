@@ -1,12 +1,27 @@
 import logging
+from typing import List, Tuple
 
 from slugify import slugify
-from sqlalchemy.orm import Session
+from sqlalchemy import Float, Select, cast, delete, exists, func, insert, literal, or_, select, true, update
+from sqlalchemy.orm import Session, aliased
 
-from app.db.models import Tag
+from app.core import tag_index
+from app.core.config import settings
+from app.core.tag_index import TagEntry
+from app.db.models import ImageDateRollup, ImageInfo, Tag, TagCooccurrence, image_tags_association
+from app.db.events import defer_tag_pair_deltas
+from app.db.rollups import link_pair_deltas
 
 logger = logging.getLogger(__name__)
 
+
+class TagServiceNotFoundError(Exception):
+    pass
+
+class TagServiceConflictError(Exception):
+    pass
+
+
 class TagService:
 
     def __init__(self, db: Session):
@@ -18,8 +33,214 @@ class TagService:
             tag_instance = Tag(name=tag_name, name_slug=slugify(tag_name))
             self.db.add(tag_instance)
             self.db.flush()
+            tag_index.add_tag(self.db, tag_instance)
             logger.info(f"New tag created: {tag_name}")
         return tag_instance
 
     def get_all_tags(self):
-        return self.db.query(Tag).all()
\ No newline at end of file
+        return self.db.query(Tag).all()
+
+    def get_tags_version(self) -> tuple:
+        """
+        Return a fingerprint of the tag list: (count, max id, max updated_at).
+        """
+        return self.db.query(func.count(Tag.id), func.max(Tag.id), func.max(Tag.updated_at)).one()
+
+    def suggest_tags(self, prefix: str, limit: int) -> List[TagEntry]:
+        """
+        Return up to ``limit`` tags whose name or slug starts with ``prefix``, from the in-memory index, the most
+        used first. When there are fewer, they are followed by fuzzy matches from the database.
+        """
+        index = tag_index.get_tag_index(self.db)
+        suggestions = index.suggest(prefix, limit)
+        if len(suggestions) < limit and len(prefix) >= settings.TAG_SUGGEST_FUZZY_MIN_LENGTH:
+            found = [tag.id for tag in suggestions]
+            for id, name, name_slug in self._fuzzy_tags(prefix, limit - len(suggestions), found):
+                suggestions.append(index.by_id.get(id) or TagEntry(id, name, name_slug or "", 0))
+        return suggestions
+
+    def _fuzzy_tags(self, text: str, limit: int, exclude_ids: List[int]):
+        if self.db.get_bind().dialect.name == "postgresql":
+            # "%" is the pg_trgm similarity operator, served by the idx_tag_name_trgm index
+            condition, order = Tag.name.bool_op("%")(text), func.similarity(Tag.name, text).desc()
+        else:
+            # The SQLite stand-in has no trigrams: substring matches instead
+            condition, order = Tag.name.contains(text, autoescape=True), func.length(Tag.name)
+        query = select(Tag.id, Tag.name, Tag.name_slug).where(condition, Tag.id.not_in(exclude_ids))
+        return self.db.execute(query.order_by(order, Tag.name).limit(limit)).all()
+
+    def get_related_tags(self, tag_name: str, k: int, metric: str = "jaccard", min_count: int = 1) -> List[dict]:
+        """
+        Return the tags most often found on the same images as the given one, from the precomputed co-occurrence
+        counts.
+
+        Args:
+            tag_name (str): The name of the tag.
+            k (int): The maximum number of tags.
+            metric (str): "jaccard", the share of the images carrying either tag that carry both, or "lift", how
+                much more often the tags go together than if they were independent, which favours rarer tags.
+            min_count (int): The minimum number of images carrying both tags.
+
+        Returns:
+            list: The tags as dicts, with the number of images carrying both as ``image_count``, and their score.
+        """
+        tag = self.db.query(Tag).filter_by(name=tag_name).first()
+        if not tag:
+            raise TagServiceNotFoundError(f"Tag {tag_name} not found")
+        tag_count = self.db.scalar(
+            select(TagCooccurrence.image_count).where(
+                TagCooccurrence.tag_id == tag.id, TagCooccurrence.related_tag_id == tag.id
+            )
+        )
+        if not tag_count:
+            return []
+
+        # Each pair row is joined to the related tag's own row, which holds its image count
+        pair, related = TagCooccurrence, aliased(TagCooccurrence)
+        both = cast(pair.image_count, Float)
+        if metric == "lift":
+            total = self.db.scalar(select(func.coalesce(func.sum(ImageDateRollup.image_count), 0)))
+            score = both * total / (tag_count * related.image_count)
+        else:
+            score = both / (tag_count + related.image_count - pair.image_count)
+
+        query = (
+            select(Tag.id, Tag.name, Tag.name_slug, pair.image_count, score.label("score"))
+            .join(pair, pair.related_tag_id == Tag.id)
+            .join(related, (related.tag_id == pair.related_tag_id) & (related.related_tag_id == pair.related_tag_id))
+            .where(
+                pair.tag_id == tag.id,
+                pair.related_tag_id != tag.id,
+                pair.image_count >= min_count,
+                related.image_count > 0,
+            )
+            .order_by(score.desc(), pair.image_count.desc(), Tag.name)
+            .limit(k)
+        )
+        return [row._asdict() for row in self.db.execute(query)]
+
+    def get_tag(self, tag_id: int) -> Tag:
+        tag = self.db.get(Tag, tag_id)
+        if not tag:
+            raise TagServiceNotFoundError(f"Tag ID: {tag_id} not found")
+        return tag
+
+    def _bump_images(self, condition) -> int:
+        # The statements below bypass the ORM events, so the version and updated_at of the images whose tag
+        # list changes are bumped here, before their links are
+        images = ImageInfo.__table__
+        statement = update(images).where(condition).values(version=images.c.version + 1, updated_at=func.now())
+        return self.db.execute(statement).rowcount
+
+    def retag_images(self, image_ids: Select, add: List[str], remove: List[str]) -> Tuple[int, int, int]:
+        """
+        Add and remove tags on a set of images with a few set-based statements over the links: only the missing
+        links are inserted and only the existing ones deleted, so untouched links and images are left alone.
+        Tags to add are created when needed. Does not commit.
+
+        Args:
+            image_ids (Select): A single column select of the ids of the images.
+            add (List[str]): Names of the tags to add.
+            remove (List[str]): Names of the tags to remove. A tag both added and removed is removed.
+
+        Returns:
+            tuple: The number of images whose tags changed, of links added, and of links removed.
+        """
+        links, images, tags = image_tags_association, ImageInfo.__table__, Tag.__table__
+        remove = set(remove)
+        add_ids = [self.get_or_create_tag(name).id for name in dict.fromkeys(add) if name not in remove]
+        remove_ids = self.db.scalars(select(Tag.id).where(Tag.name.in_(remove))).all() if remove else []
+        if not add_ids and not remove_ids:
+            return 0, 0, 0
+
+        def linked(tag_id_column):
+            # Correlated to both the image and the tag of the enclosing statement
+            statement = exists().where(links.c.image_id == images.c.id, links.c.tag_id == tag_id_column)
+            return statement.correlate_except(links)
+
+        changes = []
+        if add_ids:
+            changes.append(exists().where(tags.c.id.in_(add_ids), ~linked(tags.c.id)))
+        if remove_ids:
+            changes.append(exists().where(links.c.image_id == images.c.id, links.c.tag_id.in_(remove_ids)))
+        updated = self._bump_images(images.c.id.in_(image_ids) & or_(*changes))
+
+        added, removed = [], []
+        if add_ids:
+            missing = (
+                select(images.c.id, tags.c.id)
+                .select_from(images.join(tags, true()))
+                .where(images.c.id.in_(image_ids), tags.c.id.in_(add_ids), ~linked(tags.c.id))
+            )
+            statement = insert(links).from_select(["image_id", "tag_id"], missing)
+            added = self.db.execute(statement.returning(links.c.image_id, links.c.tag_id)).all()
+        if remove_ids:
+            statement = delete(links).where(links.c.image_id.in_(image_ids), links.c.tag_id.in_(remove_ids))
+            removed = self.db.execute(statement.returning(links.c.image_id, links.c.tag_id)).all()
+        if added or removed:
+            defer_tag_pair_deltas(self.db, link_pair_deltas(self.db.connection(), added, removed))
+        return updated, len(added), len(removed)
+
+    def rename_tag(self, tag_id: int, name: str) -> Tag:
+        """
+        Rename a tag. The images carrying it get their version bumped, as their representation lists it by name.
+
+        Raises:
+            TagServiceConflictError: When another tag already has that name; merge them instead.
+        """
+        tag = self.get_tag(tag_id)
+        if tag.name == name:
+            return tag
+        if self.db.query(exists().where(Tag.name == name)).scalar():
+            raise TagServiceConflictError(f"Tag {name} already exists")
+
+        links = image_tags_association
+        self._bump_images(ImageInfo.__table__.c.id.in_(select(links.c.image_id).where(links.c.tag_id == tag_id)))
+        tag.name = name
+        self.db.commit()
+        tag_index.invalidate(self.db)
+        logger.info(f"Tag {tag_id} renamed to {name}")
+        return tag
+
+    def merge_tags(self, source_id: int, target_id: int) -> Tag:
+        """
+        Move the images of the source tag to the target tag, skipping those already carrying it, then delete
+        the source tag.
+
+        Returns:
+            Tag: The target tag.
+        """
+        if source_id == target_id:
+            raise TagServiceConflictError("A tag cannot be merged into itself")
+        source, target = self.get_tag(source_id), self.get_tag(target_id)
+
+        links = image_tags_association
+        source_images = select(links.c.image_id).where(links.c.tag_id == source_id)
+        self._bump_images(ImageInfo.__table__.c.id.in_(source_images))
+
+        target_links = links.alias("target_links")
+        missing = (
+            select(links.c.image_id, literal(target_id))
+            .where(links.c.tag_id == source_id)
+            .where(~exists().where(target_links.c.image_id == links.c.image_id, target_links.c.tag_id == target_id))
+            .distinct()
+        )
+        statement = insert(links).from_select(["image_id", "tag_id"], missing)
+        moved = self.db.execute(statement.returning(links.c.image_id, links.c.tag_id)).all()
+        statement = delete(links).where(links.c.tag_id == source_id)
+        removed = self.db.execute(statement.returning(links.c.image_id, links.c.tag_id)).all()
+        # The pair rows of the source tag go away with it, so only the changes of the other pairs are kept
+        deltas = link_pair_deltas(self.db.connection(), moved, removed)
+        defer_tag_pair_deltas(self.db, {pair: delta for pair, delta in deltas.items() if source_id not in pair})
+        self.db.execute(
+            delete(TagCooccurrence).where(
+                or_(TagCooccurrence.tag_id == source_id, TagCooccurrence.related_tag_id == source_id)
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        self.db.execute(delete(Tag.__table__).where(Tag.__table__.c.id == source_id))
+        self.db.expunge(source)
+        self.db.commit()
+        tag_index.invalidate(self.db)
+        logger.info(f"Tag {source.name} merged into {target.name}, {len(moved)} links moved")
+        return target
@@ -0,0 +1,229 @@
+import logging
+import os
+import shutil
+import uuid
+from datetime import timedelta
+from typing import AsyncIterator, Optional
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.models import UploadSession
+from app.services.job_service import utcnow
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_OPEN = "open"
+UPLOAD_FINALIZING = "finalizing"
+UPLOAD_COMPLETED = "completed"
+
+# Stale sessions removed per new session, which keeps the cleanup cheap and bounded
+PURGE_BATCH_SIZE = 100
+
+
+class UploadSessionNotFoundError(Exception):
+    pass
+
+
+class UploadSessionOffsetError(Exception):
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class UploadSessionStateError(Exception):
+    pass
+
+
+class UploadSessionService:
+    """
+    Resumable uploads: a session is created with the image metadata, the file is appended chunk by chunk
+    at increasing offsets to a temporary file, and finalizing turns the complete file into an image.
+    """
+
+    def __init__(self, db: Session, folder: str = None):
+        self.db = db
+        self.folder = folder or settings.UPLOAD_SESSION_FOLDER
+
+    def part_path(self, upload: UploadSession) -> str:
+        return os.path.join(self.folder, f"{upload.id}.part")
+
+    def _expires_at(self):
+        return utcnow() + timedelta(seconds=settings.UPLOAD_SESSION_TTL_SECONDS)
+
+    def create_session(self, param, image_data, filename: str, total_size: Optional[int] = None) -> UploadSession:
+        if total_size is not None and total_size > settings.UPLOAD_MAX_SIZE:
+            raise ValueError(f"The upload is larger than the maximum of {settings.UPLOAD_MAX_SIZE} bytes")
+
+        self.purge_expired()
+        upload = UploadSession(
+            id=uuid.uuid4().hex,
+            filename=os.path.basename(filename),
+            ext=param.ext,
+            image_data=image_data.model_dump(include={"title", "description", "tags"}),
+            total_size=total_size,
+            received=0,
+            status=UPLOAD_OPEN,
+            expires_at=self._expires_at(),
+        )
+        os.makedirs(self.folder, exist_ok=True)
+        open(self.part_path(upload), "wb").close()
+        self.db.add(upload)
+        self.db.commit()
+        logger.info(f"Upload session created: ID={upload.id}, Filename={upload.filename}, Size={total_size}")
+        return upload
+
+    def get_session(self, upload_id: str, lock: bool = False) -> UploadSession:
+        query = self.db.query(UploadSession).filter(UploadSession.id == upload_id, UploadSession.expires_at >= utcnow())
+        if lock:
+            query = query.with_for_update()
+        upload = query.first()
+        if not upload:
+            raise UploadSessionNotFoundError(f"Upload session {upload_id} not found")
+        return upload
+
+    async def append_chunk(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> int:
+        """
+        Append a chunk streamed from the request body to the session file. The body is first streamed to a
+        file of its own without any database connection or lock held, then appended in one short transaction
+        that locks the session row, so concurrent chunks for the same offset cannot interleave. When the
+        client disconnects midway, the bytes received so far are kept and the next chunk resumes after them.
+
+        Returns:
+            int: The number of bytes received so far, the offset of the next chunk.
+
+        Raises:
+            UploadSessionOffsetError: The offset is not the number of bytes received so far.
+        """
+        # Checked again under the lock, but rejects a stale chunk before reading its body
+        limit = await run_in_threadpool(self._check_chunk, upload_id, offset)
+
+        chunk_path = os.path.join(self.folder, f"{upload_id}.{uuid.uuid4().hex}.chunk")
+        chunk_file = await run_in_threadpool(open, chunk_path, "wb")
+        try:
+            try:
+                written = 0
+                async for chunk in chunks:
+                    if offset + written + len(chunk) > limit:
+                        raise ValueError(f"The upload exceeds its size of {limit} bytes")
+                    await run_in_threadpool(chunk_file.write, chunk)
+                    written += len(chunk)
+            finally:
+                await run_in_threadpool(chunk_file.close)
+                # What was received is kept, even when the body was cut short or too large
+                received = await run_in_threadpool(self._append_chunk_file, upload_id, offset, chunk_path)
+        finally:
+            await run_in_threadpool(self._remove_file, chunk_path)
+
+        return received
+
+    def _check_chunk(self, upload_id: str, offset: int) -> int:
+        try:
+            upload = self._get_open_session(upload_id, offset)
+            return upload.total_size if upload.total_size is not None else settings.UPLOAD_MAX_SIZE
+        finally:
+            # Ends the transaction, so no connection is held while the body streams in
+            self.db.rollback()
+
+    def _get_open_session(self, upload_id: str, offset: int, lock: bool = False) -> UploadSession:
+        upload = self.get_session(upload_id, lock=lock)
+        if upload.status != UPLOAD_OPEN:
+            self.db.rollback()
+            raise UploadSessionStateError(f"Upload session {upload_id} is already finalized")
+        if offset != upload.received:
+            received = upload.received
+            self.db.rollback()
+            raise UploadSessionOffsetError(f"Expected offset {received}, got {offset}", received)
+        return upload
+
+    def _append_chunk_file(self, upload_id: str, offset: int, chunk_path: str) -> int:
+        upload = self._get_open_session(upload_id, offset, lock=True)
+        try:
+            with open(self.part_path(upload), "r+b") as part, open(chunk_path, "rb") as chunk:
+                # Drop anything written after the last recorded offset by an earlier, interrupted chunk
+                part.truncate(offset)
+                part.seek(offset)
+                shutil.copyfileobj(chunk, part)
+            received = upload.received = os.path.getsize(self.part_path(upload))
+            upload.expires_at = self._expires_at()
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        return received
+
+    def begin_finalize(self, upload_id: str) -> UploadSession:
+        """
+        Mark a complete session as being finalized, in the transaction that checks its status, so a concurrent
+        finalize cannot create a second image. A session already finalized is returned as is.
+
+        Raises:
+            UploadSessionStateError: Another request is finalizing the session.
+            UploadSessionOffsetError: Not all the announced bytes were received.
+        """
+        upload = self.get_session(upload_id, lock=True)
+        if upload.status == UPLOAD_COMPLETED:
+            self.db.rollback()
+            return upload
+        if upload.status == UPLOAD_FINALIZING:
+            self.db.rollback()
+            raise UploadSessionStateError(f"Upload session {upload_id} is being finalized")
+        if upload.total_size is not None and upload.received != upload.total_size:
+            received, total_size = upload.received, upload.total_size
+            self.db.rollback()
+            raise UploadSessionOffsetError(f"Upload incomplete: {received} of {total_size} bytes received", received)
+
+        upload.status = UPLOAD_FINALIZING
+        self.db.commit()
+        return upload
+
+    def abort_finalize(self, upload: UploadSession):
+        # A session whose finalize failed is reopened, so the client can retry
+        self.db.rollback()
+        if upload.status == UPLOAD_FINALIZING:
+            upload.status = UPLOAD_OPEN
+            self.db.commit()
+
+    def finalize(self, upload: UploadSession, result_id: int = None, job_id: int = None):
+        upload.status = UPLOAD_COMPLETED
+        upload.result_id = result_id
+        upload.job_id = job_id
+        self.db.commit()
+        self._remove_part(upload)
+
+    def delete_session(self, upload_id: str):
+        upload = self.get_session(upload_id)
+        self._remove_part(upload)
+        self.db.delete(upload)
+        self.db.commit()
+
+    def read_part(self, upload: UploadSession) -> bytes:
+        with open(self.part_path(upload), "rb") as part:
+            return part.read()
+
+    def purge_expired(self):
+        """
+        Remove sessions, and their temporary files, that received no chunk within the TTL.
+        """
+        stale = (
+            self.db.query(UploadSession)
+            .filter(UploadSession.expires_at < utcnow())
+            .limit(PURGE_BATCH_SIZE)
+            .all()
+        )
+        for upload in stale:
+            self._remove_part(upload)
+            self.db.delete(upload)
+        if stale:
+            logger.info(f"Removed {len(stale)} expired upload sessions")
+
+    def _remove_part(self, upload: UploadSession):
+        self._remove_file(self.part_path(upload))
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,26 @@
+from functools import lru_cache
+
+from app.core.config import settings
+from app.storage.base import StorageBackend, StorageError, StorageNotFoundError, StoredObject
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    """
+    Return the storage backend configured in the settings.
+    """
+    if settings.STORAGE_BACKEND == "s3":
+        from app.storage.s3 import S3Storage
+
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+        )
+
+    from app.storage.local import LocalStorage
+
+    return LocalStorage(settings.MEDIA_VOLUMES or [settings.MEDIA_FOLDER], settings.STORAGE_MIN_FREE_BYTES)
@@ -0,0 +1,76 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Iterator, NamedTuple, Optional, Union
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class StorageError(Exception):
+    pass
+
+
+class StorageNotFoundError(StorageError):
+    pass
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    modified_at: datetime
+
+
+class StorageBackend(ABC):
+    """
+    Where image files live. ``put`` returns the key under which the object was stored; that key is what
+    callers persist (e.g. in ``ImageInfo.image``) and pass back to the other methods.
+    """
+
+    @abstractmethod
+    def put(self, name: str, data: Union[bytes, memoryview]) -> str:
+        """
+        Store the data under the given name, replacing any existing object with that name.
+
+        Args:
+            name (str): Object name; may contain "/" separated prefixes such as "tiles/12/0_0.jpg".
+            data (Union[bytes, memoryview]): The content to store.
+
+        Returns:
+            str: The key of the stored object.
+        """
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """
+        Return the whole content of the object.
+
+        Raises:
+            StorageNotFoundError: If the object does not exist.
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Delete the object.
+
+        Raises:
+            StorageNotFoundError: If the object does not exist.
+        """
+
+    @abstractmethod
+    def stat(self, key: str) -> StoredObject:
+        """
+        Return the size and modification time of the object.
+
+        Raises:
+            StorageNotFoundError: If the object does not exist.
+        """
+
+    @abstractmethod
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Stream the bytes in ``[start, end)`` of the object in chunks, without loading it whole.
+
+        Raises:
+            StorageNotFoundError: If the object does not exist.
+        """
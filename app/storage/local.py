@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Union
+
+from app.storage.base import DEFAULT_CHUNK_SIZE, StorageBackend, StorageError, StorageNotFoundError, StoredObject
+
+logger = logging.getLogger(__name__)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Filesystem storage spread over one or more volumes.
+
+    Objects are placed in two levels of hashed subdirectories (``<volume>/ab/cd/<name>``) so no directory
+    grows beyond a few thousand entries, written to a temporary file and renamed into place so readers
+    never see a partial file, and new objects go to the volume with the most free space.
+    """
+
+    def __init__(self, volumes: List[str], min_free_bytes: int = 0):
+        """
+        Args:
+            volumes (List[str]): Root directories, usually one per disk.
+            min_free_bytes (int): Free space to keep on every volume; a volume is not written to if the
+                object would leave less than this.
+        """
+        if not volumes:
+            raise ValueError("LocalStorage needs at least one volume")
+        self.volumes = volumes
+        self.volume_roots = [os.path.realpath(volume) for volume in volumes]
+        self.min_free_bytes = min_free_bytes
+
+    @staticmethod
+    def fan_out_path(name: str) -> str:
+        parts = name.split("/")
+        if not name or name.startswith("/") or any(part in ("", ".", "..") for part in parts):
+            raise StorageError(f"Invalid object name: {name!r}")
+
+        digest = hashlib.sha1(name.encode()).hexdigest()
+        return os.path.join(digest[:2], digest[2:4], *parts)
+
+    def _resolve(self, key: str) -> str:
+        real_path = os.path.realpath(key)
+        if not any(real_path.startswith(root + os.sep) for root in self.volume_roots):
+            raise StorageError(f"Key is outside of the storage volumes: {key}")
+        return key
+
+    def _choose_volume(self, size: int) -> str:
+        best_volume, best_free = None, -1
+        for volume in self.volumes:
+            os.makedirs(volume, exist_ok=True)
+            free = shutil.disk_usage(volume).free
+            if free - size >= self.min_free_bytes and free > best_free:
+                best_volume, best_free = volume, free
+
+        if best_volume is None:
+            raise StorageError(f"No storage volume has {size} bytes to spare")
+        return best_volume
+
+    def put(self, name: str, data: Union[bytes, memoryview]) -> str:
+        relative_path = self.fan_out_path(name)
+
+        # Overwrite in place so a replaced object never leaves a stale copy on another volume
+        existing = [os.path.join(volume, relative_path) for volume in self.volumes]
+        existing = [path for path in existing if os.path.exists(path)]
+        path = existing[0] if existing else os.path.join(self._choose_volume(len(data)), relative_path)
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, "wb") as buffer:
+                buffer.write(data)
+                buffer.flush()
+                os.fsync(buffer.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return path
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._resolve(key), "rb") as buffer:
+                return buffer.read()
+        except FileNotFoundError:
+            raise StorageNotFoundError(key)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._resolve(key))
+        except FileNotFoundError:
+            raise StorageNotFoundError(key)
+
+    def stat(self, key: str) -> StoredObject:
+        try:
+            stat = os.stat(self._resolve(key))
+        except FileNotFoundError:
+            raise StorageNotFoundError(key)
+        return StoredObject(key=key, size=stat.st_size, modified_at=datetime.fromtimestamp(stat.st_mtime, timezone.utc))
+
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        try:
+            buffer = open(self._resolve(key), "rb")
+        except FileNotFoundError:
+            raise StorageNotFoundError(key)
+        return self._iter_range(buffer, start, end, chunk_size)
+
+    @staticmethod
+    def _iter_range(buffer, start: int, end: Optional[int], chunk_size: int) -> Iterator[bytes]:
+        with buffer:
+            buffer.seek(start)
+            remaining = None if end is None else max(end - start, 0)
+            while remaining is None or remaining > 0:
+                chunk = buffer.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
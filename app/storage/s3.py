@@ -0,0 +1,93 @@
+from typing import Iterator, Optional, Union
+
+from app.storage.base import DEFAULT_CHUNK_SIZE, StorageBackend, StorageError, StorageNotFoundError, StoredObject
+
+
+class S3Storage(StorageBackend):
+    """
+    Storage in an S3-compatible object store. Point ``endpoint_url`` at a local stand-in (MinIO, moto
+    server, ...) to run against it without AWS. Requires the optional ``boto3`` package.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None, access_key_id: Optional[str] = None,
+                 secret_access_key: Optional[str] = None, client=None):
+        """
+        Args:
+            bucket (str): The bucket holding the objects.
+            prefix (str): Prepended to every object name, e.g. "media/".
+            endpoint_url (str, optional): Endpoint of an S3-compatible service; AWS when not set.
+            region (str, optional): The region name.
+            access_key_id (str, optional): Credentials; the boto3 default chain is used when not set.
+            secret_access_key (str, optional): Credentials; the boto3 default chain is used when not set.
+            client (optional): A ready boto3 S3 client, mainly for tests.
+        """
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise ImportError("S3 storage requires boto3: pip install boto3")
+            client = boto3.client(
+                "s3",
+                endpoint_url=endpoint_url,
+                region_name=region,
+                aws_access_key_id=access_key_id,
+                aws_secret_access_key=secret_access_key,
+            )
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    @staticmethod
+    def _is_not_found(error) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def _call(self, key: str, method, **kwargs):
+        # Every failure of the client (access denied, throttling, 5xx, connection errors, ...) is a StorageError,
+        # which is what the callers handle
+        try:
+            return method(Bucket=self.bucket, Key=key, **kwargs)
+        except Exception as e:
+            if self._is_not_found(e):
+                raise StorageNotFoundError(key)
+            raise StorageError(f"S3 request failed for {key}: {e}") from e
+
+    @staticmethod
+    def _read(key: str, read, *args):
+        try:
+            return read(*args)
+        except Exception as e:
+            raise StorageError(f"S3 read failed for {key}: {e}") from e
+
+    def _iter_chunks(self, key: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        while True:
+            chunk = self._read(key, next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def put(self, name: str, data: Union[bytes, memoryview]) -> str:
+        key = self.prefix + name
+        self._call(key, self.client.put_object, Body=bytes(data))
+        return key
+
+    def get(self, key: str) -> bytes:
+        return self._read(key, self._call(key, self.client.get_object)["Body"].read)
+
+    def delete(self, key: str) -> None:
+        # DeleteObject succeeds for missing keys, so check first to honour the interface
+        self.stat(key)
+        self._call(key, self.client.delete_object)
+
+    def stat(self, key: str) -> StoredObject:
+        response = self._call(key, self.client.head_object)
+        return StoredObject(key=key, size=response["ContentLength"], modified_at=response["LastModified"])
+
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        if end is not None and end <= start:
+            return iter(())
+        byte_range = f"bytes={start}-{'' if end is None else end - 1}"
+        response = self._call(key, self.client.get_object, Range=byte_range)
+        return self._iter_chunks(key, response["Body"].iter_chunks(chunk_size))
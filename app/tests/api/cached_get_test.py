@@ -0,0 +1,60 @@
+import pytest
+from fastapi import status
+
+from app.core import shared_cache
+from app.db.models import ImageInfo, Tag
+
+
+class TestSharedCacheAPI:
+    """
+    Test cases for the GET endpoints served from the shared cache
+    """
+
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_data(self, test_db_session):
+        tags = [Tag(name="tag1", name_slug="tag1")]
+        image = ImageInfo(
+            image="path/to/image1.jpg",
+            title="image1",
+            description="description1",
+            height=400,
+            width=300,
+            file_size=10000,
+            tags=tags,
+        )
+        test_db_session.add_all(tags + [image])
+        test_db_session.commit()
+
+    @pytest.fixture(autouse=True)
+    def cache(self, tmp_path, monkeypatch):
+        cache = shared_cache.SharedCache(str(tmp_path / "shared-cache"), slots=64, slot_size=4096)
+        monkeypatch.setattr(shared_cache, "_shared_cache", cache)
+        yield cache
+        cache.close()
+
+    def test_image_served_from_cache_until_updated(self, test_client, cache):
+        response = test_client.get("image_api/image/1")
+        assert response.status_code == status.HTTP_200_OK
+        etag = response.headers["ETag"]
+        assert cache.get(shared_cache.IMAGES, 1, version=etag) == response.content
+
+        cached = test_client.get("image_api/image/1")
+        assert cached.content == response.content
+        assert cached.headers["ETag"] == etag
+
+        test_client.patch("image_api/image/1/", json={"title": "renamed", "tags": ["tag2"]})
+        updated = test_client.get("image_api/image/1")
+        assert updated.json()["title"] == "renamed"
+        assert updated.headers["ETag"] != etag
+
+    def test_missing_image_not_cached(self, test_client):
+        assert test_client.get("image_api/image/999").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_tag_list_served_from_cache(self, test_client, cache):
+        response = test_client.get("image_api/tag/tags/")
+        assert response.status_code == status.HTTP_200_OK
+        assert {tag["name"] for tag in response.json()} == {"tag1", "tag2"}
+        assert cache.get(shared_cache.TAGS, "all", version=response.headers["ETag"]) == response.content
+
+        test_client.patch("image_api/image/1/", json={"tags": ["tag3"]})
+        assert "tag3" in {tag["name"] for tag in test_client.get("image_api/tag/tags/").json()}
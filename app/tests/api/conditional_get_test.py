@@ -0,0 +1,91 @@
+import pytest
+from fastapi import status
+from app.db.models import ImageInfo, Tag
+
+
+class TestConditionalGetAPI:
+    """
+    Test cases for ETag / Last-Modified revalidation of the GET endpoints
+    """
+
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_data(self, test_db_session):
+        tags = [Tag(name="tag1"), Tag(name="tag2")]
+        images = [
+            ImageInfo(
+                image=f"path/to/image{i}.jpg",
+                title=f"image{i}",
+                description=f"description{i}",
+                height=400,
+                width=300,
+                file_size=10000,
+                tags=tags,
+            )
+            for i in range(1, 3)
+        ]
+        test_db_session.add_all(tags + images)
+        test_db_session.commit()
+
+    def test_get_by_id_sets_validators(self, test_client):
+        response = test_client.get("image_api/image/1")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["ETag"].startswith('W/"')
+        assert "Last-Modified" in response.headers
+        assert "updated_at" in response.json()
+
+    def test_get_by_id_if_none_match(self, test_client):
+        etag = test_client.get("image_api/image/1").headers["ETag"]
+
+        response = test_client.get("image_api/image/1", headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+
+        response = test_client.get("image_api/image/1", headers={"If-None-Match": 'W/"other"'})
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_get_by_id_if_modified_since(self, test_client):
+        last_modified = test_client.get("image_api/image/1").headers["Last-Modified"]
+
+        response = test_client.get("image_api/image/1", headers={"If-Modified-Since": last_modified})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        response = test_client.get("image_api/image/1", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"})
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_get_by_id_not_found(self, test_client):
+        response = test_client.get("image_api/image/999", headers={"If-None-Match": "*"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_etag_changes_after_update(self, test_client, test_db_session):
+        etag = test_client.get("image_api/image/2").headers["ETag"]
+
+        response = test_client.patch("image_api/image/2/", json={"title": "renamed"})
+        assert response.status_code == status.HTTP_200_OK
+
+        response = test_client.get("image_api/image/2", headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["ETag"] != etag
+        assert test_db_session.query(ImageInfo.version).filter(ImageInfo.id == 2).scalar() == 2
+
+    def test_list_if_none_match(self, test_client):
+        response = test_client.get("image_api/image/", params={"tags": "tag1"})
+        etag = response.headers["ETag"]
+
+        response = test_client.get("image_api/image/", params={"tags": "tag1"}, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        # The same fingerprint under different filters is a different representation
+        response = test_client.get("image_api/image/", params={"tags": "tag2"}, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_list_random_not_cacheable(self, test_client):
+        response = test_client.get("image_api/image/", params={"random": True})
+        assert response.status_code == status.HTTP_200_OK
+        assert "ETag" not in response.headers
+
+    def test_tags_if_none_match(self, test_client):
+        etag = test_client.get("image_api/tag/tags/").headers["ETag"]
+
+        response = test_client.get("image_api/tag/tags/", headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
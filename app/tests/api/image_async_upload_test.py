@@ -0,0 +1,159 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+import pytest
+from fastapi import status
+from PIL import Image
+from app.cli.job_worker import JOB_HANDLERS, process_next_job
+from app.core.config import settings
+from app.db.models import ImageInfo, Job
+from app.services.job_service import JobService, renew_lease
+
+
+class TestAsyncUploadAPI:
+    """
+    Test cases for uploads accepted with 202 and processed by the job worker
+    """
+
+    @pytest.fixture(autouse=True)
+    def async_uploads(self, monkeypatch):
+        monkeypatch.setattr(settings, "ASYNC_UPLOADS", True)
+
+    def post_image(self, test_client, contents: bytes):
+        return test_client.post(
+            "image_api/image/",
+            files={"file": ("mock_image.jpg", BytesIO(contents))},
+            data={"image_data": json.dumps({"title": "queued", "description": "queued image", "tags": ["queued"]})},
+        )
+
+    def test_upload_is_processed_by_worker(self, test_client, test_db_session):
+        img_byte_array = BytesIO()
+        Image.new("RGB", (100, 80), color=(255, 255, 255)).save(img_byte_array, format="JPEG")
+
+        response = self.post_image(test_client, img_byte_array.getvalue())
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job = response.json()
+        assert job["status"] == "queued"
+        assert response.headers["Location"].endswith(f"/image_api/job/{job['id']}")
+        raw_key = test_db_session.query(Job).filter(Job.id == job["id"]).one().payload["raw_key"]
+
+        new_image = None
+        try:
+            assert process_next_job(test_db_session)
+            assert not process_next_job(test_db_session)
+
+            response = test_client.get(f"image_api/job/{job['id']}")
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json()["status"] == "succeeded"
+            assert response.json()["attempts"] == 1
+
+            new_image = test_db_session.query(ImageInfo).filter(ImageInfo.id == response.json()["result_id"]).one()
+            assert (new_image.width, new_image.height) == (100, 80)
+            assert [tag.name for tag in new_image.tags] == ["queued"]
+            assert not os.path.exists(raw_key)
+        finally:
+            if new_image and os.path.exists(new_image.image):
+                os.remove(new_image.image)
+
+    def test_invalid_upload_fails_without_retry(self, test_client, test_db_session):
+        response = self.post_image(test_client, b"invalid image data")
+        assert response.status_code == status.HTTP_202_ACCEPTED
+
+        assert process_next_job(test_db_session)
+        response = test_client.get(f"image_api/job/{response.json()['id']}")
+        assert response.json()["status"] == "failed"
+        assert response.json()["last_error"]
+
+    def test_failed_job_is_retried_with_backoff(self, test_db_session, monkeypatch):
+        def failing_handler(db, payload):
+            raise RuntimeError("storage unavailable")
+
+        monkeypatch.setitem(JOB_HANDLERS, "process_upload", failing_handler)
+        job = Job(
+            kind="process_upload",
+            status="queued",
+            payload={},
+            max_attempts=3,
+            run_at=datetime.now(timezone.utc),
+        )
+        test_db_session.add(job)
+        test_db_session.commit()
+
+        assert process_next_job(test_db_session)
+        test_db_session.refresh(job)
+        assert job.status == "queued"
+        assert job.attempts == 1
+        assert "storage unavailable" in job.last_error
+        # Not due again before its backoff has elapsed
+        assert not process_next_job(test_db_session)
+
+    def test_reclaimed_job_does_not_create_a_second_image(self, test_client, test_db_session):
+        img_byte_array = BytesIO()
+        Image.new("RGB", (60, 40), color=(0, 0, 255)).save(img_byte_array, format="JPEG")
+        job_id = self.post_image(test_client, img_byte_array.getvalue()).json()["id"]
+
+        new_image = None
+        try:
+            assert process_next_job(test_db_session)
+            job = test_db_session.get(Job, job_id)
+            new_image = test_db_session.get(ImageInfo, job.result_id)
+            image_count = test_db_session.query(ImageInfo).count()
+
+            # As if the worker had died after creating the image, and the job's lease had run out
+            job.status = "running"
+            job.locked_until = datetime.now(timezone.utc) - timedelta(seconds=1)
+            test_db_session.commit()
+
+            assert process_next_job(test_db_session)
+            test_db_session.refresh(job)
+            assert job.status == "succeeded"
+            assert job.result_id == new_image.id
+            assert test_db_session.query(ImageInfo).count() == image_count
+        finally:
+            if new_image and os.path.exists(new_image.image):
+                os.remove(new_image.image)
+
+    def test_lease_renewal(self, test_db_session):
+        job = Job(kind="process_upload", status="queued", payload={}, max_attempts=3, run_at=datetime.now(timezone.utc))
+        test_db_session.add(job)
+        test_db_session.commit()
+
+        job_service = JobService(test_db_session)
+        claimed = job_service.claim()
+        assert claimed.id == job.id
+        locked_until = claimed.locked_until
+
+        assert job_service.renew(job.id, claimed.attempts)
+        test_db_session.refresh(job)
+        assert job.locked_until >= locked_until
+        # Claimed again by another worker since: the lease is lost
+        assert not job_service.renew(job.id, claimed.attempts - 1)
+
+        # Renewed in the background while the job runs
+        job.locked_until = datetime.now(timezone.utc)
+        test_db_session.commit()
+        with renew_lease(test_db_session.get_bind(), job, interval=0.05):
+            time.sleep(0.3)
+        test_db_session.refresh(job)
+        assert job.locked_until.replace(tzinfo=None) > (
+            datetime.now(timezone.utc) + timedelta(seconds=settings.JOB_LEASE_SECONDS / 2)
+        ).replace(tzinfo=None)
+
+        job_service.complete(job)
+
+    def test_unknown_job_kind_fails_without_retry(self, test_db_session):
+        job = Job(kind="unknown", status="queued", payload={}, max_attempts=3, run_at=datetime.now(timezone.utc))
+        test_db_session.add(job)
+        test_db_session.commit()
+
+        assert process_next_job(test_db_session)
+        test_db_session.refresh(job)
+        assert job.status == "failed"
+        assert job.last_error == "Unknown job kind: unknown"
+
+    def test_job_not_found(self, test_client):
+        response = test_client.get("image_api/job/999")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
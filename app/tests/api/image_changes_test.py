@@ -0,0 +1,153 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+import pytest
+from fastapi import status
+from PIL import Image
+
+from app.db.models import ImageInfo, ImageTombstone, Tag
+from app.services.change_feed_service import encode_token
+
+
+class TestImageChangesAPI:
+    """
+    Test cases for the image change feed
+    """
+
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_data(self, test_db_session):
+        tag = Tag(name="tag1")
+        images = [
+            ImageInfo(
+                image=f"path/to/image{i}.jpg",
+                title=f"image{i}",
+                description=f"description{i}",
+                height=400,
+                width=300,
+                file_size=10000 + i,
+                tags=[tag],
+            )
+            for i in range(1, 4)
+        ]
+        test_db_session.add_all([tag] + images)
+        test_db_session.commit()
+
+    def changes(self, test_client, **params):
+        # Changes show up once the second they were made in is over on the SQLite stand-in
+        time.sleep(1)
+        response = test_client.get("image_api/image/changes", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        return response.json()
+
+    def test_changes_sync(self, test_client):
+        page = self.changes(test_client, limit=2)
+        assert [(change["op"], change["id"]) for change in page["changes"]] == [("created", 1), ("created", 2)]
+        assert page["changes"][0]["image"]["tags"] == [{"name": "tag1"}]
+        assert page["has_more"]
+
+        page = self.changes(test_client, since=page["next"], limit=2)
+        assert [(change["op"], change["id"]) for change in page["changes"]] == [("created", 3)]
+        assert not page["has_more"]
+
+        # Nothing changed: the token moves forward all the same
+        caught_up = self.changes(test_client, since=page["next"])
+        assert caught_up["changes"] == []
+
+        response = test_client.patch("image_api/image/1/", json={"title": "renamed"})
+        assert response.status_code == status.HTTP_200_OK
+        response = test_client.delete("image_api/image/2/")
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        page = self.changes(test_client, since=caught_up["next"])
+        assert [(change["op"], change["id"]) for change in page["changes"]] == [("updated", 1), ("deleted", 2)]
+        assert page["changes"][0]["image"]["title"] == "renamed"
+        assert page["changes"][1]["image"] is None
+
+        page = self.changes(test_client, since=page["next"])
+        assert page["changes"] == []
+
+    def test_changes_invalid_token(self, test_client):
+        for params in ({"since": "not a token"}, {"limit": 0}):
+            response = test_client.get("image_api/image/changes", params=params)
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_changes_expired_token(self, test_client):
+        old = datetime.now(timezone.utc) - timedelta(days=365)
+        since = encode_token(old, 0, old)
+        response = test_client.get("image_api/image/changes", params={"since": since})
+        assert response.status_code == status.HTTP_410_GONE
+
+    def test_tombstones_purged(self, test_client, test_db_session):
+        old = datetime.now(timezone.utc) - timedelta(days=365)
+        test_db_session.add(ImageTombstone(image_id=100, deleted_at=old))
+        test_db_session.commit()
+
+        response = test_client.delete("image_api/image/3/")
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert {tombstone.image_id for tombstone in test_db_session.query(ImageTombstone)} == {2, 3}
+
+    def test_tagged_upload_is_created(self, test_client):
+        caught_up = self.changes(test_client)
+        while caught_up["has_more"]:
+            caught_up = self.changes(test_client, since=caught_up["next"])
+
+        image = BytesIO()
+        Image.new("RGB", (100, 100), color=(255, 255, 255)).save(image, format="JPEG")
+        image_data = {"title": "tagged", "description": "tagged upload", "tags": ["tag1", "new tag"]}
+        response = test_client.post(
+            "image_api/image/",
+            files={"file": ("tagged.jpg", BytesIO(image.getvalue()))},
+            data={"image_data": json.dumps(image_data)},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        image_id = response.json()["id"]
+
+        # Its version was bumped by the flushes linking the tags, it is still new to the client
+        page = self.changes(test_client, since=caught_up["next"])
+        assert [(change["op"], change["id"]) for change in page["changes"]] == [("created", image_id)]
+        assert test_client.delete(f"image_api/image/{image_id}/").status_code == status.HTTP_204_NO_CONTENT
+
+
+class TestImageChangesRetentionAPI:
+    """
+    Test cases for the first sync of images older than the tombstone retention
+    """
+
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_data(self, test_db_session):
+        changed_at = datetime.now(timezone.utc) - timedelta(days=60)
+        images = [
+            ImageInfo(
+                image=f"path/to/image{i}.jpg",
+                title=f"image{i}",
+                description=f"description{i}",
+                height=400,
+                width=300,
+                file_size=10000 + i,
+                created_at=changed_at,
+                updated_at=changed_at,
+            )
+            for i in range(1, 4)
+        ]
+        test_db_session.add_all(images)
+        test_db_session.commit()
+
+    def test_changes_sync_old_images(self, test_client):
+        ids, since = [], None
+        for _ in range(4):
+            params = {"limit": 1} if since is None else {"limit": 1, "since": since}
+            response = test_client.get("image_api/image/changes", params=params)
+            assert response.status_code == status.HTTP_200_OK
+            page = response.json()
+            ids += [change["id"] for change in page["changes"]]
+            since = page["next"]
+            if not page["has_more"]:
+                break
+
+        assert ids == [1, 2, 3]
+
+        old = datetime.now(timezone.utc) - timedelta(days=60)
+        response = test_client.get("image_api/image/changes", params={"since": encode_token(old, 1, old)})
+        assert response.status_code == status.HTTP_410_GONE
@@ -1,5 +1,6 @@
 import pytest
 from fastapi import status
+from app.core import embedding_index, shared_cache
 from app.db.models import ImageInfo, Tag
 
 
@@ -50,6 +51,17 @@ class TestDeleteImageAPI:
         assert len(all_data) == img_count_before - 1
         assert all_data[0].id != delete_id
 
+    def test_delete_with_unavailable_cache(self, test_client, test_db_session, monkeypatch):
+        def failing_delete(*args):
+            raise OSError("No locks available")
+
+        monkeypatch.setattr(shared_cache, "delete", failing_delete)
+        monkeypatch.setattr(embedding_index, "delete", failing_delete)
+        # Committed before the cache and the embedding are dropped, so still a success
+        response = test_client.delete("image_api/image/2/")
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert test_db_session.get(ImageInfo, 2) is None
+
     def test_delete_not_exist(self, test_client, test_db_session):
         img_count_before = test_db_session.query(ImageInfo).count()
         print(img_count_before)
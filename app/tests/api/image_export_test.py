@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi import status
+from app.db.models import ImageInfo, Tag
+from app.services.export_service import ExportService
+
+
+class TestExportImagesAPI:
+    """
+    Test cases for the catalog export
+    """
+
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_data(self, test_db_session):
+        tags = [Tag(name="tag1"), Tag(name="tag2")]
+        images = [
+            ImageInfo(
+                image=f"path/to/image{i}.jpg",
+                title=f"image{i}",
+                description=f"description, {i}",
+                height=400,
+                width=300,
+                file_size=10000 + i,
+                tags=tags[: i % 2 + 1],
+            )
+            for i in range(1, 8)
+        ]
+        test_db_session.add_all(tags + images)
+        test_db_session.commit()
+
+    def test_export_ndjson(self, test_client):
+        response = test_client.get("image_api/image/export")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["id"] for row in rows] == list(range(1, 8))
+        assert rows[0]["image"] == "path/to/image1.jpg"
+        assert [tag["name"] for tag in rows[0]["tags"]] == ["tag1", "tag2"]
+
+    def test_export_csv_gzip(self, test_client):
+        response = test_client.get("image_api/image/export", params={"format": "csv", "gzip": True})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-encoding"] == "gzip"
+
+        # The test client decodes the gzip content encoding transparently
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 7
+        assert rows[0]["description"] == "description, 1"
+        assert rows[0]["tags"] == "tag1|tag2"
+
+    def test_export_range(self, test_client):
+        response = test_client.get("image_api/image/export", params={"after_id": 2, "until_id": 5})
+        assert [json.loads(line)["id"] for line in response.text.splitlines()] == [3, 4, 5]
+
+    def test_split_id_range_covers_all_ids(self, test_db_session):
+        ranges = ExportService(test_db_session).split_id_range(3)
+        assert len(ranges) == 3
+        assert ranges[0][0] == 0 and ranges[-1][1] == 7
+        assert all(previous[1] == current[0] for previous, current in zip(ranges, ranges[1:]))
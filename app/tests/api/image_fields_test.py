@@ -0,0 +1,95 @@
+import json
+
+import pytest
+from fastapi import status
+from sqlalchemy import inspect
+
+from app.db.models import ImageInfo, ImageVariant, Tag
+from app.schemas.image_info import ImageInfoFilters
+from app.services.image_service import ImageService
+
+
+class TestImageFieldsAPI:
+    """
+    Test cases for the sparse fieldsets of the image listing
+    """
+
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_data(self, test_db_session):
+        tags = [Tag(name="tag1"), Tag(name="tag2")]
+        images = [
+            ImageInfo(
+                image=f"path/to/image{i}.jpg",
+                title=f"image{i}",
+                description=f"description{i}" * 100,
+                height=400,
+                width=300,
+                file_size=10000 + i,
+                tags=tags[: i % 2 + 1],
+                variants=[ImageVariant(width=150, height=200, format="jpeg", file_size=500, key=f"variants/{i}.jpg")],
+            )
+            for i in range(1, 4)
+        ]
+        test_db_session.add_all(tags + images)
+        test_db_session.commit()
+
+    def test_get_images_fields(self, test_client):
+        response = test_client.get("image_api/image/", params={"fields": "width,id,height,srcset"})
+
+        assert response.status_code == status.HTTP_200_OK
+        rows = response.json()
+        rows.sort(key=lambda row: row["id"])
+        assert [row["id"] for row in rows] == [1, 2, 3]
+        assert rows[0] == {
+            "id": 1,
+            "height": 400,
+            "width": 300,
+            "srcset": [{"url": "/image_api/image/1/variants/150.jpeg", "width": 150, "height": 200, "file_size": 500}],
+        }
+
+    def test_get_images_fields_tags(self, test_client):
+        rows = test_client.get("image_api/image/", params={"fields": "id,tags", "tags": "tag2"}).json()
+
+        assert sorted(rows, key=lambda row: row["id"]) == [
+            {"id": 1, "tags": [{"name": "tag1"}, {"name": "tag2"}]},
+            {"id": 3, "tags": [{"name": "tag1"}, {"name": "tag2"}]},
+        ]
+
+    def test_get_images_without_fields(self, test_client):
+        rows = sorted(test_client.get("image_api/image/").json(), key=lambda row: row["id"])
+
+        assert list(rows[0]) == [
+            "title", "description", "id", "height", "width", "file_size", "created_at", "updated_at",
+            "blurhash", "palette", "srcset", "tags",
+        ]
+        assert rows[1]["tags"] == [{"name": "tag1"}]
+
+    def test_get_images_fields_invalid(self, test_client):
+        for fields in ("id,image", "", " , "):
+            response = test_client.get("image_api/image/", params={"fields": fields})
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_get_images_fields_etag(self, test_client):
+        etag = test_client.get("image_api/image/", params={"fields": "id"}).headers["ETag"]
+        response = test_client.get("image_api/image/", params={"fields": "id,title"}, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+
+        response = test_client.get("image_api/image/", params={"fields": "id"}, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_stream_images_fields(self, test_client):
+        response = test_client.get(
+            "image_api/image/", params={"fields": "id,title"}, headers={"Accept": "application/x-ndjson"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert rows == [{"title": f"image{i}", "id": i} for i in range(1, 4)]
+
+    def test_get_images_loads_only_fields(self, test_db_session):
+        test_db_session.expunge_all()
+        images = ImageService(test_db_session).get_images(ImageInfoFilters(fields="id,width"))
+
+        state = inspect(images[0])
+        assert {"id", "width"} <= set(state.dict)
+        assert not {"description", "title", "tags", "variants"} & set(state.dict)
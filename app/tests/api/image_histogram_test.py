@@ -0,0 +1,93 @@
+from datetime import date, datetime
+
+import pytest
+from fastapi import status
+
+from app.db.models import ImageDateRollup, ImageInfo
+
+
+def make_image(title: str, created_at: datetime) -> ImageInfo:
+    return ImageInfo(
+        image=f"path/to/{title}.jpg",
+        title=title,
+        description=title,
+        height=400,
+        width=300,
+        file_size=10000,
+        created_at=created_at,
+    )
+
+
+class TestImageHistogramAPI:
+    """
+    Test cases for the created date histogram
+    """
+
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_data(self, test_db_session):
+        images = [
+            make_image("image1", datetime(2023, 1, 5, 10)),
+            make_image("image2", datetime(2023, 1, 5, 18)),
+            make_image("image3", datetime(2023, 1, 20, 9)),
+            make_image("image4", datetime(2023, 3, 2, 12)),
+            make_image("deleted", datetime(2023, 3, 2, 13)),
+        ]
+        for image_info in images:
+            test_db_session.add(image_info)
+        test_db_session.commit()
+
+        test_db_session.delete(images[-1])
+        test_db_session.commit()
+
+    def test_histogram_by_day(self, test_client):
+        response = test_client.get("image_api/image/stats/histogram?bucket=day")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [
+            {"bucket": "2023-01-05", "count": 2},
+            {"bucket": "2023-01-20", "count": 1},
+            {"bucket": "2023-03-02", "count": 1},
+        ]
+
+    def test_histogram_by_month(self, test_client):
+        response = test_client.get("image_api/image/stats/histogram?bucket=month")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [
+            {"bucket": "2023-01-01", "count": 3},
+            {"bucket": "2023-03-01", "count": 1},
+        ]
+
+    def test_histogram_date_range(self, test_client):
+        response = test_client.get("image_api/image/stats/histogram?created_date__after=20230110&created_date__before=20230301")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [{"bucket": "2023-01-20", "count": 1}]
+
+    def test_histogram_single_day(self, test_client):
+        response = test_client.get("image_api/image/stats/histogram?created_date=20230105")
+        assert response.json() == [{"bucket": "2023-01-05", "count": 2}]
+
+        # Validated like the other created date filters
+        response = test_client.get("image_api/image/stats/histogram?created_date=20230105&created_date__after=20230101")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = test_client.get("image_api/image/stats/histogram?created_date__before=2023-03-01")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_histogram_invalid_bucket(self, test_client):
+        response = test_client.get("image_api/image/stats/histogram?bucket=week")
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_rollup_updated_at_commit(self, test_client, test_db_session):
+        def day_count():
+            response = test_client.get("image_api/image/stats/histogram?bucket=day&created_date__after=20230105")
+            return {bucket["bucket"]: bucket["count"] for bucket in response.json()}.get("2023-01-05")
+
+        # Flushed, but the shared per-day row is only written right before the commit
+        test_db_session.add(make_image("pending", datetime(2023, 1, 5, 12)))
+        test_db_session.flush()
+        assert test_db_session.query(ImageDateRollup.image_count).filter(
+            ImageDateRollup.bucket_date == date(2023, 1, 5)
+        ).scalar() == 2
+        test_db_session.rollback()
+        assert day_count() == 2
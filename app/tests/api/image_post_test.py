@@ -6,6 +6,8 @@ from PIL import Image
 from io import BytesIO
 from app.db.models import ImageInfo
 from app.core.config import settings
+from app.services.tag_service import TagService
+from app.storage.local import LocalStorage
 
 
 class TestPostImageAPI:
@@ -35,7 +37,14 @@ class TestPostImageAPI:
 
         return img_byte_array, image_data_payload
 
+    def remove_uploaded_file(self, test_db_session, response):
+        if response is not None and response.status_code == status.HTTP_201_CREATED:
+            new_image = test_db_session.query(ImageInfo).filter(ImageInfo.id == response.json()["id"]).first()
+            if new_image and os.path.exists(new_image.image):
+                os.remove(new_image.image)
+
     def test_valid_upload_image(self, test_client, test_db_session):
+        response = None
         try:
             img_byte_array, image_data_payload = self.gen_img_n_payload()
             image_data_str = json.dumps(image_data_payload)
@@ -49,15 +58,17 @@ class TestPostImageAPI:
             assert response.status_code == status.HTTP_201_CREATED
             response_data = response.json()
             assert response_data["title"] == image_data_payload["title"]
+            assert len(response_data["blurhash"]) == 28
+            assert response_data["palette"] == ["#ffffff"]
 
             new_image = test_db_session.query(ImageInfo).filter(ImageInfo.id == response_data["id"]).first()
             assert new_image is not None
 
         finally:
-            if os.path.exists(os.path.join(settings.MEDIA_FOLDER, "mock_image.jpg")):
-                os.remove(os.path.join(settings.MEDIA_FOLDER, "mock_image.jpg"))
+            self.remove_uploaded_file(test_db_session, response)
 
     def test_invalid_upload_image(self, test_client, test_db_session):
+        response = None
         try:
             img_byte_array, image_data_payload = self.gen_img_n_payload(invalid_img=True)
             image_data_str = json.dumps(image_data_payload)
@@ -70,10 +81,10 @@ class TestPostImageAPI:
             assert response.status_code == status.HTTP_400_BAD_REQUEST
 
         finally:
-            if os.path.exists(os.path.join(settings.MEDIA_FOLDER, "mock_image.jpg")):
-                os.remove(os.path.join(settings.MEDIA_FOLDER, "mock_image.jpg"))
+            self.remove_uploaded_file(test_db_session, response)
 
     def test_large_upload_image(self, test_client, test_db_session):
+        response = None
         try:
             img_byte_array, image_data_payload = self.gen_img_n_payload(size=settings.MAX_IMG_SIZE + 100)
             image_data_str = json.dumps(image_data_payload)
@@ -92,10 +103,10 @@ class TestPostImageAPI:
             assert new_image.file_size < img_byte_array.size
 
         finally:
-            if os.path.exists(os.path.join(settings.MEDIA_FOLDER, "mock_image.jpg")):
-                os.remove(os.path.join(settings.MEDIA_FOLDER, "mock_image.jpg"))
+            self.remove_uploaded_file(test_db_session, response)
 
     def test_upload_image_w_ext(self, test_client, test_db_session):
+        response = None
         try:
             img_byte_array, image_data_payload = self.gen_img_n_payload()
             image_data_str = json.dumps(image_data_payload)
@@ -114,11 +125,59 @@ class TestPostImageAPI:
             assert new_image is not None
             assert new_image.image.split(".")[-1] == "png"
 
-            saved_img = Image.open(os.path.join(settings.MEDIA_FOLDER, "mock_image.png"))
+            saved_img = Image.open(new_image.image)
             saved_img.close()
             assert saved_img.format == 'PNG'
 
 
         finally:
-            if os.path.exists(os.path.join(settings.MEDIA_FOLDER, "mock_image.png")):
-                os.remove(os.path.join(settings.MEDIA_FOLDER, "mock_image.png"))
+            self.remove_uploaded_file(test_db_session, response)
+
+    def test_same_filename_uploads_keep_their_files(self, test_client, test_db_session):
+        image_ids = []
+        for color in ((255, 0, 0), (0, 0, 255)):
+            img_byte_array = BytesIO()
+            Image.new("RGB", (100, 100), color=color).save(img_byte_array, format="JPEG")
+            response = test_client.post(
+                "image_api/image/",
+                files={"file": ("same_name.jpg", BytesIO(img_byte_array.getvalue()))},
+                data={"image_data": json.dumps({"title": "same name", "description": "same name", "tags": []})},
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+            image_ids.append(response.json()["id"])
+
+        first, second = (test_db_session.get(ImageInfo, image_id) for image_id in image_ids)
+        assert first.image != second.image
+        second_path = second.image
+
+        # Deleting one leaves the other's file alone
+        assert test_client.delete(f"image_api/image/{image_ids[0]}/").status_code == status.HTTP_204_NO_CONTENT
+        assert os.path.exists(second_path)
+        assert test_client.delete(f"image_api/image/{image_ids[1]}/").status_code == status.HTTP_204_NO_CONTENT
+
+    def test_failed_upload_removes_its_files(self, test_client, test_db_session, monkeypatch):
+        written = []
+        put = LocalStorage.put
+
+        def recording_put(storage, name, data):
+            written.append(put(storage, name, data))
+            return written[-1]
+
+        def failing_tag(tag_service, name):
+            raise RuntimeError("tag lookup failed")
+
+        monkeypatch.setattr(LocalStorage, "put", recording_put)
+        monkeypatch.setattr(TagService, "get_or_create_tag", failing_tag)
+        img_byte_array, image_data_payload = self.gen_img_n_payload()
+        image_data_payload["title"] = "failed upload"
+        response = test_client.post(
+            "image_api/image/",
+            files={"file": ("failed.jpg", img_byte_array)},
+            data={"image_data": json.dumps(image_data_payload)},
+        )
+
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        # The image was stored before the failure
+        assert written
+        assert not any(os.path.exists(key) for key in written)
+        assert test_db_session.query(ImageInfo).filter(ImageInfo.title == "failed upload").count() == 0
@@ -0,0 +1,139 @@
+import json
+import os
+from io import BytesIO
+
+import pytest
+from fastapi import status
+from PIL import Image
+
+from app.cli.job_worker import process_next_job
+from app.core.config import settings
+from app.db.models import ImagePyramid, ImageTile, Job
+
+
+class TestImagePyramidAPI:
+    """
+    Test cases for the Deep Zoom descriptor and tile endpoints
+    """
+
+    @pytest.fixture(autouse=True)
+    def pyramid_settings(self, monkeypatch):
+        monkeypatch.setattr(settings, "PYRAMID_MODE", "lazy")
+        monkeypatch.setattr(settings, "PYRAMID_MIN_DIMENSION", 500)
+        monkeypatch.setattr(settings, "PYRAMID_TILE_SIZE", 256)
+
+    def upload(self, test_client, size):
+        img_byte_array = BytesIO()
+        Image.new("RGB", size, color=(0, 128, 255)).save(img_byte_array, format="JPEG")
+        img_byte_array.seek(0)
+        response = test_client.post(
+            "image_api/image/",
+            files={"file": ("panorama.jpg", img_byte_array)},
+            data={"image_data": json.dumps({"title": "panorama", "description": "wide", "tags": []})},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        return response.json()["id"]
+
+    def test_small_image_has_no_pyramid(self, test_client, test_db_session):
+        image_id = self.upload(test_client, (300, 200))
+        assert test_client.get(f"image_api/image/{image_id}/pyramid.dzi").status_code == status.HTTP_404_NOT_FOUND
+        test_client.delete(f"image_api/image/{image_id}/")
+
+    def test_lazy_pyramid(self, test_client, test_db_session):
+        image_id = self.upload(test_client, (600, 400))
+        pyramid = test_db_session.get(ImagePyramid, image_id)
+        assert pyramid.status == "pending"
+        assert os.path.exists(pyramid.source_key)
+
+        response = test_client.get(f"image_api/image/{image_id}/pyramid.dzi")
+        assert response.status_code == status.HTTP_200_OK
+        assert 'TileSize="256"' in response.text
+        assert '<Size Width="600" Height="400"/>' in response.text
+
+        # The first tile request queues the build for a job worker, once
+        for _ in range(2):
+            response = test_client.get(f"image_api/image/{image_id}/pyramid_files/10/2_1.jpeg")
+            assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert response.headers["Retry-After"]
+        assert test_db_session.query(Job).filter(Job.kind == "build_pyramid").count() == 1
+        assert process_next_job(test_db_session)
+
+        response = test_client.get(f"image_api/image/{image_id}/pyramid_files/10/2_1.jpeg")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "image/jpeg"
+        assert "immutable" in response.headers["cache-control"]
+        assert Image.open(BytesIO(response.content)).size == (89, 145)
+
+        test_db_session.expire_all()
+        assert test_db_session.get(ImagePyramid, image_id).status == "ready"
+        assert test_client.get(f"image_api/image/{image_id}/pyramid_files/0/0_0.jpeg").status_code == 200
+
+        response = test_client.get(
+            f"image_api/image/{image_id}/pyramid_files/10/2_1.jpeg", headers={"If-None-Match": response.headers["ETag"]}
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        for path in ("10/3_0.jpeg", "11/0_0.jpeg", "10/0_0.png"):
+            response = test_client.get(f"image_api/image/{image_id}/pyramid_files/{path}")
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        # Deleting the image deletes the pyramid and its files
+        tile_keys = [tile.key for tile in test_db_session.query(ImageTile).filter(ImageTile.image_id == image_id)]
+        assert test_client.delete(f"image_api/image/{image_id}/").status_code == status.HTTP_204_NO_CONTENT
+        assert test_db_session.query(ImageTile).filter(ImageTile.image_id == image_id).count() == 0
+        assert not any(os.path.exists(key) for key in tile_keys + [pyramid.source_key])
+
+    def test_ingest_pyramid(self, test_client, test_db_session, monkeypatch):
+        monkeypatch.setattr(settings, "PYRAMID_MODE", "ingest")
+        image_id = self.upload(test_client, (700, 300))
+        assert test_db_session.get(ImagePyramid, image_id).status == "ready"
+        assert test_db_session.query(ImageTile).filter(ImageTile.image_id == image_id).count() > 0
+        test_client.delete(f"image_api/image/{image_id}/")
+
+    def test_pyramid_past_the_decompression_bomb_limit(self, test_client, test_db_session, monkeypatch):
+        # 600x400 is over twice Pillow's limit here, which would make it refuse the image
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100_000)
+        image_id = self.upload(test_client, (600, 400))
+        test_client.get(f"image_api/image/{image_id}/pyramid_files/10/2_1.jpeg")
+        assert process_next_job(test_db_session)
+        response = test_client.get(f"image_api/image/{image_id}/pyramid_files/10/2_1.jpeg")
+        assert response.status_code == status.HTTP_200_OK
+        assert Image.MAX_IMAGE_PIXELS == 100_000
+        test_client.delete(f"image_api/image/{image_id}/")
+
+        monkeypatch.setattr(settings, "PYRAMID_MAX_PIXELS", 200_000)
+        img_byte_array = BytesIO()
+        Image.new("RGB", (600, 400)).save(img_byte_array, format="JPEG")
+        with pytest.warns(Image.DecompressionBombWarning):
+            response = test_client.post(
+                "image_api/image/",
+                files={"file": ("panorama.jpg", BytesIO(img_byte_array.getvalue()))},
+                data={"image_data": json.dumps({"title": "panorama", "description": "too large", "tags": []})},
+            )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_failed_lazy_build_is_retried_by_its_job(self, test_client, test_db_session):
+        image_id = self.upload(test_client, (600, 400))
+        source_key = test_db_session.get(ImagePyramid, image_id).source_key
+        with open(source_key, "rb") as source:
+            contents = source.read()
+        os.remove(source_key)
+
+        test_client.get(f"image_api/image/{image_id}/pyramid_files/10/2_1.jpeg")
+        assert process_next_job(test_db_session)
+        job = test_db_session.query(Job).filter(Job.kind == "build_pyramid").order_by(Job.id.desc()).first()
+        assert job.status == "queued" and job.last_error
+        # Still claimed by the job, so tile requests do not queue another build meanwhile
+        test_db_session.expire_all()
+        assert test_db_session.get(ImagePyramid, image_id).status == "building"
+        test_client.get(f"image_api/image/{image_id}/pyramid_files/10/2_1.jpeg")
+        assert test_db_session.query(Job).filter(Job.kind == "build_pyramid", Job.status == "queued").count() == 1
+
+        with open(source_key, "wb") as source:
+            source.write(contents)
+        job.run_at = job.created_at
+        test_db_session.commit()
+        assert process_next_job(test_db_session)
+        test_db_session.expire_all()
+        assert test_db_session.get(ImagePyramid, image_id).status == "ready"
+        test_client.delete(f"image_api/image/{image_id}/")
@@ -0,0 +1,79 @@
+import json
+from io import BytesIO
+
+import pytest
+from fastapi import status
+from PIL import Image
+
+from app.core import embedding_index
+
+
+class TestImageSimilarAPI:
+    """
+    Test cases for the similarity search over the image embeddings
+    """
+
+    @pytest.fixture(autouse=True)
+    def index(self, tmp_path, monkeypatch):
+        index = embedding_index.EmbeddingIndex(str(tmp_path / "embeddings"))
+        monkeypatch.setattr(embedding_index, "_embedding_index", index)
+        yield index
+        index.close()
+
+    def upload(self, test_client, description, color, tags, white_width=0):
+        image = Image.new("RGB", (100, 80), color=color)
+        image.paste((255, 255, 255), (0, 0, white_width, 80))
+        img_byte_array = BytesIO()
+        image.save(img_byte_array, format="PNG")
+        img_byte_array.seek(0)
+        response = test_client.post(
+            "image_api/image/?ext=png",
+            files={"file": (f"swatch-{description}.png", img_byte_array)},
+            data={"image_data": json.dumps({"title": "swatch", "description": description, "tags": tags})},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        return response.json()["id"]
+
+    def test_similar(self, test_client, test_db_session, index):
+        red = self.upload(test_client, "red", (220, 20, 20), ["warm"])
+        red_stripe = self.upload(test_client, "red_stripe", (220, 20, 20), ["warm"], white_width=10)
+        red_white = self.upload(test_client, "red_white", (220, 20, 20), ["other"], white_width=50)
+        # Nothing in common with the red one, so never listed with it
+        blue = self.upload(test_client, "blue", (20, 20, 220), ["cold"])
+        assert index.get(red) is not None
+
+        response = test_client.get(f"image_api/image/{red}/similar")
+        assert response.status_code == status.HTTP_200_OK
+        results = response.json()
+        assert [result["image"]["id"] for result in results] == [red_stripe, red_white]
+        assert 0 < results[1]["score"] < results[0]["score"] <= 1
+        assert results[0]["image"]["title"] == "swatch"
+
+        response = test_client.get(f"image_api/image/{red}/similar", params={"k": 1})
+        assert [result["image"]["id"] for result in response.json()] == [red_stripe]
+        response = test_client.get(f"image_api/image/{red}/similar", params={"tags": "warm"})
+        assert [result["image"]["id"] for result in response.json()] == [red_stripe]
+        response = test_client.get(f"image_api/image/{red}/similar", params={"created_date__before": "20000101"})
+        assert response.json() == []
+        response = test_client.get(f"image_api/image/{red}/similar", params={"k": 0})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        # An image stored without an embedding gets it on its first search
+        index.delete(blue)
+        assert test_client.get(f"image_api/image/{blue}/similar").status_code == status.HTTP_200_OK
+        assert index.get(blue) is not None
+
+        assert test_client.delete(f"image_api/image/{red_stripe}/").status_code == status.HTTP_204_NO_CONTENT
+        assert index.get(red_stripe) is None
+        response = test_client.get(f"image_api/image/{red}/similar")
+        assert [result["image"]["id"] for result in response.json()] == [red_white]
+
+        assert test_client.get("image_api/image/999/similar").status_code == status.HTTP_404_NOT_FOUND
+        for image_id in (red, red_white, blue):
+            test_client.delete(f"image_api/image/{image_id}/")
+
+    def test_disabled(self, test_client, monkeypatch):
+        monkeypatch.setattr(embedding_index, "_embedding_index", None)
+        response = test_client.get("image_api/image/1/similar")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json()["detail"] == "Similarity search is disabled"
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+from fastapi import status
+from app.db.models import ImageInfo, Tag
+
+
+class TestStreamImagesAPI:
+    """
+    Test cases for the NDJSON image listing
+    """
+
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_data(self, test_db_session):
+        tags = [Tag(name="tag1"), Tag(name="tag2")]
+        images = [
+            ImageInfo(
+                image=f"path/to/image{i}.jpg",
+                title=f"image{i}",
+                description=f"description{i}",
+                height=400,
+                width=300,
+                file_size=10000 + i,
+                tags=tags[: i % 2 + 1],
+            )
+            for i in range(1, 6)
+        ]
+        test_db_session.add_all(tags + images)
+        test_db_session.commit()
+
+    def stream(self, test_client, **params):
+        response = test_client.get("image_api/image/", params=params, headers={"Accept": "application/x-ndjson"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_stream_matches_json_listing(self, test_client):
+        expected = test_client.get("image_api/image/").json()
+        rows = self.stream(test_client)
+
+        assert sorted(rows, key=lambda row: row["id"]) == sorted(expected, key=lambda row: row["id"])
+
+    def test_stream_filters(self, test_client):
+        rows = self.stream(test_client, tags="tag2")
+        assert {row["id"] for row in rows} == {1, 3, 5}
+
+        rows = self.stream(test_client, offset=1, limit=2)
+        assert [row["id"] for row in rows] == [2, 3]
+
+    def test_stream_etag_differs_from_json(self, test_client):
+        json_etag = test_client.get("image_api/image/").headers["ETag"]
+        response = test_client.get(
+            "image_api/image/", headers={"Accept": "application/x-ndjson", "If-None-Match": json_etag}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["Vary"] == "Accept"
+
+        response = test_client.get(
+            "image_api/image/", headers={"Accept": "application/x-ndjson", "If-None-Match": response.headers["ETag"]}
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
@@ -0,0 +1,158 @@
+import json
+import os
+from io import BytesIO
+
+import pytest
+from fastapi import status
+from PIL import Image
+from app.core.config import settings
+from app.db.models import IdempotencyKey, ImageInfo, UploadSession
+
+
+def make_jpeg() -> bytes:
+    img_byte_array = BytesIO()
+    Image.new("RGB", (120, 90), color=(10, 200, 30)).save(img_byte_array, format="JPEG")
+    return img_byte_array.getvalue()
+
+
+class TestUploadSessionAPI:
+    """
+    Test cases for resumable chunked uploads and idempotent uploads
+    """
+
+    @pytest.fixture(autouse=True)
+    def upload_folder(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "UPLOAD_SESSION_FOLDER", str(tmp_path))
+
+    @pytest.fixture
+    def created_images(self, test_db_session):
+        image_ids = []
+        yield image_ids
+        for image in test_db_session.query(ImageInfo).filter(ImageInfo.id.in_(image_ids)):
+            if os.path.exists(image.image):
+                os.remove(image.image)
+
+    def create_session(self, test_client, contents: bytes):
+        response = test_client.post(
+            "image_api/image/uploads/",
+            json={"title": "chunked", "description": "chunked upload", "tags": ["chunked"],
+                  "filename": "chunked.jpg", "total_size": len(contents)},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.headers["Upload-Offset"] == "0"
+        return response.json()["id"]
+
+    def patch_chunk(self, test_client, upload_id: str, offset: int, chunk: bytes):
+        return test_client.patch(
+            f"image_api/image/uploads/{upload_id}",
+            content=chunk,
+            headers={"Upload-Offset": str(offset), "Content-Type": "application/offset+octet-stream"},
+        )
+
+    def test_chunked_upload(self, test_client, test_db_session, created_images):
+        contents = make_jpeg()
+        upload_id = self.create_session(test_client, contents)
+        middle = len(contents) // 2
+
+        response = self.patch_chunk(test_client, upload_id, 0, contents[:middle])
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert response.headers["Upload-Offset"] == str(middle)
+
+        # A chunk at the wrong offset is rejected with the offset to resume from
+        response = self.patch_chunk(test_client, upload_id, 0, contents[:middle])
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.headers["Upload-Offset"] == str(middle)
+
+        # Finalizing an incomplete upload is rejected
+        response = test_client.post(f"image_api/image/uploads/{upload_id}/finalize")
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+        response = test_client.get(f"image_api/image/uploads/{upload_id}")
+        assert response.json()["received"] == middle
+
+        response = self.patch_chunk(test_client, upload_id, middle, contents[middle:])
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+        response = test_client.post(f"image_api/image/uploads/{upload_id}/finalize")
+        assert response.status_code == status.HTTP_201_CREATED
+        created_images.append(response.json()["id"])
+        assert (response.json()["width"], response.json()["height"]) == (120, 90)
+        assert not os.path.exists(os.path.join(settings.UPLOAD_SESSION_FOLDER, f"{upload_id}.part"))
+
+        # Finalizing again returns the same image
+        retry = test_client.post(f"image_api/image/uploads/{upload_id}/finalize")
+        assert retry.status_code == status.HTTP_201_CREATED
+        assert retry.json()["id"] == response.json()["id"]
+
+    def test_concurrent_finalize(self, test_client, test_db_session):
+        contents = make_jpeg()
+        upload_id = self.create_session(test_client, contents)
+        assert self.patch_chunk(test_client, upload_id, 0, contents).status_code == status.HTTP_204_NO_CONTENT
+        assert not [name for name in os.listdir(settings.UPLOAD_SESSION_FOLDER) if name.endswith(".chunk")]
+
+        # Another request is finalizing the session: no second image, and no more chunks
+        upload = test_db_session.get(UploadSession, upload_id)
+        upload.status = "finalizing"
+        test_db_session.commit()
+        response = test_client.post(f"image_api/image/uploads/{upload_id}/finalize")
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert self.patch_chunk(test_client, upload_id, len(contents), b"x").status_code == status.HTTP_409_CONFLICT
+
+        test_db_session.delete(upload)
+        test_db_session.commit()
+
+    def test_failed_finalize_reopens_session(self, test_client, test_db_session):
+        contents = b"invalid image data"
+        upload_id = self.create_session(test_client, contents)
+        assert self.patch_chunk(test_client, upload_id, 0, contents).status_code == status.HTTP_204_NO_CONTENT
+
+        response = test_client.post(f"image_api/image/uploads/{upload_id}/finalize")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert test_client.get(f"image_api/image/uploads/{upload_id}").json()["status"] == "open"
+
+    def test_oversized_chunk(self, test_client):
+        contents = make_jpeg()
+        upload_id = self.create_session(test_client, contents)
+
+        response = self.patch_chunk(test_client, upload_id, 0, contents + b"extra")
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+        response = test_client.delete(f"image_api/image/uploads/{upload_id}")
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert test_client.get(f"image_api/image/uploads/{upload_id}").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_idempotent_post(self, test_client, test_db_session, created_images):
+        contents = make_jpeg()
+        image_data = json.dumps({"title": "idempotent", "description": "idempotent upload", "tags": []})
+
+        def post(data=image_data):
+            return test_client.post(
+                "image_api/image/",
+                files={"file": ("idempotent.jpg", BytesIO(contents))},
+                data={"image_data": data},
+                headers={"Idempotency-Key": "upload-1"},
+            )
+
+        first = post()
+        assert first.status_code == status.HTTP_201_CREATED
+        created_images.append(first.json()["id"])
+
+        retry = post()
+        assert retry.status_code == status.HTTP_201_CREATED
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert retry.json() == first.json()
+        assert test_db_session.query(ImageInfo).filter(ImageInfo.title == "idempotent").count() == 1
+
+        # The same key with a different request is refused
+        other = post(json.dumps({"title": "other", "description": "other upload", "tags": []}))
+        assert other.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_failed_request_releases_key(self, test_client, test_db_session):
+        response = test_client.post(
+            "image_api/image/",
+            files={"file": ("invalid.jpg", BytesIO(b"invalid image data"))},
+            data={"image_data": json.dumps({"title": "invalid", "description": "invalid", "tags": []})},
+            headers={"Idempotency-Key": "upload-2"},
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert test_db_session.query(IdempotencyKey).filter(IdempotencyKey.key == "upload-2").count() == 0
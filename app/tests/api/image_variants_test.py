@@ -0,0 +1,70 @@
+import json
+import os
+from io import BytesIO
+
+import pytest
+from fastapi import status
+from PIL import Image
+
+from app.core.config import settings
+from app.db.models import ImageVariant
+
+
+class TestImageVariantsAPI:
+    """
+    Test cases for the responsive variants generated at upload
+    """
+
+    @pytest.fixture(autouse=True)
+    def variant_settings(self, monkeypatch):
+        monkeypatch.setattr(settings, "VARIANT_WIDTHS", [320, 640, 1280])
+        monkeypatch.setattr(settings, "VARIANT_FORMAT", "jpeg")
+
+    def upload(self, test_client, size):
+        img_byte_array = BytesIO()
+        Image.new("RGB", size, color=(255, 128, 0)).save(img_byte_array, format="JPEG")
+        img_byte_array.seek(0)
+        response = test_client.post(
+            "image_api/image/",
+            files={"file": ("sunset.jpg", img_byte_array)},
+            data={"image_data": json.dumps({"title": "sunset", "description": "orange", "tags": []})},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        return response.json()
+
+    def test_srcset(self, test_client, test_db_session):
+        image = self.upload(test_client, (800, 600))
+        # No variant is wider than the image itself
+        assert [variant["width"] for variant in image["srcset"]] == [320, 640]
+        assert image["srcset"][0]["height"] == 240
+        assert image["srcset"][0]["url"] == f"/image_api/image/{image['id']}/variants/320.jpeg"
+
+        response = test_client.get(f"image_api/image/{image['id']}")
+        assert response.json()["srcset"] == image["srcset"]
+
+        response = test_client.get(image["srcset"][1]["url"])
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "image/jpeg"
+        assert "immutable" in response.headers["cache-control"]
+        variant = Image.open(BytesIO(response.content))
+        assert variant.size == (640, 480)
+        assert variant.info.get("progressive")
+
+        response = test_client.get(image["srcset"][1]["url"], headers={"If-None-Match": response.headers["ETag"]})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        for path in ("640.webp", "1280.jpeg"):
+            response = test_client.get(f"image_api/image/{image['id']}/variants/{path}")
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        # Deleting the image deletes the variants and their files
+        keys = [variant.key for variant in test_db_session.query(ImageVariant).filter_by(image_id=image["id"])]
+        assert len(keys) == 2
+        assert test_client.delete(f"image_api/image/{image['id']}/").status_code == status.HTTP_204_NO_CONTENT
+        assert test_db_session.query(ImageVariant).filter_by(image_id=image["id"]).count() == 0
+        assert not any(os.path.exists(key) for key in keys)
+
+    def test_small_image_has_no_variants(self, test_client, test_db_session):
+        image = self.upload(test_client, (200, 100))
+        assert image["srcset"] == []
+        test_client.delete(f"image_api/image/{image['id']}/")
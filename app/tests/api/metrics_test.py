@@ -0,0 +1,55 @@
+import json
+import os
+from io import BytesIO
+
+from fastapi import status
+from PIL import Image
+
+from app.db.models import ImageInfo
+
+
+class TestMetricsAPI:
+    """
+    Test cases for the metrics endpoint
+    """
+
+    def test_request_latency_by_route(self, test_client):
+        test_client.get("image_api/tag/tags/")
+        response = test_client.get("metrics")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'imagefastapi_request_duration_seconds_count{method="GET",route="get_tags",status="200"}' in response.text
+
+    def test_upload_stage_metrics(self, test_client, test_db_session):
+        img_byte_array = BytesIO()
+        Image.new("RGB", (100, 100), color=(255, 255, 255)).save(img_byte_array, format="JPEG")
+        img_byte_array.seek(0)
+        response = None
+        try:
+            response = test_client.post(
+                "image_api/image/",
+                files={"file": ("metrics_image.jpg", img_byte_array)},
+                data={"image_data": json.dumps({"title": "metrics", "description": "metrics", "tags": ["metrics_tag"]})},
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+
+            metrics_text = test_client.get("metrics").text
+            for stage in ("read", "header_sniff", "write", "db_insert", "tag_link", "commit"):
+                assert f'imagefastapi_upload_stage_duration_seconds_count{{stage="{stage}"}}' in metrics_text
+            assert 'imagefastapi_upload_bytes_total{direction="in"}' in metrics_text
+        finally:
+            if response is not None and response.status_code == status.HTTP_201_CREATED:
+                new_image = test_db_session.query(ImageInfo).filter(ImageInfo.id == response.json()["id"]).first()
+                if os.path.exists(new_image.image):
+                    os.remove(new_image.image)
+
+    def test_error_counter(self, test_client):
+        response = test_client.post(
+            "image_api/image/",
+            files={"file": ("metrics_invalid.jpg", BytesIO(b"invalid image data"))},
+            data={"image_data": json.dumps({"title": "metrics", "description": "metrics"})},
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        metrics_text = test_client.get("metrics").text
+        assert 'imagefastapi_errors_total{error_type="UnknownImageFormat",route="upload_image"}' in metrics_text
@@ -0,0 +1,56 @@
+import pytest
+from fastapi import status
+
+from app.core.config import settings
+from app.core.profiling import PROFILE_HEADER, PROFILE_ID_HEADER
+from app.utils.profiler import ProfileStore
+
+
+class TestProfilingAPI:
+    """
+    Test cases for the opt-in request profiling
+    """
+
+    @pytest.fixture(autouse=True)
+    def profiling_settings(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(settings, "PROFILING_SECRET", "profiling-secret")
+        monkeypatch.setattr(settings, "PROFILING_SAMPLE_RATE", 1.0)
+        monkeypatch.setattr(settings, "PROFILING_FOLDER", str(tmp_path))
+
+    def test_profile_request_with_token(self, test_client):
+        response = test_client.get("image_api/tag/tags/", headers={PROFILE_HEADER: "profiling-secret"})
+        assert response.status_code == status.HTTP_200_OK
+        profile_name = response.headers[PROFILE_ID_HEADER]
+
+        response = test_client.get("image_api/admin/profiles/", headers={PROFILE_HEADER: "profiling-secret"})
+        assert response.status_code == status.HTTP_200_OK
+        assert profile_name in [profile["name"] for profile in response.json()]
+
+        response = test_client.get(
+            f"image_api/admin/profiles/{profile_name}", headers={PROFILE_HEADER: "profiling-secret"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["profiles"] is not None
+
+    def test_no_profile_without_token(self, test_client):
+        response = test_client.get("image_api/tag/tags/", headers={PROFILE_HEADER: "wrong-secret"})
+        assert response.status_code == status.HTTP_200_OK
+        assert PROFILE_ID_HEADER not in response.headers
+
+        response = test_client.get("image_api/admin/profiles/")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_non_ascii_token(self, test_client):
+        headers = {PROFILE_HEADER: "profiling-secr\xe9t".encode("latin-1")}
+        response = test_client.get("image_api/tag/tags/", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert PROFILE_ID_HEADER not in response.headers
+        assert test_client.get("image_api/admin/profiles/", headers=headers).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_profile_store_is_bounded(self, tmp_path):
+        store = ProfileStore(str(tmp_path), max_files=3)
+        names = [store.save(f"profile{i}", {"profiles": []}) for i in range(5)]
+
+        stored = [profile["name"] for profile in store.list()]
+        assert stored == names[:1:-1]
+        assert store.path("../profile0.speedscope.json") is None
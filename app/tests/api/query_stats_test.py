@@ -0,0 +1,51 @@
+import logging
+
+import pytest
+from fastapi import status
+
+from app.core.config import settings
+from app.db.models import ImageInfo, Tag
+
+
+class TestQueryStats:
+    """
+    Test cases for the SQL query instrumentation
+    """
+
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_data(self, test_db_session):
+        tag = Tag(name="query_stats_tag")
+        test_db_session.add(tag)
+        test_db_session.add(
+            ImageInfo(
+                image="path/to/image1.jpg",
+                title="image1",
+                description="secret description",
+                height=400,
+                width=300,
+                file_size=10000,
+                tags=[tag],
+            )
+        )
+        test_db_session.commit()
+
+    def test_server_timing_header(self, test_client):
+        response = test_client.get("image_api/image/")
+
+        assert response.status_code == status.HTTP_200_OK
+        server_timing = response.headers["Server-Timing"]
+        assert server_timing.startswith("db;dur=")
+        assert "queries" in server_timing
+        assert "db-slowest;dur=" in server_timing
+
+    def test_slow_query_parameters_redacted(self, test_client, monkeypatch, caplog):
+        monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+
+        with caplog.at_level(logging.WARNING, logger="app.db.query_events"):
+            response = test_client.get("image_api/image/?tags=query_stats_tag")
+
+        assert response.status_code == status.HTTP_200_OK
+        slow_logs = [record.getMessage() for record in caplog.records if "Slow query" in record.getMessage()]
+        assert slow_logs
+        assert all("redacted" in message for message in slow_logs)
+        assert not any("query_stats_tag" in message for message in slow_logs)
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import pytest
+from fastapi import status
+from sqlalchemy import func, select
+
+from app.db.models import ImageInfo, Tag, image_tags_association
+
+
+class TestTagBulkAPI:
+    """
+    Test cases for the bulk retag, tag rename and tag merge operations
+    """
+
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_data(self, test_db_session):
+        tags = {name: Tag(name=name, name_slug=name) for name in ("cat", "kitten", "dog", "outdoor")}
+        images = [
+            ImageInfo(image="path/to/cat1.jpg", title="cat1", description="d", height=1, width=1, file_size=1,
+                      created_at=datetime(2023, 1, 1), tags=[tags["cat"], tags["kitten"]]),
+            ImageInfo(image="path/to/cat2.jpg", title="cat2", description="d", height=1, width=1, file_size=1,
+                      created_at=datetime(2023, 1, 2), tags=[tags["kitten"]]),
+            ImageInfo(image="path/to/dog1.jpg", title="dog1", description="d", height=1, width=1, file_size=1,
+                      created_at=datetime(2023, 2, 1), tags=[tags["dog"], tags["outdoor"]]),
+        ]
+        test_db_session.add_all(list(tags.values()) + images)
+        test_db_session.commit()
+
+    def links(self, db, tag_name):
+        query = (
+            select(image_tags_association.c.image_id)
+            .join(Tag, Tag.id == image_tags_association.c.tag_id)
+            .where(Tag.name == tag_name)
+            .order_by(image_tags_association.c.image_id)
+        )
+        return db.scalars(query).all()
+
+    def tag_id(self, db, tag_name):
+        return db.scalars(select(Tag.id).where(Tag.name == tag_name)).one()
+
+    def test_retag(self, test_client, test_db_session):
+        versions = dict(test_db_session.execute(select(ImageInfo.id, ImageInfo.version)).all())
+
+        # cat1 already has kitten: only the missing link is added, and only the changed images bumped
+        response = test_client.post("image_api/image/tags/", json={"image_ids": [1, 2, 3], "add": ["kitten"]})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"updated_images": 1, "added_links": 1, "removed_links": 0}
+        assert self.links(test_db_session, "kitten") == [1, 2, 3]
+        test_db_session.expire_all()
+        new_versions = dict(test_db_session.execute(select(ImageInfo.id, ImageInfo.version)).all())
+        assert new_versions == {1: versions[1], 2: versions[2], 3: versions[3] + 1}
+
+        # Selected by a filter, with a new tag created on the way
+        response = test_client.post(
+            "image_api/image/tags/",
+            json={"created_date__before": "20230131", "add": ["indoor"], "remove": ["kitten", "missing"]},
+        )
+        assert response.json() == {"updated_images": 2, "added_links": 2, "removed_links": 2}
+        assert self.links(test_db_session, "kitten") == [3]
+        assert self.links(test_db_session, "indoor") == [1, 2]
+
+        response = test_client.post("image_api/image/tags/", json={"tags": ["dog"], "remove": ["kitten"]})
+        assert response.json() == {"updated_images": 1, "added_links": 0, "removed_links": 1}
+        assert test_client.get("image_api/image/3").json()["tags"] == [{"name": "dog"}, {"name": "outdoor"}]
+
+        # Nothing selected, nothing to do, or both filters at once
+        invalid_bodies = (
+            {"add": ["dog"]},
+            {"image_ids": [1]},
+            {"created_date": "20230101", "created_date__after": "20230101", "add": ["x"]},
+        )
+        for body in invalid_bodies:
+            response = test_client.post("image_api/image/tags/", json=body)
+            assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_rename(self, test_client, test_db_session):
+        cat_id = self.tag_id(test_db_session, "cat")
+        image = test_client.get("image_api/image/1")
+        response = test_client.patch(f"image_api/tag/tags/{cat_id}/", json={"name": "Cat Pictures"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"id": cat_id, "name": "Cat Pictures", "name_slug": "cat-pictures"}
+
+        # The image lists the tag under its new name, with a new ETag
+        response = test_client.get("image_api/image/1")
+        assert {"name": "Cat Pictures"} in response.json()["tags"]
+        assert response.headers["ETag"] != image.headers["ETag"]
+
+        response = test_client.patch(f"image_api/tag/tags/{cat_id}/", json={"name": "dog"})
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert test_client.patch("image_api/tag/tags/999/", json={"name": "x"}).status_code == 404
+
+    def test_merge(self, test_client, test_db_session):
+        indoor_id, dog_id = self.tag_id(test_db_session, "indoor"), self.tag_id(test_db_session, "dog")
+        test_client.post("image_api/image/tags/", json={"image_ids": [3], "add": ["indoor"]})
+        assert self.links(test_db_session, "indoor") == [1, 2, 3]
+
+        response = test_client.post(f"image_api/tag/tags/{indoor_id}/merge/", json={"into_id": dog_id})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["name"] == "dog"
+        # Image 3 already had dog: it is not linked twice
+        assert self.links(test_db_session, "dog") == [1, 2, 3]
+        assert self.links(test_db_session, "indoor") == []
+        assert "indoor" not in [tag["name"] for tag in test_client.get("image_api/tag/tags").json()]
+        count = test_db_session.scalar(select(func.count()).select_from(image_tags_association))
+        assert count == len(set(test_db_session.execute(select(image_tags_association)).all()))
+
+        response = test_client.post(f"image_api/tag/tags/{dog_id}/merge/", json={"into_id": dog_id})
+        assert response.status_code == status.HTTP_409_CONFLICT
+        response = test_client.post(f"image_api/tag/tags/{indoor_id}/merge/", json={"into_id": dog_id})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
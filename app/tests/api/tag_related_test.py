@@ -0,0 +1,102 @@
+import pytest
+from fastapi import status
+from sqlalchemy import select
+
+from app.db.models import ImageInfo, Tag, TagCooccurrence
+from app.db.rollups import link_pair_deltas, rebuild_tag_pairs, tag_pair_deltas
+
+
+def image(title, tags):
+    return ImageInfo(image=f"path/to/{title}.jpg", title=title, description="d", height=1, width=1, file_size=1,
+                     tags=tags)
+
+
+class TestRelatedTagsAPI:
+    """
+    Test cases for the related tags, from the tag co-occurrence counts
+    """
+
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_data(self, test_db_session):
+        tags = {name: Tag(name=name, name_slug=name) for name in ("beach", "sea", "sand", "city", "sunset")}
+        test_db_session.add_all([
+            image("a", [tags["beach"], tags["sea"], tags["sand"]]),
+            image("b", [tags["beach"], tags["sea"]]),
+            image("c", [tags["beach"], tags["sunset"]]),
+            image("d", [tags["sea"], tags["city"]]),
+            image("e", [tags["city"], tags["sunset"]]),
+            image("f", [tags["city"]]),
+        ])
+        test_db_session.commit()
+
+    def counts(self, db):
+        rows = db.execute(select(TagCooccurrence.tag_id, TagCooccurrence.related_tag_id, TagCooccurrence.image_count))
+        return {(tag_id, related_tag_id): count for tag_id, related_tag_id, count in rows if count}
+
+    def assert_counts_match_links(self, db):
+        # The incrementally maintained counts are what a full rebuild computes
+        counts = self.counts(db)
+        rebuild_tag_pairs(db.connection())
+        assert counts == self.counts(db)
+        db.rollback()
+
+    def test_pair_deltas(self):
+        assert tag_pair_deltas([], [1, 2]) == {(1, 1): 1, (1, 2): 1, (2, 1): 1, (2, 2): 1}
+        assert tag_pair_deltas([1, 2], [2, 3]) == {(1, 1): -1, (1, 2): -1, (2, 1): -1, (2, 3): 1, (3, 2): 1, (3, 3): 1}
+
+    def test_pair_counts_applied_at_commit(self, test_db_session):
+        beach = test_db_session.scalar(select(Tag).where(Tag.name == "beach"))
+        before = self.counts(test_db_session)
+        test_db_session.add(image("g", [beach]))
+        test_db_session.flush()
+        # Flushed, but the shared pair rows are only written right before the commit
+        assert self.counts(test_db_session) == before
+        test_db_session.rollback()
+        assert self.counts(test_db_session) == before
+
+    def test_related(self, test_client, test_db_session):
+        self.assert_counts_match_links(test_db_session)
+
+        response = test_client.get("image_api/tag/beach/related")
+        assert response.status_code == status.HTTP_200_OK
+        related = [(tag["name"], tag["image_count"], round(tag["score"], 3)) for tag in response.json()]
+        # sea: 2 of the 4 images carrying beach or sea; sand: 1 of 3; sunset: 1 of 4
+        assert related == [("sea", 2, 0.5), ("sand", 1, 0.333), ("sunset", 1, 0.25)]
+
+        response = test_client.get("image_api/tag/beach/related", params={"metric": "lift", "k": 2})
+        # sand: 1 * 6 images / (3 * 1)
+        assert [(tag["name"], round(tag["score"], 3)) for tag in response.json()] == [("sand", 2.0), ("sea", 1.333)]
+        response = test_client.get("image_api/tag/beach/related", params={"min_count": 2})
+        assert [tag["name"] for tag in response.json()] == ["sea"]
+
+        assert test_client.get("image_api/tag/missing/related").status_code == status.HTTP_404_NOT_FOUND
+        assert test_client.get("image_api/tag/beach/related?metric=cosine").status_code == 422
+
+    def test_kept_in_sync(self, test_client, test_db_session):
+        ids = dict(test_db_session.execute(select(ImageInfo.title, ImageInfo.id)).all())
+
+        response = test_client.patch(f"image_api/image/{ids['f']}/", json={"tags": ["city", "sunset", "night"]})
+        assert response.status_code == status.HTTP_200_OK
+        self.assert_counts_match_links(test_db_session)
+
+        assert test_client.delete(f"image_api/image/{ids['a']}/").status_code == status.HTTP_204_NO_CONTENT
+        self.assert_counts_match_links(test_db_session)
+        assert [tag["name"] for tag in test_client.get("image_api/tag/beach/related").json()] == ["sea", "sunset"]
+
+        body = {"tags": ["city"], "add": ["sea"], "remove": ["night"]}
+        response = test_client.post("image_api/image/tags/", json=body)
+        assert response.status_code == status.HTTP_200_OK
+        self.assert_counts_match_links(test_db_session)
+
+        city_id, sunset_id, sea_id = (
+            test_db_session.scalar(select(Tag.id).where(Tag.name == name)) for name in ("city", "sunset", "sea")
+        )
+        # The pair changes of a link come from the other links of its image alone
+        deltas = link_pair_deltas(test_db_session.connection(), [(ids["f"], sea_id)], [])
+        assert deltas == tag_pair_deltas([city_id, sunset_id], [city_id, sunset_id, sea_id])
+        test_db_session.rollback()
+
+        response = test_client.post(f"image_api/tag/tags/{sunset_id}/merge/", json={"into_id": sea_id})
+        assert response.status_code == status.HTTP_200_OK
+        self.assert_counts_match_links(test_db_session)
+        assert (sunset_id, sunset_id) not in self.counts(test_db_session)
@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+from fastapi import status
+
+from app.core import tag_index
+from app.db.models import ImageInfo, Tag
+from app.services.tag_service import TagService
+
+
+class TestTagSuggestAPI:
+    """
+    Test cases for the tag autocomplete
+    """
+
+    @pytest.fixture(autouse=True, scope="class")
+    def setup_data(self, test_db_session):
+        tags = {name: Tag(name=name, name_slug=name.lower()) for name in ("Sunset", "sunrise", "sun", "beach sunset")}
+        images = [
+            ImageInfo(image=f"path/to/{i}.jpg", title=str(i), description="d", height=1, width=1, file_size=1,
+                      tags=[tags["sunrise"]] + ([tags["Sunset"]] if i < 2 else []))
+            for i in range(3)
+        ]
+        test_db_session.add_all(list(tags.values()) + images)
+        test_db_session.commit()
+
+    @pytest.fixture(autouse=True)
+    def fresh_index(self, monkeypatch):
+        # The index is per process: drop the one loaded from another test class's database
+        monkeypatch.setattr(tag_index, "_tag_index", None)
+
+    def test_suggest(self, test_client):
+        response = test_client.get("image_api/tag/suggest", params={"prefix": "su"})
+        assert response.status_code == status.HTTP_200_OK
+        assert [(tag["name"], tag["image_count"]) for tag in response.json()] == [
+            ("sunrise", 3), ("Sunset", 2), ("sun", 0)
+        ]
+        response = test_client.get("image_api/tag/suggest", params={"prefix": "SU", "limit": 1})
+        assert [tag["name"] for tag in response.json()] == ["sunrise"]
+
+    def test_fuzzy_fallback(self, test_client):
+        # Not a prefix of any tag: filled in from the database
+        response = test_client.get("image_api/tag/suggest", params={"prefix": "set"})
+        assert [tag["name"] for tag in response.json()] == ["Sunset", "beach sunset"]
+        assert response.json()[0]["image_count"] == 2
+        response = test_client.get("image_api/tag/suggest", params={"prefix": "se"})
+        assert response.json() == []
+
+    def test_new_and_renamed_tags(self, test_client, test_db_session):
+        assert test_client.get("image_api/tag/suggest", params={"prefix": "sunf"}).json() == []
+        response = test_client.post("image_api/image/tags/", json={"image_ids": [1], "add": ["sunflower"]})
+        assert response.status_code == status.HTTP_200_OK
+        assert [tag["name"] for tag in test_client.get("image_api/tag/suggest?prefix=sunf").json()] == ["sunflower"]
+
+        sun_id = test_db_session.query(Tag.id).filter_by(name="sun").scalar()
+        test_client.patch(f"image_api/tag/tags/{sun_id}/", json={"name": "Solar"})
+        # Reloaded in the background
+        reload_thread = tag_index._reload_thread
+        if reload_thread is not None:
+            reload_thread.join()
+        assert [tag["name"] for tag in test_client.get("image_api/tag/suggest?prefix=sol").json()] == ["Solar"]
+
+    def test_rolled_back_tag_not_suggested(self, test_client, test_db_session):
+        assert test_client.get("image_api/tag/suggest", params={"prefix": "moon"}).json() == []
+        TagService(test_db_session).get_or_create_tag("moonlight")
+        test_db_session.rollback()
+        assert test_client.get("image_api/tag/suggest", params={"prefix": "moon"}).json() == []
+
+    def test_stale_index_reloaded_in_background(self, test_client, test_db_session, monkeypatch):
+        index = tag_index.get_tag_index(test_db_session)
+        monkeypatch.setattr(tag_index, "_loaded_at", float("-inf"))
+        reloaded = threading.Event()
+        monkeypatch.setattr(tag_index, "load_tag_entries", lambda db: reloaded.wait(5) and [])
+
+        # Answered from the previous index while the reload waits
+        response = test_client.get("image_api/tag/suggest", params={"prefix": "sunr"})
+        assert [tag["name"] for tag in response.json()] == ["sunrise"]
+        reload_thread = tag_index._reload_thread
+        assert reload_thread is not None and tag_index._tag_index is index
+        reloaded.set()
+        reload_thread.join()
+        assert tag_index._tag_index is not index
+
+    def test_invalid_query(self, test_client):
+        for params in ({"prefix": ""}, {"prefix": "a", "limit": 0}):
+            response = test_client.get("image_api/tag/suggest", params=params)
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = test_client.get("image_api/tag/suggest")
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,102 @@
+import asyncio
+
+from app.core.admission import READ, UPLOAD, AdmissionControlMiddleware, ConcurrencyLimiter, classify_request
+
+
+def make_scope(method: str, path: str) -> dict:
+    return {"type": "http", "method": method, "path": path, "headers": []}
+
+
+class TestConcurrencyLimiter:
+    """
+    Test cases for the admission limiter
+    """
+
+    def test_admits_up_to_limit_then_queues_then_rejects(self):
+        async def scenario():
+            limiter = ConcurrencyLimiter("test", limit=1, max_queue=1, timeout=1)
+            assert await limiter.acquire()
+
+            queued = asyncio.create_task(limiter.acquire())
+            await asyncio.sleep(0)
+            assert len(limiter.waiters) == 1
+
+            # The queue is full
+            assert not await limiter.acquire()
+
+            # Releasing hands the slot to the queued request
+            limiter.release()
+            assert await queued
+            assert limiter.in_flight == 1
+
+            limiter.release()
+            assert limiter.in_flight == 0
+
+        asyncio.run(scenario())
+
+    def test_queue_timeout(self):
+        async def scenario():
+            limiter = ConcurrencyLimiter("test", limit=1, max_queue=5, timeout=0.01)
+            assert await limiter.acquire()
+            assert not await limiter.acquire()
+            assert not limiter.waiters
+
+            limiter.release()
+            assert limiter.in_flight == 0
+
+        asyncio.run(scenario())
+
+
+class TestAdmissionControlMiddleware:
+    """
+    Test cases for the admission control middleware
+    """
+
+    def test_classify_request(self):
+        assert classify_request(make_scope("POST", "/image_api/image/")) == UPLOAD
+        assert classify_request(make_scope("PATCH", "/image_api/image/uploads/abc")) == UPLOAD
+        assert classify_request(make_scope("GET", "/image_api/image/1")) == READ
+        assert classify_request(make_scope("PATCH", "/image_api/image/1/")) is None
+        assert classify_request(make_scope("GET", "/metrics")) is None
+
+    def test_saturated_uploads_get_503_while_reads_pass(self):
+        async def scenario():
+            release_upload = asyncio.Event()
+            sent = []
+
+            async def app(scope, receive, send):
+                if scope["method"] == "POST":
+                    await release_upload.wait()
+                await send({"type": "http.response.start", "status": 200, "headers": []})
+                await send({"type": "http.response.body", "body": b""})
+
+            def collect(responses):
+                async def send(message):
+                    if message["type"] == "http.response.start":
+                        responses.append((message["status"], dict(message["headers"])))
+                return send
+
+            limiters = {
+                UPLOAD: ConcurrencyLimiter(UPLOAD, limit=1, max_queue=0, timeout=1),
+                READ: ConcurrencyLimiter(READ, limit=1, max_queue=0, timeout=1),
+            }
+            middleware = AdmissionControlMiddleware(app, limiters=limiters)
+
+            upload = asyncio.create_task(middleware(make_scope("POST", "/image_api/image/"), None, collect(sent)))
+            await asyncio.sleep(0)
+
+            rejected = []
+            await middleware(make_scope("POST", "/image_api/image/"), None, collect(rejected))
+            assert rejected[0][0] == 503
+            assert b"retry-after" in rejected[0][1]
+
+            read = []
+            await middleware(make_scope("GET", "/image_api/image/1"), None, collect(read))
+            assert read[0][0] == 200
+
+            release_upload.set()
+            await upload
+            assert sent[0][0] == 200
+            assert limiters[UPLOAD].in_flight == 0
+
+        asyncio.run(scenario())
@@ -0,0 +1,78 @@
+import numpy as np
+import PIL.Image
+import pytest
+
+from app.core.embedding_index import GROW_ROWS, HEADER_SIZE, EmbeddingIndex
+from app.utils.embedding import EMBEDDING_DIM, image_embedding
+
+
+class TestEmbeddingIndex:
+    """
+    Test cases for the memory-mapped embedding matrix
+    """
+
+    @pytest.fixture
+    def index(self, tmp_path):
+        index = EmbeddingIndex(str(tmp_path / "embeddings"), dim=4)
+        yield index
+        index.close()
+
+    def test_put_get_delete(self, index):
+        assert index.get(3) is None
+        index.put(3, [1, 0, 0, 0])
+        assert index.get(3).tolist() == [1, 0, 0, 0]
+        assert index.get(2) is None
+        assert len(index.matrix()) == GROW_ROWS
+
+        index.delete(3)
+        assert index.get(3) is None
+        with pytest.raises(ValueError):
+            index.put(1, [1, 0])
+
+    def test_shared_between_instances(self, index):
+        other = EmbeddingIndex(index.path, dim=4)
+        try:
+            assert len(other.matrix()) == 0
+            index.put(GROW_ROWS + 1, [0, 1, 0, 0])
+            # The other worker remaps the grown file on its next search
+            assert other.nearest(np.array([0, 1, 0, 0]), k=5) == [(GROW_ROWS + 1, 1.0)]
+        finally:
+            other.close()
+
+        # A file laid out for another dimension is started over
+        other = EmbeddingIndex(index.path, dim=8)
+        assert other.matrix().shape == (0, 8)
+        other.close()
+
+    def test_nearest(self, index):
+        vectors = {1: [1, 0, 0, 0], 2: [0.8, 0.6, 0, 0], 3: [0, 1, 0, 0], 4: [-1, 0, 0, 0], 6: [0.6, 0, 0.8, 0]}
+        for image_id, vector in vectors.items():
+            index.put(image_id, vector)
+
+        nearest = index.nearest(np.array([1, 0, 0, 0]), k=10, exclude=1)
+        assert [image_id for image_id, _ in nearest] == [2, 6]
+        assert nearest[0][1] == pytest.approx(0.8)
+        assert [image_id for image_id, _ in index.nearest(np.array([1, 0, 0, 0]), k=2)] == [1, 2]
+        # Pre-filtered: only the given ids are scored, and ids past the end of the matrix are ignored
+        nearest = index.nearest(np.array([1, 0, 0, 0]), k=10, ids=[3, 6, 10**6])
+        assert [image_id for image_id, _ in nearest] == [6]
+        assert index.nearest(np.array([1, 0, 0, 0]), k=10, ids=[]) == []
+
+    def test_empty_and_header(self, index):
+        assert index.nearest(np.ones(4), k=3) == []
+        with open(index.path, "rb") as f:
+            assert f.read(8) == b"IFEM0001"
+        assert HEADER_SIZE % 4 == 0
+
+    def test_image_embedding(self):
+        red = image_embedding(PIL.Image.new("RGB", (200, 100), (230, 20, 20)))
+        assert red.dtype == np.float32 and red.shape == (EMBEDDING_DIM,)
+        # A flat image has no luminance layout, and only its colour histogram half
+        assert np.linalg.norm(red) == pytest.approx(np.sqrt(0.5))
+
+        gradient = PIL.Image.linear_gradient("L").convert("RGB")
+        embedding = image_embedding(gradient)
+        assert np.linalg.norm(embedding) == pytest.approx(1.0)
+        flipped = image_embedding(gradient.transpose(PIL.Image.Transpose.FLIP_TOP_BOTTOM))
+        # Same colours, opposite layout
+        assert float(embedding @ embedding) > float(embedding @ flipped)
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Seconds importing app.main may take in a fresh interpreter; override where the machine is slower
+IMPORT_TIME_BUDGET = float(os.environ.get("IMAGEFASTAPI_IMPORT_TIME_BUDGET", "5.0"))
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
+
+class TestImportTime:
+    """
+    Guard the worker boot time against regressions, e.g. a heavy dependency imported at module level
+    """
+
+    def test_app_import_within_budget(self):
+        env = {"IMAGEFASTAPI_DB_USER": "user", "IMAGEFASTAPI_DB_PASSWORD": "password", **os.environ}
+        # Best of three, so one slow run on a busy machine does not fail the test
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "import app.main"], cwd=PROJECT_ROOT, env=env, check=True)
+            timings.append(time.perf_counter() - start)
+
+        assert min(timings) < IMPORT_TIME_BUDGET, f"Importing app.main took {min(timings):.2f}s"
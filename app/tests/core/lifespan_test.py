@@ -0,0 +1,47 @@
+import asyncio
+
+from app.core import lifespan
+
+
+class TestLifespanWarmup:
+    """
+    Test cases for the startup warm-ups and the readiness endpoint
+    """
+
+    def test_ready_after_warmups(self, test_client, monkeypatch):
+        calls = []
+        monkeypatch.setattr(lifespan, "WARMUPS", {"first": lambda: calls.append("first")})
+        monkeypatch.setattr(lifespan, "warmup_errors", {})
+
+        response = test_client.get("/ready")
+        assert response.status_code == 503
+
+        asyncio.run(lifespan.run_warmups())
+        assert calls == ["first"]
+
+        response = test_client.get("/ready")
+        assert response.status_code == 200
+        assert response.json() == {"ready": True, "warmups": {"first": None}}
+
+    def test_failed_warmup_keeps_worker_not_ready(self, test_client, monkeypatch):
+        def broken():
+            raise RuntimeError("database unreachable")
+
+        monkeypatch.setattr(lifespan, "WARMUPS", {"ok": lambda: None, "broken": broken})
+        monkeypatch.setattr(lifespan, "warmup_errors", {})
+
+        asyncio.run(lifespan.run_warmups())
+
+        response = test_client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["warmups"] == {"ok": None, "broken": "database unreachable"}
+
+    def test_preload_codecs_round_trips_accepted_formats(self):
+        import PIL.Image
+
+        from app.utils.image_util import ACCEPTED_FORMAT_PLUGINS, ImageUtil
+
+        ImageUtil.preload_codecs()
+        for image_format in ACCEPTED_FORMAT_PLUGINS:
+            assert image_format in PIL.Image.OPEN
+            assert image_format in PIL.Image.SAVE
@@ -0,0 +1,85 @@
+import pytest
+
+from app.core.shared_cache import HEADER_SIZE, IMAGES, SLOT_HEADER, TAGS, SharedCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "shared-cache")
+
+
+class TestSharedCache:
+    """
+    Test cases for the cross-worker memory-mapped cache
+    """
+
+    def test_set_and_get(self, cache_path):
+        cache = SharedCache(cache_path, slots=16, slot_size=1024)
+        assert cache.get(IMAGES, 1, version="v1") is None
+
+        assert cache.set(IMAGES, 1, b'{"id": 1}', version="v1")
+        assert cache.get(IMAGES, 1, version="v1") == b'{"id": 1}'
+        # A newer row version misses
+        assert cache.get(IMAGES, 1, version="v2") is None
+        assert cache.get(TAGS, 1, version="v1") is None
+        cache.close()
+
+    def test_shared_between_mappings(self, cache_path):
+        # Two mappings of the same file stand for two worker processes
+        worker1 = SharedCache(cache_path, slots=16, slot_size=1024)
+        worker2 = SharedCache(cache_path, slots=16, slot_size=1024)
+
+        worker1.set(TAGS, "all", b"[]")
+        assert worker2.get(TAGS, "all") == b"[]"
+
+        worker2.invalidate(TAGS)
+        assert worker1.get(TAGS, "all") is None
+
+        worker1.set(IMAGES, 5, b"image")
+        worker2.delete(IMAGES, 5)
+        assert worker1.get(IMAGES, 5) is None
+        worker1.close()
+        worker2.close()
+
+    def test_value_loaded_before_invalidation_is_not_current(self, cache_path):
+        cache = SharedCache(cache_path, slots=16, slot_size=1024)
+        generation = cache.generation(TAGS)
+        cache.invalidate(TAGS)
+
+        cache.set(TAGS, "all", b"stale", generation=generation)
+        assert cache.get(TAGS, "all") is None
+        cache.close()
+
+    def test_too_large_and_torn_values(self, cache_path):
+        cache = SharedCache(cache_path, slots=1, slot_size=64)
+        assert not cache.set(IMAGES, 1, b"x" * 64)
+
+        assert cache.set(IMAGES, 1, b"value")
+        # A write torn half way through the value
+        start = HEADER_SIZE + SLOT_HEADER.size
+        cache.buffer[start:start + 1] = b"V"
+        assert cache.get(IMAGES, 1) is None
+        cache.close()
+
+    def test_get_or_load(self, cache_path):
+        cache = SharedCache(cache_path, slots=16, slot_size=1024)
+        loads = []
+
+        def load():
+            loads.append(1)
+            return b"loaded"
+
+        assert cache.get_or_load(TAGS, "all", load, version=1) == b"loaded"
+        assert cache.get_or_load(TAGS, "all", load, version=1) == b"loaded"
+        assert len(loads) == 1
+        assert cache.get_or_load(TAGS, "missing", lambda: None) is None
+        cache.close()
+
+    def test_layout_change_resets_file(self, cache_path):
+        cache = SharedCache(cache_path, slots=16, slot_size=1024)
+        cache.set(TAGS, "all", b"[]")
+        cache.close()
+
+        cache = SharedCache(cache_path, slots=32, slot_size=1024)
+        assert cache.get(TAGS, "all") is None
+        cache.close()
@@ -0,0 +1,30 @@
+from app.core.tag_index import TagEntry, TagIndex
+
+
+class TestTagIndex:
+    """
+    Test cases for the in-memory tag prefix index
+    """
+
+    def test_suggest(self):
+        index = TagIndex([
+            TagEntry(1, "New York", "new-york", 5),
+            TagEntry(2, "newborn", "newborn", 12),
+            TagEntry(3, "News", "news", 5),
+            TagEntry(4, "nature", "nature", 40),
+            TagEntry(5, "Ñandú", "nandu", 1),
+        ])
+        assert [tag.id for tag in index.suggest("new", 10)] == [2, 1, 3]
+        assert [tag.id for tag in index.suggest("NEW", 2)] == [2, 1]
+        # Matches through the slug, and a tag matching through both is listed once
+        assert [tag.id for tag in index.suggest("new-y", 10)] == [1]
+        assert [tag.id for tag in index.suggest("n", 10)] == [4, 2, 1, 3, 5]
+        assert [tag.id for tag in index.suggest("ña", 10)] == [5]
+        assert index.suggest("x", 10) == []
+
+    def test_added_tags(self):
+        index = TagIndex([TagEntry(1, "cat", "cat", 3)])
+        index.add(TagEntry(2, "caterpillar", "caterpillar", 0))
+        index.add(TagEntry(1, "cat", "cat", 0))
+        assert [tag.id for tag in index.suggest("cat", 10)] == [1, 2]
+        assert index.suggest("cat", 10)[0].image_count == 3
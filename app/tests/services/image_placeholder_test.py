@@ -0,0 +1,60 @@
+import numpy as np
+import PIL.Image
+
+from app.db.models import ImageInfo
+from app.services.image_service import ImageService
+from app.utils.placeholder import blurhash, dominant_colors, image_placeholder
+
+
+class TestImagePlaceholder:
+    """
+    Test cases for the BlurHash and palette placeholders
+    """
+
+    def test_blurhash_of_solid_colour(self):
+        pixels = np.full((8, 8, 3), (255, 0, 0), dtype=np.uint8)
+        # Size flag, maximum AC value, then the average colour ("TI:j" for red)
+        assert blurhash(pixels, 1, 1) == "00TI:j"
+        result = blurhash(pixels)
+        assert len(result) == 28
+        assert result[0] == "L" and result[2:6] == "TI:j"
+
+    def test_blurhash_of_gradient(self):
+        pixels = np.zeros((16, 16, 3), dtype=np.uint8)
+        pixels[:, :, 0] = np.linspace(0, 255, 16, dtype=np.uint8)[None, :]
+        result = blurhash(pixels)
+        assert len(result) == 28
+        assert result != blurhash(pixels.transpose(1, 0, 2))
+
+    def test_dominant_colors_most_common_first(self):
+        pixels = np.zeros((10, 10, 3), dtype=np.uint8)
+        pixels[:7] = (250, 250, 250)
+        pixels[7:] = (10, 20, 200)
+        assert dominant_colors(pixels) == ["#fafafa", "#0a14c8"]
+        assert dominant_colors(pixels, count=1) == ["#fafafa"]
+
+    def test_image_placeholder_of_transparent_image(self):
+        image = PIL.Image.new("RGBA", (300, 200), (0, 0, 0, 0))
+        placeholder = image_placeholder(image)
+        assert placeholder.palette == ["#ffffff"]
+        assert len(placeholder.blurhash) == 28
+
+    def test_backfill_placeholders(self, test_db_session):
+        test_db_session.add_all(
+            [ImageInfo(image=f"path/to/image{i}.jpg", title=f"image{i}", file_size=1) for i in range(1, 4)]
+        )
+        test_db_session.commit()
+
+        image_service = ImageService(test_db_session)
+        missing = image_service.get_images_missing_placeholder(after_id=0, limit=2)
+        assert [image_id for image_id, _ in missing] == [1, 2]
+
+        placeholder = image_placeholder(PIL.Image.new("RGB", (4, 4), (255, 0, 0)))
+        assert image_service.set_placeholders({1: placeholder, 2: placeholder}) == 2
+
+        image = test_db_session.get(ImageInfo, 1)
+        test_db_session.refresh(image)
+        assert image.blurhash == placeholder.blurhash
+        assert image.palette == "#ff0000"
+        assert image.version == 2
+        assert [image_id for image_id, _ in image_service.get_images_missing_placeholder(0, 10)] == [3]
@@ -0,0 +1,26 @@
+from io import BytesIO
+
+import PIL.Image
+
+from app.utils.image_variants import iter_variants
+
+
+class TestImageVariants:
+    """
+    Test cases for downscaling images into responsive variants
+    """
+
+    def test_widest_first_and_narrower_only(self):
+        image = PIL.Image.new("RGB", (1000, 500), (10, 200, 10))
+        variants = list(iter_variants(image, [1600, 250, 500, 1000]))
+        assert [(width, height) for width, height, _ in variants] == [(500, 250), (250, 125)]
+        assert PIL.Image.open(BytesIO(variants[0][2])).size == (500, 250)
+
+    def test_transparent_image_to_webp(self):
+        image = PIL.Image.new("RGBA", (400, 300), (0, 0, 0, 0))
+        [(width, height, data)] = iter_variants(image, [100], file_ext="webp")
+        variant = PIL.Image.open(BytesIO(data))
+        assert variant.format == "WEBP"
+        assert (width, height) == variant.size == (100, 75)
+        # Transparent areas are flattened onto white
+        assert variant.convert("RGB").getpixel((50, 37))[0] > 240
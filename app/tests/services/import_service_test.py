@@ -0,0 +1,47 @@
+from app.db.models import ImageDateRollup, ImageInfo, Tag
+from app.services.import_service import ImportService
+
+
+def make_record(content_hash, tags):
+    return {
+        "image": f"path/to/{content_hash}.jpg",
+        "title": content_hash,
+        "description": None,
+        "height": 400,
+        "width": 300,
+        "file_size": 10000,
+        "content_hash": content_hash,
+        "tags": tags,
+    }
+
+
+class TestImportService:
+    """
+    Test cases for the bulk import batches
+    """
+
+    def test_insert_batch(self, test_db_session):
+        test_db_session.add(Tag(name="existing tag"))
+        test_db_session.commit()
+
+        import_service = ImportService(test_db_session)
+        inserted = import_service.insert_batch([
+            make_record("hash1", ["existing tag", "New Tag"]),
+            make_record("hash2", ["New Tag"]),
+        ])
+        assert inserted == 2
+
+        images = test_db_session.query(ImageInfo).order_by(ImageInfo.id).all()
+        assert [image.content_hash for image in images] == ["hash1", "hash2"]
+        assert [tag.name for tag in images[0].tags] == ["existing tag", "New Tag"]
+        assert images[0].version == 1
+
+        new_tag = test_db_session.query(Tag).filter(Tag.name == "New Tag").one()
+        assert new_tag.name_slug == "new-tag"
+        assert len(new_tag.images) == 2
+
+        assert sum(rollup.image_count for rollup in test_db_session.query(ImageDateRollup)) == 2
+
+    def test_find_imported_hashes(self, test_db_session):
+        import_service = ImportService(test_db_session)
+        assert import_service.find_imported_hashes(["hash1", "hash3"]) == {"hash1"}
@@ -0,0 +1,47 @@
+from io import BytesIO
+
+import PIL.Image
+import pytest
+
+from app.utils.image_pyramid import iter_pyramid_tiles, level_size, max_level
+
+
+class TestImagePyramid:
+    """
+    Test cases for cutting Deep Zoom tile pyramids
+    """
+
+    def test_levels(self):
+        assert max_level(1, 1) == 0
+        assert max_level(600, 400) == 10
+        assert level_size(600, 400, 10) == (600, 400)
+        assert level_size(600, 400, 9) == (300, 200)
+        assert level_size(600, 400, 1) == (2, 1)
+        assert level_size(600, 400, 0) == (1, 1)
+
+    def test_tiles_cover_every_level(self):
+        image = PIL.Image.new("RGB", (300, 130), (200, 10, 10))
+        tiles = {(level, col, row): data for level, col, row, data in iter_pyramid_tiles(image, tile_size=128)}
+
+        top = max_level(300, 130)
+        for level in range(top + 1):
+            width, height = level_size(300, 130, level)
+            cols, rows = -(-width // 128), -(-height // 128)
+            assert {(col, row) for lvl, col, row in tiles if lvl == level} == {
+                (col, row) for col in range(cols) for row in range(rows)
+            }
+
+        # Cells plus one pixel of overlap on the sides that have a neighbour
+        sizes = {key: PIL.Image.open(BytesIO(data)).size for key, data in tiles.items()}
+        assert sizes[(top, 0, 0)] == (129, 129)
+        assert sizes[(top, 1, 0)] == (130, 129)
+        assert sizes[(top, 2, 1)] == (45, 3)
+        assert sizes[(top - 1, 1, 0)] == (23, 65)
+        assert sizes[(0, 0, 0)] == (1, 1)
+
+        # The lower levels are downscaled from the one above, so the colour carries through
+        assert PIL.Image.open(BytesIO(tiles[(0, 0, 0)])).convert("RGB").getpixel((0, 0))[0] > 150
+
+    def test_odd_tile_size_rejected(self):
+        with pytest.raises(ValueError):
+            list(iter_pyramid_tiles(PIL.Image.new("RGB", (10, 10)), tile_size=255))
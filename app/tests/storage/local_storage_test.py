@@ -0,0 +1,76 @@
+import os
+from collections import namedtuple
+
+import pytest
+
+from app.storage import StorageError, StorageNotFoundError
+from app.storage.local import LocalStorage
+
+DiskUsage = namedtuple("DiskUsage", ["total", "used", "free"])
+
+
+class TestLocalStorage:
+    """
+    Test cases for the local filesystem storage backend
+    """
+
+    def test_put_get_stat_delete(self, tmp_path):
+        storage = LocalStorage([str(tmp_path)])
+        key = storage.put("image.jpg", b"image data")
+
+        assert key.startswith(str(tmp_path))
+        assert storage.get(key) == b"image data"
+        assert storage.stat(key).size == len(b"image data")
+
+        storage.delete(key)
+        with pytest.raises(StorageNotFoundError):
+            storage.get(key)
+        with pytest.raises(StorageNotFoundError):
+            storage.delete(key)
+
+    def test_hashed_fan_out(self, tmp_path):
+        storage = LocalStorage([str(tmp_path)])
+        key = storage.put("tiles/1/0_0.jpg", b"tile")
+
+        relative_parts = os.path.relpath(key, tmp_path).split(os.sep)
+        assert len(relative_parts[0]) == 2 and len(relative_parts[1]) == 2
+        assert relative_parts[2:] == ["tiles", "1", "0_0.jpg"]
+        # The file was renamed into place, no temporary file is left behind
+        assert os.listdir(os.path.dirname(key)) == ["0_0.jpg"]
+
+    def test_open_range(self, tmp_path):
+        storage = LocalStorage([str(tmp_path)])
+        key = storage.put("range.bin", bytes(range(100)))
+
+        assert b"".join(storage.open_range(key, 10, 20, chunk_size=3)) == bytes(range(10, 20))
+        assert b"".join(storage.open_range(key, 95)) == bytes(range(95, 100))
+
+    def test_places_on_volume_with_most_free_space(self, tmp_path, monkeypatch):
+        volumes = [str(tmp_path / "disk1"), str(tmp_path / "disk2")]
+        free_space = {volumes[0]: 100, volumes[1]: 1000}
+        monkeypatch.setattr("shutil.disk_usage", lambda path: DiskUsage(2000, 0, free_space[path]))
+        storage = LocalStorage(volumes)
+
+        assert storage.put("a.jpg", b"a").startswith(volumes[1])
+
+        free_space[volumes[1]] = 10
+        key = storage.put("b.jpg", b"b")
+        assert key.startswith(volumes[0])
+        # An existing object is replaced in place even if another volume now has more space
+        free_space[volumes[1]] = 10000
+        assert storage.put("b.jpg", b"bb") == key
+
+    def test_full_volumes(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("shutil.disk_usage", lambda path: DiskUsage(2000, 1990, 10))
+        storage = LocalStorage([str(tmp_path)], min_free_bytes=5)
+
+        with pytest.raises(StorageError):
+            storage.put("big.jpg", b"0123456789")
+
+    def test_rejects_keys_outside_volumes(self, tmp_path):
+        storage = LocalStorage([str(tmp_path / "media")])
+
+        with pytest.raises(StorageError):
+            storage.put("../escape.jpg", b"data")
+        with pytest.raises(StorageError):
+            storage.get(str(tmp_path / "other" / "image.jpg"))
@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+from io import BytesIO
+
+import pytest
+
+from app.storage import StorageError, StorageNotFoundError
+from app.storage.s3 import S3Storage
+
+
+class ClientError(Exception):
+    """
+    Shaped like botocore's ClientError, which S3Storage inspects for the error code
+    """
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class StreamingBody(BytesIO):
+    def iter_chunks(self, chunk_size: int):
+        while chunk := self.read(chunk_size):
+            yield chunk
+
+
+class InMemoryS3Client:
+    """
+    A stand-in for the boto3 S3 client, implementing the calls S3Storage makes
+    """
+
+    def __init__(self):
+        self.objects = {}
+
+    def _get(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError("NoSuchKey")
+        return self.objects[(Bucket, Key)]
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = (Body, datetime.now(timezone.utc))
+
+    def get_object(self, Bucket, Key, Range=None):
+        body, _ = self._get(Bucket, Key)
+        if Range:
+            start, end = Range.removeprefix("bytes=").split("-")
+            body = body[int(start): int(end) + 1 if end else None]
+        return {"Body": StreamingBody(body)}
+
+    def head_object(self, Bucket, Key):
+        body, modified_at = self._get(Bucket, Key)
+        return {"ContentLength": len(body), "LastModified": modified_at}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+class TestS3Storage:
+    """
+    Test cases for the S3 storage backend, against an in-memory stand-in client
+    """
+
+    @pytest.fixture
+    def client(self):
+        return InMemoryS3Client()
+
+    def test_put_get_stat_delete(self, client):
+        storage = S3Storage("bucket", prefix="media/", client=client)
+        key = storage.put("image.jpg", memoryview(b"image data"))
+
+        assert key == "media/image.jpg"
+        assert ("bucket", "media/image.jpg") in client.objects
+        assert storage.get(key) == b"image data"
+        assert storage.stat(key).size == len(b"image data")
+
+        storage.delete(key)
+        with pytest.raises(StorageNotFoundError):
+            storage.get(key)
+        with pytest.raises(StorageNotFoundError):
+            storage.delete(key)
+        with pytest.raises(StorageNotFoundError):
+            storage.stat(key)
+
+    def test_open_range(self, client):
+        storage = S3Storage("bucket", client=client)
+        key = storage.put("tiles/1/0_0.jpg", b"0123456789")
+
+        assert b"".join(storage.open_range(key, 2, 6, chunk_size=3)) == b"2345"
+        assert b"".join(storage.open_range(key, 7)) == b"789"
+        assert list(storage.open_range(key, 5, 5)) == []
+        with pytest.raises(StorageNotFoundError):
+            storage.open_range("missing.jpg")
+
+    def test_other_errors_are_storage_errors(self, client):
+        def denied(Bucket, Key, **kwargs):
+            raise ClientError("AccessDenied")
+
+        storage = S3Storage("bucket", client=client)
+        key = storage.put("image.jpg", b"data")
+        client.head_object = client.delete_object = client.put_object = denied
+
+        for call in (lambda: storage.stat(key), lambda: storage.delete(key), lambda: storage.put("other.jpg", b"")):
+            with pytest.raises(StorageError) as error:
+                call()
+            assert not isinstance(error.value, StorageNotFoundError)
+            assert isinstance(error.value.__cause__, ClientError)
+
+    def test_read_errors_are_storage_errors(self, client):
+        class BrokenBody:
+            def read(self):
+                raise ConnectionError("reset")
+
+            def iter_chunks(self, chunk_size):
+                yield b"01"
+                raise ConnectionError("reset")
+
+        storage = S3Storage("bucket", client=client)
+        client.get_object = lambda Bucket, Key, **kwargs: {"Body": BrokenBody()}
+
+        with pytest.raises(StorageError):
+            storage.get("image.jpg")
+        chunks = storage.open_range("image.jpg")
+        assert next(chunks) == b"01"
+        with pytest.raises(StorageError):
+            next(chunks)
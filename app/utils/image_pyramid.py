@@ -0,0 +1,86 @@
+import math
+from io import BytesIO
+from typing import Iterator, Tuple
+
+import PIL.Image
+
+DEFAULT_TILE_SIZE = 254
+DEFAULT_TILE_OVERLAP = 1
+
+
+def max_level(width: int, height: int) -> int:
+    """
+    Return the index of the full resolution level of a Deep Zoom pyramid, where level 0 is 1x1 pixel and
+    every level doubles the size of the one below it.
+    """
+    return math.ceil(math.log2(max(width, height, 1)))
+
+
+def level_size(width: int, height: int, level: int) -> Tuple[int, int]:
+    scale = 2 ** (max_level(width, height) - level)
+    return math.ceil(width / scale), math.ceil(height / scale)
+
+
+def tile_box(col: int, row: int, size: Tuple[int, int], tile_size: int, overlap: int) -> Tuple[int, int, int, int]:
+    """
+    Return the (left, top, right, bottom) pixel box of a tile: its cell plus ``overlap`` pixels on each side
+    that has a neighbour, clipped to the level.
+    """
+    width, height = size
+    left = col * tile_size - (overlap if col else 0)
+    top = row * tile_size - (overlap if row else 0)
+    return left, top, min(width, (col + 1) * tile_size + overlap), min(height, (row + 1) * tile_size + overlap)
+
+
+def iter_pyramid_tiles(image: PIL.Image.Image,
+                       tile_size: int = DEFAULT_TILE_SIZE,
+                       overlap: int = DEFAULT_TILE_OVERLAP,
+                       file_ext: str = "jpeg",
+                       quality: int = 85) -> Iterator[Tuple[int, int, int, bytes]]:
+    """
+    Cut a Deep Zoom (DZI) tile pyramid out of the image, from the full resolution level down to 1x1.
+
+    Every level is walked in strips one tile row high: the strip is cut into encoded tiles, and halved
+    into its place in the next level. So besides the current level only the next one, a quarter of its
+    size, is held in memory, and tiles are handed out as soon as they are encoded instead of being
+    collected.
+
+    Args:
+        image (Image.Image): The full resolution image, already decoded.
+        tile_size (int): The side of a tile cell in pixels. Must be even, so cells halve onto pixel bounds.
+        overlap (int): Pixels each tile shares with its neighbours.
+        file_ext (str): The file type of the tiles, "jpeg" or "png".
+        quality (int): The JPEG quality.
+
+    Yields:
+        tuple: (level, column, row, encoded tile).
+    """
+    if tile_size % 2:
+        raise ValueError(f"The tile size must be even, got {tile_size}")
+
+    file_format = "JPEG" if file_ext.lower() in ("jpg", "jpeg") else file_ext.upper()
+    mode = "RGB" if file_format == "JPEG" else "RGBA"
+    top_level = max_level(*image.size)
+    current = image if image.mode == mode else image.convert(mode)
+    # Let the caller's decoded image go once converted, if nothing else holds it
+    del image
+
+    for level in range(top_level, -1, -1):
+        width, height = current.size
+        next_level = PIL.Image.new(current.mode, (math.ceil(width / 2), math.ceil(height / 2))) if level else None
+
+        for row in range(math.ceil(height / tile_size)):
+            _, top, _, bottom = tile_box(0, row, current.size, tile_size, overlap)
+            strip = current.crop((0, top, width, bottom))
+            for col in range(math.ceil(width / tile_size)):
+                left, _, right, _ = tile_box(col, row, current.size, tile_size, overlap)
+                output = BytesIO()
+                strip.crop((left, 0, right, bottom - top)).save(output, format=file_format, quality=quality)
+                yield level, col, row, output.getvalue()
+
+            if next_level is not None:
+                cell_top = row * tile_size
+                cell = strip.crop((0, cell_top - top, width, min(height, cell_top + tile_size) - top))
+                next_level.paste(cell.reduce(2), (0, cell_top // 2))
+
+        current = next_level
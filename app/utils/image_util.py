@@ -1,7 +1,10 @@
+import importlib
 import logging
 import os
+import threading
+from contextlib import contextmanager, nullcontext
 from io import BytesIO
-from typing import Union
+from typing import Callable, ContextManager, List, Optional, Union
 
 import PIL.Image
 
@@ -13,9 +16,73 @@ logging.getLogger("PIL.PngImagePlugin").setLevel(logging.CRITICAL + 1)
 DEFAULT_TARGET_SIZE = 1 * 1024 * 1024
 DEFAULT_MAX_DIMENSION = 2400
 
+# The formats get_image_size recognises, so the only ones an upload can be in, and their Pillow plugins
+ACCEPTED_FORMAT_PLUGINS = {
+    "BMP": "BmpImagePlugin",
+    "GIF": "GifImagePlugin",
+    "ICO": "IcoImagePlugin",
+    "JPEG": "JpegImagePlugin",
+    "PNG": "PngImagePlugin",
+    "TIFF": "TiffImagePlugin",
+}
+
+
+def _no_timer(stage: str) -> ContextManager:
+    return nullcontext()
+
+
+_pixel_limits: List[int] = []
+_pixel_limits_lock = threading.Lock()
+_default_pixel_limit: Optional[int] = None
+
+
+@contextmanager
+def allow_image_pixels(limit: int):
+    """
+    Raise Pillow's decompression bomb limit (``PIL.Image.MAX_IMAGE_PIXELS``) to ``limit`` pixels within the block,
+    for images known to be that large, e.g. tile pyramid sources. The limit is process wide, so images opened by
+    other threads meanwhile get it too: callers check the size of their image against ``limit`` beforehand.
+    """
+    global _default_pixel_limit
+    with _pixel_limits_lock:
+        if not _pixel_limits:
+            _default_pixel_limit = PIL.Image.MAX_IMAGE_PIXELS
+        _pixel_limits.append(limit)
+        PIL.Image.MAX_IMAGE_PIXELS = max([_default_pixel_limit or 0] + _pixel_limits)
+    try:
+        yield
+    finally:
+        with _pixel_limits_lock:
+            _pixel_limits.remove(limit)
+            PIL.Image.MAX_IMAGE_PIXELS = (
+                max([_default_pixel_limit or 0] + _pixel_limits) if _pixel_limits else _default_pixel_limit
+            )
+
 
 class ImageUtil:
 
+    @staticmethod
+    def preload_codecs(formats: Optional[dict] = None):
+        """
+        Import the Pillow plugins of the accepted formats and run each codec once, so the first upload does
+        not pay for it. With these registered, opening an accepted image never makes Pillow import all of
+        its other plugins.
+
+        Args:
+            formats (dict, optional): Pillow format name to plugin module, ACCEPTED_FORMAT_PLUGINS by default.
+        """
+        formats = formats or ACCEPTED_FORMAT_PLUGINS
+        PIL.Image.preinit()
+        for plugin in formats.values():
+            importlib.import_module(f"PIL.{plugin}")
+
+        sample = PIL.Image.new("RGB", (16, 16))
+        for image_format in formats:
+            output = BytesIO()
+            sample.save(output, format=image_format)
+            output.seek(0)
+            PIL.Image.open(output).load()
+
     @staticmethod
     def open_image(image: Union[os.PathLike, str, bytes, BytesIO, PIL.Image.Image]) -> PIL.Image.Image:
         """
@@ -40,6 +107,18 @@ class ImageUtil:
         else:
             raise ValueError(f"Unsupported image type. {type(image)}")
 
+    @staticmethod
+    def flatten_alpha(image: PIL.Image.Image, background: tuple = (255, 255, 255)) -> PIL.Image.Image:
+        """
+        Convert the image to RGB, showing its transparent areas as the background colour rather than the
+        black that a plain conversion gives them.
+        """
+        if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+            rgba = image.convert("RGBA")
+            image = PIL.Image.new("RGB", rgba.size, background)
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        return image.convert("RGB")
+
     @staticmethod
     def PIL_to_bytes(image: PIL.Image.Image, file_ext: str) -> BytesIO:
         """
@@ -53,6 +132,10 @@ class ImageUtil:
             BytesIO: The converted image as bytes.
 
         """
+        # jpg is jpeg in PIL
+        if file_ext.lower() == 'jpg':
+            file_ext = 'jpeg'
+
         output = BytesIO()
         image.save(output, format=file_ext.upper(), quality=90)
         output.seek(0)
@@ -127,7 +210,8 @@ class ImageUtil:
     def optimize_image_bytes_size(cls,
                                   image: bytes,
                                   file_ext: str = 'jpeg',
-                                  target_size: int = DEFAULT_TARGET_SIZE) -> BytesIO:
+                                  target_size: int = DEFAULT_TARGET_SIZE,
+                                  timer: Optional[Callable[[str], ContextManager]] = None) -> BytesIO:
         """
         Optimize the size of the bytes image (Ex. image data from InMemoryUploadedFile) .
 
@@ -135,29 +219,41 @@ class ImageUtil:
             image (bytes): The input image data as bytes.
             file_ext (str): The desired file extension for the output image.
             target_size (int): The target size of the output image in bytes.
+            timer (Callable[[str], ContextManager], optional): Called with the stage name ("decode", "convert",
+                "encode" or "resize") and used as a context manager around that stage, e.g. to record timings.
 
         Returns:
             BytesIO: The optimized image as BytesIO.
 
         """
+        timer = timer or _no_timer
+
         if file_ext == 'jpg':
             file_ext = 'jpeg'
 
-        img = cls.convert_image_type(image, file_ext)
+        with timer("decode"):
+            img = cls.open_image(image)
+            img.load()
+
+        with timer("convert"):
+            img = cls.convert_image_type(img, file_ext)
 
         # Save the resized image to a BytesIO object
-        output = BytesIO()
-        img.save(output, format=file_ext.upper(), quality=90)
+        with timer("encode"):
+            output = BytesIO()
+            img.save(output, format=file_ext.upper(), quality=90)
 
         # Get the file size
         file_size = output.tell()
 
         # If the file size is still greater than the target size, resize the image
         if file_size > target_size:
-            resized_img = cls.reduce_image_size(img)
+            with timer("resize"):
+                resized_img = cls.reduce_image_size(img)
 
-            output = BytesIO()
-            resized_img.save(output, format=file_ext.upper(), quality=90)
+            with timer("encode"):
+                output = BytesIO()
+                resized_img.save(output, format=file_ext.upper(), quality=90)
 
         # Reset the file pointer to the beginning of the stream
         output.seek(0)
@@ -0,0 +1,57 @@
+from io import BytesIO
+from typing import Iterator, List, Tuple
+
+import PIL.Image
+
+from app.utils.image_util import ImageUtil
+
+# Pillow plugins of the formats variants can be encoded to, preloaded at startup like the accepted formats
+VARIANT_FORMAT_PLUGINS = {"JPEG": "JpegImagePlugin", "WEBP": "WebPImagePlugin"}
+
+
+def variant_format(file_ext: str) -> str:
+    return "JPEG" if file_ext.lower() in ("jpg", "jpeg") else file_ext.upper()
+
+
+def encode_variant(image: PIL.Image.Image, file_ext: str, quality: int) -> bytes:
+    """
+    Encode a variant as a progressive JPEG with optimized Huffman tables, so it renders coarse first and
+    is a few percent smaller than a baseline one, or as a WebP.
+    """
+    output = BytesIO()
+    file_format = variant_format(file_ext)
+    if file_format == "JPEG":
+        image.save(output, format=file_format, quality=quality, progressive=True, optimize=True)
+    else:
+        image.save(output, format=file_format, quality=quality, method=4)
+    return output.getvalue()
+
+
+def iter_variants(image, widths: List[int], file_ext: str = "jpeg",
+                  quality: int = 80) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Produce the downscaled variants of an image narrower than it, from a single decode. JPEGs are decoded
+    straight at the smallest scale still at least as wide as the widest variant, and every variant is
+    resized from the previous, larger one rather than from the full image.
+
+    Args:
+        image (Union[os.PathLike, str, bytes, BytesIO, Image.Image]): The input image data.
+        widths (List[int]): The widths of the variants, in pixels.
+        file_ext (str): The file type of the variants, "jpeg" or "webp".
+        quality (int): The encoder quality.
+
+    Yields:
+        tuple: (width, height, encoded variant), widest first.
+    """
+    img = ImageUtil.open_image(image)
+    original_width, original_height = img.size
+    widths = sorted({width for width in widths if 0 < width < original_width}, reverse=True)
+    if not widths:
+        return
+
+    img.draft("RGB", (widths[0], widths[0] * original_height // original_width))
+    current = ImageUtil.flatten_alpha(img)
+    for width in widths:
+        height = max(1, round(original_height * width / original_width))
+        current = current.resize((width, height), PIL.Image.Resampling.LANCZOS, reducing_gap=2.0)
+        yield width, height, encode_variant(current, file_ext, quality)
@@ -0,0 +1,121 @@
+import collections
+import os
+from io import BytesIO
+from typing import List, Union
+
+import numpy as np
+import PIL.Image
+
+from app.utils.image_util import ImageUtil
+
+# Side of the downscaled copy the placeholders are computed on, in pixels
+PLACEHOLDER_SIZE = 32
+BLURHASH_COMPONENTS = (4, 3)
+PALETTE_COLORS = 5
+# Bits kept per channel when bucketing pixels for the palette (8 levels, 512 buckets)
+PALETTE_BITS = 3
+
+BASE83_CHARACTERS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+ImagePlaceholder = collections.namedtuple("ImagePlaceholder", ["blurhash", "palette"])
+
+
+def _base83(value: int, length: int) -> str:
+    return "".join(BASE83_CHARACTERS[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _srgb_to_linear(pixels: np.ndarray) -> np.ndarray:
+    values = pixels / 255.0
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(values: np.ndarray) -> np.ndarray:
+    values = np.clip(values, 0.0, 1.0)
+    srgb = np.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1 / 2.4) - 0.055)
+    return (srgb * 255 + 0.5).astype(np.int64)
+
+
+def blurhash(pixels: np.ndarray, components_x: int = BLURHASH_COMPONENTS[0],
+             components_y: int = BLURHASH_COMPONENTS[1]) -> str:
+    """
+    Encode an image as a BlurHash (https://blurha.sh), a string of a few dozen characters clients decode
+    into a blurred preview.
+
+    Args:
+        pixels (np.ndarray): RGB pixels, of shape (height, width, 3).
+        components_x (int): Horizontal cosine components, 1 to 9.
+        components_y (int): Vertical cosine components, 1 to 9.
+
+    Returns:
+        str: The BlurHash, 4 + 2 * components_x * components_y characters long.
+    """
+    height, width = pixels.shape[:2]
+    linear = _srgb_to_linear(pixels[..., :3].astype(np.float64))
+
+    # All the components at once: factors[j, i] = sum over the pixels of cos(i x) * cos(j y) * colour
+    basis_x = np.cos(np.pi * np.arange(components_x)[:, None] * np.arange(width)[None, :] / width)
+    basis_y = np.cos(np.pi * np.arange(components_y)[:, None] * np.arange(height)[None, :] / height)
+    factors = np.einsum("jy,ix,yxc->jic", basis_y, basis_x, linear) / (width * height)
+    factors[1:, :] *= 2
+    factors[0, 1:] *= 2
+
+    dc = factors[0, 0]
+    ac = factors.reshape(-1, 3)[1:]
+
+    result = _base83((components_x - 1) + (components_y - 1) * 9, 1)
+    if len(ac):
+        quantised_max = int(max(0, min(82, np.floor(np.abs(ac).max() * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        maximum = 1
+        result += _base83(0, 1)
+
+    r, g, b = _linear_to_srgb(dc)
+    result += _base83((int(r) << 16) + (int(g) << 8) + int(b), 4)
+
+    scaled = ac / maximum
+    quantised = np.clip(np.floor(np.sign(scaled) * np.abs(scaled) ** 0.5 * 9 + 9.5), 0, 18).astype(np.int64)
+    for r, g, b in quantised:
+        result += _base83(int(r) * 19 * 19 + int(g) * 19 + int(b), 2)
+    return result
+
+
+def dominant_colors(pixels: np.ndarray, count: int = PALETTE_COLORS, bits: int = PALETTE_BITS) -> List[str]:
+    """
+    Find the most common colours by bucketing the pixels on their top ``bits`` bits per channel.
+
+    Args:
+        pixels (np.ndarray): RGB pixels, of shape (height, width, 3).
+        count (int): The maximum number of colours.
+        bits (int): Bits kept per channel, fewer merging more similar shades.
+
+    Returns:
+        list: Hex colours such as "#1a2b3c", the most common first. Each is the mean of its bucket.
+    """
+    rgb = pixels[..., :3].reshape(-1, 3).astype(np.int64)
+    shift = 8 - bits
+    buckets = ((rgb[:, 0] >> shift) << (2 * bits)) | ((rgb[:, 1] >> shift) << bits) | (rgb[:, 2] >> shift)
+
+    sizes = np.bincount(buckets, minlength=1 << (3 * bits))
+    sums = np.stack([np.bincount(buckets, weights=rgb[:, c], minlength=sizes.size) for c in range(3)], axis=1)
+    top = [bucket for bucket in np.argsort(sizes, kind="stable")[::-1][:count] if sizes[bucket]]
+
+    means = np.rint(sums[top] / sizes[top, None]).astype(np.int64)
+    return [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in means]
+
+
+def image_placeholder(image: Union[os.PathLike, str, bytes, BytesIO, PIL.Image.Image]) -> ImagePlaceholder:
+    """
+    Compute the BlurHash and the dominant colour palette of an image, on a copy downscaled to at most
+    PLACEHOLDER_SIZE pixels a side. JPEGs are decoded straight at a reduced scale.
+    """
+    img = ImageUtil.open_image(image)
+    img.draft("RGB", (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    img = img.copy()
+    img.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), PIL.Image.Resampling.BOX)
+
+    # Transparent areas show as white, like on the gallery background
+    pixels = np.asarray(ImageUtil.flatten_alpha(img))
+
+    return ImagePlaceholder(blurhash(pixels), dominant_colors(pixels))
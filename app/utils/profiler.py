@@ -0,0 +1,162 @@
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+PROFILE_SUFFIX = ".speedscope.json"
+
+# Leaf frames of threads that are parked rather than doing work (idle threadpool workers, the event loop's
+# selector). Samples ending in one of these are dropped so the profile only shows busy stacks.
+IDLE_LEAF_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("_base.py", "result"),
+}
+
+
+class SamplingProfiler:
+    """
+    A statistical profiler that periodically samples the Python stacks of every thread in the process.
+
+    Unlike cProfile, which only observes the thread that enabled it, this also sees synchronous endpoints
+    and dependencies that FastAPI runs in its threadpool.
+    """
+
+    def __init__(self, interval: float = 0.001):
+        """
+        Args:
+            interval (float): Seconds between two samples.
+        """
+        self.interval = interval
+        self.frames: List[Tuple[str, str, int]] = []
+        self.frame_index: Dict[Tuple[str, str, int], int] = {}
+        self.samples: Dict[int, List[List[int]]] = {}
+        self.thread_names: Dict[int, str] = {}
+        self.start_time = None
+        self.duration = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.start_time
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._sample(thread_id, frame)
+
+    def _sample(self, thread_id: int, frame):
+        leaf = frame.f_code
+        if (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_LEAF_FRAMES:
+            return
+
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            index = self.frame_index.get(key)
+            if index is None:
+                index = self.frame_index[key] = len(self.frames)
+                self.frames.append(key)
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+
+        if thread_id not in self.thread_names:
+            self.thread_names.update((thread.ident, thread.name) for thread in threading.enumerate())
+        self.samples.setdefault(thread_id, []).append(stack)
+
+    def to_speedscope(self, name: str) -> dict:
+        """
+        Export the collected samples in the speedscope file format, one profile per thread.
+        """
+        profiles = []
+        for thread_id, stacks in self.samples.items():
+            profiles.append({
+                "type": "sampled",
+                "name": self.thread_names.get(thread_id, str(thread_id)),
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration,
+                "samples": stacks,
+                "weights": [self.interval] * len(stacks),
+            })
+
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "imagefastapi",
+            "shared": {"frames": [{"name": n, "file": f, "line": line} for n, f, line in self.frames]},
+            "profiles": profiles,
+        }
+
+
+class ProfileStore:
+    """
+    A bounded on-disk ring buffer of profile files: saving a new profile removes the oldest ones
+    beyond ``max_files``.
+    """
+
+    def __init__(self, folder: str, max_files: int):
+        self.folder = folder
+        self.max_files = max_files
+
+    def save(self, name: str, profile: dict) -> str:
+        """
+        Write the profile atomically and prune the buffer.
+
+        Returns:
+            str: The file name of the saved profile.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        file_name = f"{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 10**9:09d}-{name}{PROFILE_SUFFIX}"
+        path = os.path.join(self.folder, file_name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as buffer:
+            json.dump(profile, buffer)
+        os.replace(tmp_path, path)
+
+        for stale in self.list()[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.folder, stale["name"]))
+            except FileNotFoundError:
+                pass
+
+        return file_name
+
+    def list(self) -> List[dict]:
+        """
+        Return the stored profiles, newest first.
+        """
+        if not os.path.isdir(self.folder):
+            return []
+
+        profiles = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX):
+                stat = entry.stat()
+                profiles.append({"name": entry.name, "size": stat.st_size, "created_at": stat.st_mtime})
+        profiles.sort(key=lambda profile: (profile["created_at"], profile["name"]), reverse=True)
+        return profiles
+
+    def path(self, name: str) -> Optional[str]:
+        """
+        Return the path of a stored profile, or None if the name does not refer to one.
+        """
+        if os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIX):
+            return None
+        path = os.path.join(self.folder, name)
+        return path if os.path.isfile(path) else None